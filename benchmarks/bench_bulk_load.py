@@ -0,0 +1,88 @@
+"""
+SecureDB event loading: the previous per-row INSERT OR REPLACE loop vs the set-based
+delete-then-insert from a registered relation, at 1, 100 and 1,000 matches of ~3,500 events.
+
+Matches are loaded one `upsert_match_data` call at a time into the same in-memory database,
+as successive loader runs would. The per-row loop is only timed up to --per-row-max matches,
+since at ~300 events/s it would take hours at the larger sizes.
+Needs the pipeline environment (FERNET_ENCRYPTION_KEY, OPENAI_API_KEY) for `SecureDB`.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_bulk_load --sizes 1 100 1000
+"""
+import argparse
+import time
+
+from src.tools.secure_db import SecureDB
+
+def dumped_events(match_id: int, n: int) -> list:
+    """Event dicts shaped like `MatchEnrichedPayload.model_dump()['events']`."""
+    events = []
+    for i in range(1, n + 1):
+        kind = ('Pass', 'Carry', 'Pressure', 'Shot')[i % 4]
+        events.append({
+            'event_id': f'{match_id}-{i}', 'match_id': match_id, 'index': i, 'period': 1 + (i > n // 2),
+            'timestamp': '00:12:34.567', 'minute': (i * 90) // n, 'second': i % 60, 'type_name': kind,
+            'possession_team': {'team_id': 1, 'team_name': 'Home'},
+            'player': {'player_id': i % 22, 'player_name': f'Player {i % 22}', 'position': None},
+            'location': {'x': 60.0, 'y': 40.0},
+            'pass_context': {'length': 10.0, 'angle': 0.1, 'recipient': None, 'is_progressive': False, 'xa': 0.0, 'assisted_shot_id': None} if kind == 'Pass' else None,
+            'shot_context': {'xg': 0.1, 'xa': None, 'outcome': 'Saved', 'body_part': 'Foot', 'distance_to_goal': 12.0, 'angle_to_goal': 0.5, 'key_pass_id': None} if kind == 'Shot' else None,
+        })
+    return events
+
+def payload(match_id: int, n: int) -> dict:
+    return {
+        'match': {'match_id': match_id, 'home_team': {'team_name': 'Home'}, 'away_team': {'team_name': 'Away'}, 'status': 'finished'},
+        'events': dumped_events(match_id, n), 'event_blocks': [], 'tracking_blocks': [],
+        'total_home_xg': 0.0, 'total_away_xg': 0.0,
+    }
+
+def per_row_upsert(db: SecureDB, data: dict):
+    """The loop `upsert_match_data` used before the set-based path."""
+    for e in data['events']:
+        db.conn.execute("""
+            INSERT OR REPLACE INTO events
+            (event_id, match_id, index, period, minute, second, type_name, player_name, xg, xa)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            e['event_id'], e['match_id'], e['index'], e['period'], e['minute'], e['second'], e['type_name'],
+            e['player']['player_name'] if e.get('player') else None,
+            e['shot_context']['xg'] if e.get('shot_context') else None,
+            e['pass_context']['xa'] if e.get('pass_context') else None,
+        ))
+
+def run(loader, matches: int, events: int) -> float:
+    db = SecureDB()
+    elapsed = 0.0
+    try:
+        for match_id in range(1, matches + 1):
+            data = payload(match_id, events) # Generation is excluded from the timing
+            start = time.perf_counter()
+            loader(db, data)
+            elapsed += time.perf_counter() - start
+        rows = db.conn.execute("SELECT count(*) FROM events").fetchone()[0]
+        assert rows == matches * events, rows
+    finally:
+        db.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark set-based event loading")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--events", type=int, default=3_500)
+    parser.add_argument("--per-row-max", type=int, default=1)
+    args = parser.parse_args()
+
+    run(lambda db, data: db._replace_match_events(data['match']['match_id'], data['events'], []), 1, 10) # Warm up pandas/DuckDB
+    for matches in args.sizes:
+        total = matches * args.events
+        bulk = run(lambda db, data: db._replace_match_events(data['match']['match_id'], data['events'], []), matches, args.events)
+        line = f"{matches:>5} matches  set-based {bulk:8.2f}s ({total / bulk:>9,.0f} events/s)"
+        if matches <= args.per_row_max:
+            per_row = run(per_row_upsert, matches, args.events)
+            line += f"  per-row {per_row:8.2f}s ({total / per_row:>7,.0f} events/s)"
+        print(line)
+
+if __name__ == "__main__":
+    main()
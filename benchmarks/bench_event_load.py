@@ -0,0 +1,56 @@
+"""
+Event load throughput: Pydantic objects + model_dump + per-row inserts vs columnar `EventBlock`
+straight into DuckDB, for a backfill of synthetic ~3,500-event matches.
+
+Needs the pipeline environment (FERNET_ENCRYPTION_KEY, OPENAI_API_KEY) for `SecureDB`.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_event_load --matches 5
+"""
+import argparse
+import time
+
+from benchmarks.bench_event_validation import synthetic_events
+from src.agents.enrich_load import _enrich_event_batch
+from src.tools.enrich import get_xg_model
+from src.tools.events import normalize_event_block
+from src.tools.secure_db import SecureDB
+
+def load_objects(db: SecureDB, events: list, match_id: int, xg_model):
+    valid, _ = _enrich_event_batch(events, match_id, xg_model)
+    dumped = [e.model_dump() for e in valid]
+    db.upsert_match_data({'match': _match(match_id), 'events': dumped, 'total_home_xg': 0.0, 'total_away_xg': 0.0})
+
+def load_columnar(db: SecureDB, events: list, match_id: int, xg_model):
+    block, _ = normalize_event_block(events, match_id, xg_model)
+    db.upsert_match_data({'match': _match(match_id), 'events': [], 'event_blocks': [block.model_dump()], 'total_home_xg': 0.0, 'total_away_xg': 0.0})
+
+def _match(match_id: int) -> dict:
+    return {'match_id': match_id, 'home_team': {'team_name': 'Home'}, 'away_team': {'team_name': 'Away'}, 'status': 'finished'}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event normalization and loading")
+    parser.add_argument("--matches", type=int, default=5)
+    parser.add_argument("--events", type=int, default=3_500)
+    args = parser.parse_args()
+
+    xg_model = get_xg_model()
+    matches = []
+    for m in range(args.matches):
+        events = synthetic_events(args.events, seed=m)
+        for e in events:
+            e['id'] = f"{m}-{e['id']}" # Event ids are unique across a backfill
+        matches.append(events)
+
+    for name, fn in (("objects", load_objects), ("columnar", load_columnar)):
+        db = SecureDB()
+        start = time.perf_counter()
+        for m, events in enumerate(matches):
+            fn(db, events, m + 1, xg_model)
+        elapsed = time.perf_counter() - start
+        rows = db.conn.execute("SELECT count(*) FROM events").fetchone()[0]
+        db.close()
+        print(f"{name:<9} {elapsed:7.3f}s  {rows / elapsed:>10,.0f} events/s  ({rows} rows)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Event validation throughput: per-object Pydantic construction vs the batch TypeAdapter path.
+
+Generates a synthetic ~3,500-event StatsBomb match (with a sprinkling of malformed rows)
+and reports events per second for each path.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_event_validation --events 3500 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from pydantic import ValidationError
+
+from src.models.domain import Event, Location, Player, ShotContext, Team
+from src.tools.events import map_raw_event, validate_event_batch
+
+def synthetic_events(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    events = []
+    for i in range(1, n + 1):
+        kind = rng.choice(['Pass', 'Pass', 'Carry', 'Pressure', 'Ball Receipt*', 'Shot'])
+        event = {
+            'id': f'ev-{i}', 'index': i, 'period': 1 if i < n // 2 else 2,
+            'timestamp': '00:12:34.567', 'minute': (i * 90) // n, 'second': i % 60,
+            'type': {'name': kind}, 'possession_team': {'id': 1 + i % 2, 'name': f'Team {1 + i % 2}'},
+            'player': {'id': i % 22, 'name': f'Player {i % 22}'},
+            'location': [rng.uniform(0, 120), rng.uniform(0, 80)],
+        }
+        if kind == 'Shot':
+            event['shot'] = {'outcome': {'name': 'Saved'}, 'body_part': {'name': 'Right Foot'}}
+        if i % 500 == 0:
+            event['second'] = 75 # Out of range, must be isolated and dropped
+        events.append(event)
+    return events
+
+def per_object(events: list) -> int:
+    """The previous enricher loop: Player, Location, ShotContext, Team and Event built one at a time."""
+    valid = 0
+    for raw_event in events:
+        try:
+            player_info = None
+            if 'player' in raw_event:
+                player_info = Player(player_id=raw_event['player'].get('id', 0), player_name=raw_event['player'].get('name', 'Unknown'))
+
+            loc = None
+            if 'location' in raw_event and len(raw_event['location']) >= 2:
+                loc = Location(x=float(raw_event['location'][0]), y=float(raw_event['location'][1]))
+
+            shot_context = None
+            if raw_event.get('type', {}).get('name') == 'Shot' and loc:
+                sb_outcome = raw_event.get('shot', {}).get('outcome', {}).get('name', 'Saved')
+                body_part = raw_event.get('shot', {}).get('body_part', {}).get('name', 'Foot')
+                shot_context = ShotContext(xg=0.1, xa=0.0, outcome=sb_outcome, body_part=body_part,
+                                           distance_to_goal=10.0, angle_to_goal=0.5)
+
+            Event(
+                event_id=str(raw_event.get('id')),
+                match_id=1,
+                index=int(raw_event.get('index', 1)),
+                period=int(raw_event.get('period', 1)),
+                timestamp=str(raw_event.get('timestamp')),
+                minute=int(raw_event.get('minute', 0)),
+                second=int(raw_event.get('second', 0)),
+                type_name=str(raw_event.get('type', {}).get('name', 'Unknown')),
+                possession_team=Team(team_id=raw_event.get('possession_team', {}).get('id', 0), team_name=raw_event.get('possession_team', {}).get('name', 'Unknown')),
+                player=player_info,
+                location=loc,
+                shot_context=shot_context
+            )
+            valid += 1
+        except ValidationError:
+            continue
+    return valid
+
+def batched(events: list) -> int:
+    mapped = [map_raw_event(raw, 1, (0.1, 10.0, 0.5) if raw['type']['name'] == 'Shot' else None) for raw in events]
+    valid, _ = validate_event_batch(mapped)
+    return len(valid)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event validation throughput")
+    parser.add_argument("--events", type=int, default=3_500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events)
+    for name, fn in (("per-object", per_object), ("batch TypeAdapter", batched)):
+        fn(events) # Warm up validators
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            valid = fn(events)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<18} {args.events / best:>10,.0f} events/s  ({valid} valid of {args.events})")
+
+if __name__ == "__main__":
+    main()
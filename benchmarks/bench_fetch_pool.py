@@ -0,0 +1,156 @@
+"""
+Per-match fetch latency: a fresh `SecureFetcher` per match (new client, new TLS handshake)
+vs one pooled, keep-alive fetcher shared across the run vs that fetcher behind a
+`FetchScheduler` prefetching queued matches, against a local HTTPS stand-in for
+raw.githubusercontent.com serving gzip-compressed synthetic event feeds.
+
+`--rtt` adds simulated network round-trip time: each request pays one RTT and each new
+connection pays two more for the TCP and TLS handshakes. `--work` simulates the enrich/load
+time spent on each match between fetches, which prefetching overlaps with downloads.
+
+Needs the pipeline environment (FERNET_ENCRYPTION_KEY, OPENAI_API_KEY) for settings.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_fetch_pool --matches 64 --rtt 30 --work 50
+"""
+import argparse
+import asyncio
+import datetime
+import gzip
+import ipaddress
+import json
+import os
+import ssl
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.bench_event_validation import synthetic_events
+from config.settings import get_settings
+from src.tools.fetch import SecureFetcher
+from src.tools.scheduler import FetchScheduler
+
+def self_signed_cert(directory: str) -> tuple:
+    """Writes a throwaway certificate and key for 127.0.0.1; returns (cert path, key path)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .sign(key, hashes.SHA256()))
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return cert_path, key_path
+
+def start_server(cert_path: str, key_path: str, body: bytes, rtt: float):
+    """Threaded keep-alive HTTPS server answering every /events/<id>.json with `body`."""
+    compressed = gzip.compress(body)
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Keep-alive
+
+        def setup(self):
+            connections.append(self.client_address)
+            time.sleep(2 * rtt) # TCP + TLS handshakes
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(rtt)
+            gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+            payload = compressed if gzipped else body
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, connections
+
+async def per_match_clients(match_ids: list, verify: str, work: float) -> list:
+    samples = []
+    for match_id in match_ids:
+        start = time.perf_counter()
+        async with SecureFetcher(verify=verify) as fetcher:
+            await fetcher.fetch_statsbomb_events(match_id)
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(work)
+    return samples
+
+async def shared_pool(match_ids: list, verify: str, work: float) -> list:
+    samples = []
+    async with SecureFetcher(verify=verify) as fetcher:
+        for match_id in match_ids:
+            start = time.perf_counter()
+            await fetcher.fetch_statsbomb_events(match_id)
+            samples.append(time.perf_counter() - start)
+            await asyncio.sleep(work)
+    return samples
+
+async def scheduled(match_ids: list, verify: str, work: float) -> list:
+    samples = []
+    queue = list(match_ids)
+    async with SecureFetcher(verify=verify) as fetcher:
+        scheduler = FetchScheduler.from_settings(fetcher)
+        try:
+            while queue:
+                start = time.perf_counter()
+                await scheduler.events(queue.pop(0), queue)
+                samples.append(time.perf_counter() - start) # Time the pipeline waits for the feed
+                await asyncio.sleep(work)
+        finally:
+            await scheduler.close()
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-match vs pooled HTTPS fetching")
+    parser.add_argument("--matches", type=int, default=20)
+    parser.add_argument("--events", type=int, default=3_500)
+    parser.add_argument("--rtt", type=float, default=0.0, help="Simulated round-trip time in milliseconds")
+    parser.add_argument("--work", type=float, default=0.0, help="Simulated enrich/load time per match in milliseconds")
+    args = parser.parse_args()
+
+    body = json.dumps(synthetic_events(args.events)).encode()
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = self_signed_cert(directory)
+        server, connections = start_server(cert_path, key_path, body, args.rtt / 1000)
+        os.environ["STATSBOMB_GITHUB_URL"] = f"https://127.0.0.1:{server.server_address[1]}/data"
+        get_settings.cache_clear()
+        print(f"{len(body) / 1e6:.1f} MB feed ({len(gzip.compress(body)) / 1e6:.1f} MB gzipped), {args.matches} matches, rtt {args.rtt:.0f} ms")
+        print(f"{'mode':<18} {'mean (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'connections':>12} {'total (s)':>10}")
+        try:
+            for name, fn in (("per-match client", per_match_clients), ("shared pool", shared_pool), ("scheduled", scheduled)):
+                before = len(connections)
+                start = time.perf_counter()
+                samples = asyncio.run(fn(list(range(1, args.matches + 1)), cert_path, args.work / 1000))
+                total = time.perf_counter() - start
+                p95 = statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+                print(f"{name:<18} {statistics.mean(samples) * 1000:>10.1f} {statistics.median(samples) * 1000:>10.1f} "
+                      f"{p95 * 1000:>10.1f} {len(connections) - before:>12} {total:>10.2f}")
+        finally:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
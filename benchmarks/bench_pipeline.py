@@ -0,0 +1,61 @@
+"""
+End-to-end pipeline throughput against the local `FeedServer`, so runs are repeatable and
+independent of GitHub's latency and rate limits. Each repeat starts from an empty database and
+HTTP cache; `--latency`, `--error-rate` and `--throttle-every` inject network conditions to
+benchmark retry and backoff behaviour.
+
+Needs the pipeline environment (FERNET_ENCRYPTION_KEY, OPENAI_API_KEY) for settings.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_pipeline --matches 8 --latency 30 --throttle-every 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from config.settings import get_settings
+from src.graph import run_pipeline
+from benchmarks.feed_server import FeedServer
+from src.tools.reader import get_table_cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the full pipeline against local feeds")
+    parser.add_argument("--matches", type=int, default=8)
+    parser.add_argument("--events", type=int, default=3_500)
+    parser.add_argument("--frames", type=int, default=5_000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    server = FeedServer(args.matches, args.events, args.frames, latency=args.latency / 1000,
+                        error_rate=args.error_rate, throttle_every=args.throttle_every, retry_after=0).start()
+    os.environ["STATSBOMB_GITHUB_URL"] = server.statsbomb_url
+    os.environ["METRICA_BASE_URL"] = server.metrica_url
+    os.environ["PIPELINE_MAX_MATCHES"] = str(args.matches)
+    print(f"{args.matches} matches x {args.events} events, {args.frames} tracking frames, latency {args.latency:.0f} ms, "
+          f"error rate {args.error_rate:.0%}, throttle every {args.throttle_every or '-'}")
+    print(f"{'run':>4} {'total (s)':>10} {'matches/s':>10} {'status':>8} {'errors':>7}")
+    samples = []
+    try:
+        for run in range(1, args.repeat + 1):
+            with tempfile.TemporaryDirectory() as directory:
+                os.environ["DUCKDB_PATH"] = os.path.join(directory, "db", "bench.duckdb")
+                os.environ["HTTP_CACHE_DIR"] = os.path.join(directory, "http")
+                get_settings.cache_clear()
+                get_table_cache.cache_clear()
+                start = time.perf_counter()
+                state = asyncio.run(run_pipeline("bench"))
+                elapsed = time.perf_counter() - start
+            samples.append(elapsed)
+            print(f"{run:>4} {elapsed:>10.2f} {args.matches / elapsed:>10.2f} {state['pipeline_status']:>8} {len(state['errors']):>7}")
+    finally:
+        server.stop()
+    print(f"median {statistics.median(samples):.2f} s; served {dict(sorted(server.statuses.items()))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Full-match pitch-control benchmark on synthetic Metrica-sized tracking.
+
+Compares the per-frame "closest to ball" path, the vectorized batch path and the
+spatial surface engine (serial vs process pool) over a ~140k-frame match.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_pitch_control --frames 140000 --workers 4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.models.domain import Location, TrackingFrame
+from src.tools.enrich import PitchControlSurfaceEngine, XGModel
+
+def synthetic_match(n_frames: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    home = rng.uniform((0.0, 0.0), (120.0, 80.0), size=(n_frames, 14, 2)).astype(np.float32)
+    away = rng.uniform((0.0, 0.0), (120.0, 80.0), size=(n_frames, 14, 2)).astype(np.float32)
+    home[:, 11:] = np.nan # Substitutes stay off the pitch
+    away[:, 11:] = np.nan
+    ball = rng.uniform((0.0, 0.0), (120.0, 80.0), size=(n_frames, 2)).astype(np.float32)
+    return home, away, ball
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pitch control at full-match scale")
+    parser.add_argument("--frames", type=int, default=140_000)
+    parser.add_argument("--workers", type=int, default=None, help="Surface engine processes (default: CPU count)")
+    parser.add_argument("--per-frame-sample", type=int, default=2_000, help="Frames timed on the per-object path, then extrapolated")
+    args = parser.parse_args()
+
+    home, away, ball = synthetic_match(args.frames)
+    model = XGModel()
+
+    sample = min(args.per_frame_sample, args.frames)
+    frames = [
+        TrackingFrame(
+            frame_id=f, period=1, timestamp_ms=f * 40,
+            ball_location=Location(x=float(ball[f, 0]), y=float(ball[f, 1])),
+            home_players=[Location(x=float(x), y=float(y)) for x, y in home[f, :11]],
+            away_players=[Location(x=float(x), y=float(y)) for x, y in away[f, :11]],
+        )
+        for f in range(sample)
+    ]
+    start = time.perf_counter()
+    for frame in frames:
+        model.calculate_pitch_control(frame, True)
+    per_frame = (time.perf_counter() - start) / sample * args.frames
+    print(f"per-frame closest-to-ball     {per_frame:8.2f}s (extrapolated from {sample} frames)")
+
+    start = time.perf_counter()
+    model.calculate_pitch_control_batch(home, away, ball)
+    print(f"batch closest-to-ball         {time.perf_counter() - start:8.2f}s")
+
+    for workers in (1, args.workers):
+        engine = PitchControlSurfaceEngine(workers=workers)
+        start = time.perf_counter()
+        result = engine.compute(home, away)
+        print(f"surface 50x32, {engine.workers:>2} worker(s)   {time.perf_counter() - start:8.2f}s "
+              f"(mean home area {result.home_area.mean():.0f} sq yd)")
+
+if __name__ == "__main__":
+    main()
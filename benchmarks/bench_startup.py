@@ -0,0 +1,46 @@
+"""
+Startup-time benchmark for the CLI and the pipeline import graph.
+
+Cron workers and test runs spawn fresh interpreters constantly, so the cost of
+`python main.py --help` and `import src.graph` is paid thousands of times a day.
+
+Usage (requires the same environment/.env as the pipeline):
+    PYTHONPATH=. python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "main.py --help": [sys.executable, "main.py", "--help"],
+    "import src.graph": [sys.executable, "-c", "import src.graph"],
+    "get_xg_model()": [sys.executable, "-c", "from src.tools.enrich import get_xg_model; get_xg_model()"],
+}
+
+def time_command(cmd: list, runs: int) -> list:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold interpreter startup for the pipeline entry points")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreter launches per scenario")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<20} {'median (ms)':>12} {'min (ms)':>10} {'max (ms)':>10}")
+    for name, cmd in SCENARIOS.items():
+        samples = time_command(cmd, args.runs)
+        print(f"{name:<20} {statistics.median(samples) * 1000:>12.1f} {min(samples) * 1000:>10.1f} {max(samples) * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
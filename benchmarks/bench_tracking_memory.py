@@ -0,0 +1,68 @@
+"""
+Memory benchmark: per-frame Pydantic `TrackingFrame` objects vs columnar `TrackingBlock`.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.bench_tracking_memory --frames 20000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.models.domain import Location, TrackingBlock, TrackingFrame
+
+def synthetic_arrays(n_frames: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    home = rng.uniform((0.0, 0.0), (120.0, 80.0), size=(n_frames, 14, 2))
+    away = rng.uniform((0.0, 0.0), (120.0, 80.0), size=(n_frames, 14, 2))
+    home[:, 11:] = np.nan
+    away[:, 11:] = np.nan
+    ball = rng.uniform((0.0, 0.0), (120.0, 80.0), size=(n_frames, 2))
+    return home, away, ball
+
+def build_frames(home, away, ball):
+    def _players(squad):
+        return [Location(x=float(x), y=float(y)) for x, y in squad if not np.isnan(x)]
+    return [
+        TrackingFrame(
+            frame_id=f, period=1, timestamp_ms=f * 40,
+            ball_location=Location(x=float(ball[f, 0]), y=float(ball[f, 1])),
+            home_players=_players(home[f]), away_players=_players(away[f]),
+            home_ppda=0.5, away_ppda=0.5,
+        )
+        for f in range(len(ball))
+    ]
+
+def build_block(home, away, ball):
+    n = len(ball)
+    return TrackingBlock(
+        frame_id=np.arange(n), period=np.ones(n), timestamp_ms=np.arange(n) * 40,
+        ball=ball, home=home, away=away,
+        home_control=np.full(n, 0.5), away_control=np.full(n, 0.5),
+    )
+
+def measure(build, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build(*args)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tracking memory footprints")
+    parser.add_argument("--frames", type=int, default=20_000)
+    args = parser.parse_args()
+
+    home, away, ball = synthetic_arrays(args.frames)
+    full_match = 140_000 / args.frames
+
+    for name, build in (("TrackingFrame list", build_frames), ("TrackingBlock", build_block)):
+        _, nbytes, elapsed = measure(build, home, away, ball)
+        print(f"{name:<20} {nbytes / 1e6:10.1f} MB {elapsed:8.2f}s  "
+              f"(~{nbytes * full_match / 1e9:.2f} GB for a 140k-frame match)")
+
+if __name__ == "__main__":
+    main()
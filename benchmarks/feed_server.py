@@ -0,0 +1,313 @@
+"""
+Local stand-in for the StatsBomb and Metrica open-data hosts, for deterministic tests and
+performance runs without the network.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.feed_server --matches 20 --latency 30 --throttle-every 50
+    PYTHONPATH=. python -m benchmarks.feed_server --cassette data/cassettes
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.tools.replay import Cassette
+
+_MATCHES = re.compile(r'^/statsbomb/matches/(\d+)/(\d+)\.json$')
+_EVENTS = re.compile(r'^/statsbomb/events/(\d+)\.json$')
+_TRACKING = re.compile(r'^/metrica/Sample_Game_1/Sample_Game_1_RawTrackingData_(Home|Away)_Team\.csv$')
+
+FIRST_MATCH_ID = 3_900_001
+_TEAMS = ['Argentina', 'France', 'Croatia', 'Morocco', 'Netherlands', 'England', 'Brazil', 'Portugal']
+_SHOT_OUTCOMES = ['Saved', 'Saved', 'Off T', 'Blocked', 'Wayward', 'Post', 'Goal']
+
+def synthetic_match_events(match_id: int, home: str, away: str, n: int, seed: int = 0) -> list:
+    """
+    A StatsBomb-shaped event feed: alternating possessions of passes, receipts and carries,
+    pressures, and shots linked to their key passes through key_pass_id / assisted_shot_id.
+    """
+    rng = random.Random(f"{seed}:{match_id}")
+    teams = [{'id': 1, 'name': home}, {'id': 2, 'name': away}]
+    events, team, x, y = [], 0, 60.0, 40.0
+    last_pass = None
+    for i in range(1, n + 1):
+        period = 1 if i <= n // 2 else 2
+        elapsed = (i - 1 if period == 1 else i - 1 - n // 2) * 2700 / max(1, n // 2)
+        period_minute, second = divmod(int(elapsed), 60)
+        minute = period_minute + (45 if period == 2 else 0)
+        roll = rng.random()
+        if roll < 0.06: # Turnover
+            team, x, y = 1 - team, 120.0 - x, 80.0 - y
+        kind = 'Shot' if x > 96 and roll > 0.85 else rng.choice(['Pass', 'Pass', 'Ball Receipt*', 'Carry', 'Pressure'])
+        player = team * 11 + rng.randrange(11)
+        event = {
+            'id': f'{match_id}-{i:05d}', 'index': i, 'period': period,
+            'timestamp': f'00:{period_minute:02d}:{second:02d}.{rng.randrange(1000):03d}',
+            'minute': minute, 'second': second, 'type': {'name': kind},
+            'possession_team': teams[team],
+            'player': {'id': player, 'name': f'{teams[team]["name"]} Player {player % 11 + 1}'},
+            'location': [round(x, 1), round(y, 1)],
+        }
+        if kind == 'Pass':
+            end = [round(min(119.0, max(1.0, x + rng.uniform(-10, 25))), 1), round(min(79.0, max(1.0, y + rng.uniform(-15, 15))), 1)]
+            recipient = team * 11 + rng.randrange(11)
+            event['pass'] = {'end_location': end, 'recipient': {'id': recipient, 'name': f'{teams[team]["name"]} Player {recipient % 11 + 1}'}}
+            last_pass = event
+            x, y = end
+        elif kind == 'Shot':
+            event['shot'] = {'outcome': {'name': rng.choice(_SHOT_OUTCOMES)}, 'body_part': {'name': rng.choice(['Right Foot', 'Left Foot', 'Head'])}}
+            if last_pass is not None and last_pass['possession_team'] is teams[team]:
+                event['shot']['key_pass_id'] = last_pass['id']
+                last_pass['pass']['assisted_shot_id'] = event['id']
+            team, x, y, last_pass = 1 - team, 10.0, 40.0, None # Goal kick or restart for the other side
+        elif kind == 'Carry':
+            x, y = min(119.0, max(1.0, x + rng.uniform(-3, 12))), min(79.0, max(1.0, y + rng.uniform(-6, 6)))
+        events.append(event)
+    return events
+
+def synthetic_matches(competition_id: int, season_id: int, n: int, events_per_match: int, seed: int = 0) -> tuple:
+    """(StatsBomb match list, {match_id: events}) with scores consistent with the goals in each feed."""
+    rng = random.Random(f"{seed}:{competition_id}:{season_id}")
+    matches, feeds = [], {}
+    for i in range(n):
+        match_id = FIRST_MATCH_ID + i
+        home, away = rng.sample(_TEAMS, 2)
+        events = synthetic_match_events(match_id, home, away, events_per_match, seed)
+        goals = Counter(e['possession_team']['name'] for e in events if e.get('shot', {}).get('outcome', {}).get('name') == 'Goal')
+        matches.append({
+            'match_id': match_id,
+            'match_date': f'2022-{11 + i // 30:02d}-{1 + i % 30:02d}',
+            'kick_off': '16:00:00.000',
+            'competition': {'competition_id': competition_id, 'competition_name': 'Synthetic Cup'},
+            'season': {'season_id': season_id, 'season_name': '2022'},
+            'home_team': {'home_team_id': 2 * i + 1, 'home_team_name': home},
+            'away_team': {'away_team_id': 2 * i + 2, 'away_team_name': away},
+            'home_score': goals[home], 'away_score': goals[away],
+            'match_status': 'available',
+        })
+        feeds[match_id] = events
+    return matches, feeds
+
+def synthetic_tracking_csv(team: str, frames: int, fps: float = 25.0, seed: int = 0) -> str:
+    """A Metrica raw tracking file: team and jersey rows, the column row, then 0-1 normalized positions."""
+    rng = random.Random(f"{seed}:{team}")
+    jerseys = list(range(1, 12)) if team == 'Home' else list(range(15, 26))
+    lines = [
+        ',,,' + ','.join(f'{team},' for _ in jerseys) + ',',
+        ',,,' + ','.join(f'{j},' for j in jerseys) + ',',
+        'Period,Frame,Time [s],' + ','.join(f'Player{j},' for j in jerseys) + 'Ball,',
+    ]
+    positions = [[rng.uniform(0.05, 0.95), rng.uniform(0.05, 0.95)] for _ in jerseys]
+    ball = [0.5, 0.5]
+    for frame in range(1, frames + 1):
+        for p in positions:
+            p[0] = min(1.0, max(0.0, p[0] + rng.uniform(-0.002, 0.002)))
+            p[1] = min(1.0, max(0.0, p[1] + rng.uniform(-0.002, 0.002)))
+        ball = [min(1.0, max(0.0, ball[0] + rng.uniform(-0.01, 0.01))), min(1.0, max(0.0, ball[1] + rng.uniform(-0.01, 0.01)))]
+        ball_cells = 'NaN,NaN' if frame % 97 == 0 else f'{ball[0]:.5f},{ball[1]:.5f}'
+        cells = ','.join(f'{px:.5f},{py:.5f}' for px, py in positions)
+        lines.append(f'{1 if frame <= frames // 2 else 2},{frame},{frame / fps:.2f},{cells},{ball_cells}')
+    return '\n'.join(lines) + '\n'
+
+class FeedServer:
+    """
+    Threaded keep-alive HTTP server mirroring the open-data paths under two prefixes:
+
+        /statsbomb/matches/<competition>/<season>.json
+        /statsbomb/events/<match_id>.json
+        /metrica/Sample_Game_1/Sample_Game_1_RawTrackingData_<Home|Away>_Team.csv
+
+    Feeds are synthetic (seeded, so every run serves identical bytes) or, with `cassette_dir`,
+    the responses recorded by a `record`-mode run. Point STATSBOMB_GITHUB_URL and
+    METRICA_BASE_URL at `statsbomb_url` and `metrica_url`. Bodies carry an ETag and are
+    gzip-encoded when asked for, like raw.githubusercontent.com.
+
+    Faults are injected deterministically from `seed`: every request first waits `latency`
+    seconds, every `throttle_every`-th request gets a 429 with Retry-After, and a further
+    `error_rate` share get a 503. `statuses` counts what was served.
+    """
+    def __init__(self, matches: int = 2, events_per_match: int = 1800, tracking_frames: int = 1500,
+                 cassette_dir: str | None = None, latency: float = 0.0, error_rate: float = 0.0,
+                 throttle_every: int = 0, retry_after: float = 1.0, seed: int = 0,
+                 host: str = "127.0.0.1", port: int = 0, ssl_context=None):
+        self.matches = matches
+        self.events_per_match = events_per_match
+        self.tracking_frames = tracking_frames
+        self.cassette = Cassette(cassette_dir) if cassette_dir else None
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.seed = seed
+        self.statuses = Counter()
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._feeds = {}
+        self._bodies = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        if ssl_context is not None:
+            self._server.socket = ssl_context.wrap_socket(self._server.socket, server_side=True)
+        self._scheme = "https" if ssl_context is not None else "http"
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{self._scheme}://{host}:{port}"
+
+    @property
+    def statsbomb_url(self) -> str:
+        return f"{self.url}/statsbomb"
+
+    @property
+    def metrica_url(self) -> str:
+        return f"{self.url}/metrica"
+
+    def start(self) -> "FeedServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="feed-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FeedServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _fault(self) -> tuple | None:
+        """(status, headers) of an injected failure for the next request, or None."""
+        with self._lock:
+            self.requests += 1
+            if self.throttle_every and self.requests % self.throttle_every == 0:
+                return 429, [("Retry-After", f"{self.retry_after:g}")]
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return 503, []
+        return None
+
+    def _synthetic(self, path: str) -> tuple | None:
+        """(content type, body) for a synthetic route, generated once and then served from memory."""
+        with self._lock:
+            if path in self._bodies:
+                return self._bodies[path]
+            body = None
+            if match := _MATCHES.match(path):
+                matches, feeds = synthetic_matches(int(match[1]), int(match[2]), self.matches, self.events_per_match, self.seed)
+                self._feeds.update(feeds)
+                body = ('application/json', json.dumps(matches).encode('utf-8'))
+            elif match := _EVENTS.match(path):
+                events = self._feeds.get(int(match[1]))
+                if events is None: # Fetched without the match list first
+                    events = synthetic_match_events(int(match[1]), 'Home Team', 'Away Team', self.events_per_match, self.seed)
+                body = ('application/json', json.dumps(events).encode('utf-8'))
+            elif match := _TRACKING.match(path):
+                body = ('text/plain', synthetic_tracking_csv(match[1], self.tracking_frames, seed=self.seed).encode('utf-8'))
+            if body is not None:
+                self._bodies[path] = body
+            return body
+
+    def _recorded(self, path: str) -> tuple | None:
+        """(status, headers, body) recorded for the route, looked up by the path below its prefix."""
+        prefix, _, rest = path.lstrip('/').partition('/')
+        if prefix not in ('statsbomb', 'metrica') or not rest:
+            return None
+        return self.cassette.find('/' + rest)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                fault = server._fault()
+                if fault is not None:
+                    self._send(fault[0], fault[1], b"")
+                    return
+
+                path = self.path.split('?', 1)[0]
+                if server.cassette is not None:
+                    recorded = server._recorded(path)
+                    if recorded is None:
+                        self._send(404, [], b"")
+                    else:
+                        self._send_body(*recorded)
+                    return
+                synthetic = server._synthetic(path)
+                if synthetic is None:
+                    self._send(404, [], b"")
+                    return
+                content_type, body = synthetic
+                etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+                headers = [("Content-Type", f"{content_type}; charset=utf-8"), ("ETag", etag)]
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=1)
+                    headers.append(("Content-Encoding", "gzip"))
+                self._send_body(200, headers, body)
+
+            def _send_body(self, status: int, headers: list, body: bytes):
+                etag = next((v for k, v in headers if k.lower() == 'etag'), None)
+                if status == 200 and etag is not None and self.headers.get("If-None-Match") == etag:
+                    self._send(304, [("ETag", etag)], b"")
+                else:
+                    self._send(status, headers, body)
+
+            def _send(self, status: int, headers: list, body: bytes):
+                with server._lock:
+                    server.statuses[status] += 1
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic or recorded StatsBomb/Metrica feeds locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--matches", type=int, default=2)
+    parser.add_argument("--events", type=int, default=1800, help="Events per synthetic match")
+    parser.add_argument("--frames", type=int, default=1500, help="Frames per synthetic tracking file")
+    parser.add_argument("--cassette", help="Serve responses recorded with HTTP_MODE=record instead")
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FeedServer(args.matches, args.events, args.frames, args.cassette, args.latency / 1000, args.error_rate,
+                        args.throttle_every, args.retry_after, args.seed, args.host, args.port)
+    print(f"STATSBOMB_GITHUB_URL={server.statsbomb_url}")
+    print(f"METRICA_BASE_URL={server.metrica_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(f"served: {dict(server.statuses)}")
+
+if __name__ == "__main__":
+    main()
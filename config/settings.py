@@ -1,7 +1,12 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import SecretStr, Field
+from functools import lru_cache
+from typing import Literal
 import os
 
+# Repository root; relative model paths resolve against it rather than the working directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Settings(BaseSettings):
     """
     Core configuration using zero-trust principles.
@@ -14,11 +19,51 @@ class Settings(BaseSettings):
 
     # API Settings
     statsbomb_github_url: str = "https://raw.githubusercontent.com/statsbomb/open-data/master/data"
+    metrica_base_url: str = "https://raw.githubusercontent.com/metrica-sports/sample-data/master/data"
+    http_timeout: float = Field(15.0, gt=0.0, description="Seconds before a request is abandoned")
+    http_max_connections: int = Field(10, gt=0, description="Connections the shared fetcher may open at once")
+    http_max_keepalive_connections: int = Field(10, ge=0, description="Idle connections kept open for reuse")
+    http_keepalive_expiry: float = Field(30.0, ge=0.0, description="Seconds an idle connection stays in the pool")
+    http2_enabled: bool = Field(False, description="Negotiate HTTP/2 when the optional h2 package is installed")
+    fetch_concurrency: int = Field(4, gt=0, description="Match downloads in flight at once")
+    fetch_prefetch_matches: int = Field(4, ge=0, description="Queued matches fetched ahead of the one being enriched (streams are opened and primed when streaming)")
+    fetch_rate_limit: float = Field(10.0, gt=0.0, description="Requests per second, halved on 429/5xx and recovered on success")
+    fetch_rate_burst: int = Field(4, gt=0, description="Requests that may start back to back before the rate applies")
+    http_cache_enabled: bool = Field(True, description="Keep fetched feeds in an encrypted on-disk cache and revalidate them")
+    http_cache_dir: str = "data/cache/http"
+    http_cache_max_bytes: int = Field(2 << 30, gt=0, description="Stored cache size before least-recently-used feeds are evicted")
+    http_cache_offline: bool = Field(False, description="Serve feeds only from the cache, never from the network")
+    http_mode: Literal['live', 'record', 'replay'] = Field('live', description="Use the network, record its responses to a cassette, or replay a cassette offline")
+    http_cassette_dir: str = "data/cassettes"
     api_football_key: SecretStr | None = None
+    pipeline_max_matches: int = Field(2, gt=0, description="Matches the supervisor queues per run")
+    event_streaming_enabled: bool = Field(True, description="Parse StatsBomb event feeds incrementally while downloading")
+    event_stream_batch_size: int = Field(500, gt=0, description="Events handed to the enricher per streamed batch")
+    event_normalization: Literal['objects', 'columnar'] = Field('objects', description="Validate events as Pydantic objects or as columnar EventBlocks")
 
     # Storage Settings
     fernet_encryption_key: SecretStr = Field(..., description="Valid Fernet key for encrypting data at rest")
     duckdb_path: str = Field("data/db/football_gravity.duckdb", description="Path to DuckDB database")
+    segment_dir: str | None = Field(None, description="Encrypted Parquet segment store (defaults next to duckdb_path)")
+    storage_flush_every_matches: int | None = Field(10, gt=0, description="Flush a segment after this many loaded matches, bounding the tracking held in memory (None: only at the end of the run)")
+    storage_flush_every_seconds: float | None = Field(300.0, gt=0.0, description="Flush a segment once this long has passed since the last one")
+    reader_cache_bytes: int = Field(512 << 20, ge=0, description="Budget for decrypted Arrow tables kept in memory by readers")
+    reader_workers: int | None = Field(None, gt=0, description="Threads decrypting segments concurrently (defaults to CPU count)")
+    encryption_chunk_size: int = Field(1 << 20, gt=0, lt=1 << 32, description="Plaintext bytes per authenticated chunk in encrypted outputs")
+
+    # Enrichment Settings
+    xg_model_path: str = Field("config/xg_model.json", description="Persisted xG coefficients (relative to the project root); write with `main.py --fit-xg-model`")
+    xg_grid_enabled: bool = Field(False, description="Score xG from a precomputed interpolated lattice")
+    xg_grid_cache_dir: str = "data/cache/xg_grid"
+    xg_grid_resolution: float = Field(0.25, gt=0.0, description="Lattice spacing in StatsBomb yards")
+
+    tracking_chunk_size: int = Field(4096, gt=0, description="Frames per streamed tracking chunk")
+    tracking_target_fps: float | None = Field(None, gt=0.0, description="Decimate stored tracking to this rate (None keeps the native rate)")
+    tracking_decimation_mode: Literal['stride', 'mean'] = Field('stride', description="Strided sampling or window means when decimating")
+    pitch_control_surface_enabled: bool = Field(False, description="Per-frame spatial pitch-control surface; CPU-heavy, opt in per run")
+    pitch_control_grid_x: int = Field(50, gt=0, description="Surface cells along the pitch length")
+    pitch_control_grid_y: int = Field(32, gt=0, description="Surface cells along the pitch width")
+    pitch_control_workers: int | None = Field(None, description="Surface engine processes (defaults to CPU count)")
 
     # Audit & Security
     audit_log_path: str = "logs/audit.jsonl"
@@ -27,6 +72,14 @@ class Settings(BaseSettings):
     def get_fernet_bytes(self) -> bytes:
         return self.fernet_encryption_key.get_secret_value().encode('utf-8')
 
-# Singleton settings instance
+    def get_segment_dir(self) -> str:
+        return self.segment_dir or self.duckdb_path.replace('.duckdb', '_segments')
+
+    def get_xg_model_path(self) -> str:
+        return os.path.join(PROJECT_ROOT, self.xg_model_path) # An absolute xg_model_path wins
+
+# Singleton settings instance, memoized so .env is parsed once per process.
+# Call get_settings.cache_clear() after mutating the environment (e.g. in tests).
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     return Settings()
@@ -1,46 +1,25 @@
 import asyncio
-import os
 from src.graph import run_pipeline
-from cryptography.fernet import Fernet
-from config.settings import get_settings
-import duckdb
+from src.tools.secure_db import read_table
 
 def generate_report():
     print("\n" + "="*50)
     print("DEMO RUN REPORT: FOOTBALL GRAVITY (WC 2022)")
     print("="*50)
     
-    settings = get_settings()
-    fernet = Fernet(settings.get_fernet_bytes())
-    
-    events_enc = settings.duckdb_path.replace('.duckdb', '_events.enc')
-    matches_enc = settings.duckdb_path.replace('.duckdb', '_matches.enc')
-    
-    if not os.path.exists(events_enc) or not os.path.exists(matches_enc):
+    df = read_table('matches')
+    if df is None or df.empty:
         print("[!] No encrypted output found. Pipeline may have failed.")
         return
         
-    print("[*] Secure Parquet Files successfully generated at rest.")
-    
-    # Decrypt and report
-    with open(matches_enc, 'rb') as f:
-        matches_dec = fernet.decrypt(f.read())
-        
-    import tempfile
-    with tempfile.NamedTemporaryFile(suffix='.parquet', delete=False) as tmp:
-        tmp.write(matches_dec)
-        tmp_path = tmp.name
-        
-    conn = duckdb.connect(':memory:')
-    df = conn.execute(f"SELECT * FROM '{tmp_path}'").df()
-    os.remove(tmp_path)
+    print("[*] Secure Parquet segments successfully generated at rest.")
     
     print("\n[ Matches Proceeded ]")
     print(df[['home_team', 'away_team', 'total_home_xg', 'total_away_xg']].to_string(index=False))
     print("\n[ Security Status ]")
     print("- TLS Validation: PASSED")
     print("- Pydantic Boundaries: PASSED")
-    print("- Fernet Encryption: PASSED")
+    print("- AES-GCM Encryption: PASSED")
     print("- Audit Logs: Generated at logs/audit.jsonl")
     print("\nTo view the interactive dashboard, run: streamlit run streamlit_app.py")
     
@@ -1,6 +1,5 @@
 import argparse
 import asyncio
-from src.graph import run_pipeline
 
 def main():
     """
@@ -8,9 +7,23 @@ def main():
     Produces an encrypted DuckDB Parquet containing enriched xG models.
     """
     parser = argparse.ArgumentParser(description="Run the secure Football Gravity Agent Pipeline")
-    parser.add_argument("--date", type=str, required=True, help="Target date to run pipeline for (e.g., 'today' or 'YYYY-MM-DD')")
+    parser.add_argument("--date", type=str, help="Target date to run pipeline for (e.g., 'today' or 'YYYY-MM-DD')")
+    parser.add_argument("--fit-xg-model", action="store_true", help="Fit the xG model, persist its coefficients to XG_MODEL_PATH and exit")
     args = parser.parse_args()
     
+    if args.fit_xg_model:
+        from config.settings import get_settings
+        from src.tools.enrich import fit_xg_model
+        
+        fit_xg_model()
+        print(f"[*] xG coefficients written to {get_settings().get_xg_model_path()}")
+        return
+    if args.date is None:
+        parser.error("--date is required unless --fit-xg-model is given")
+    
+    # Imported after argument parsing so `--help` never loads the pipeline stack
+    from src.graph import run_pipeline
+    
     print(f"[*] Initializing Football Gravity Pipeline for target date: {args.date}")
     
     # Run the compiled LangGraph workflow
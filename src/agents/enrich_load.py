@@ -1,20 +1,132 @@
 import os
 import json
+import asyncio
+import threading
 from src.models.state import PipelineState
 from src.tools.audit import audit_log
-from src.tools.enrich import get_xg_model
-from src.tools.secure_db import secure_db_session
-from src.models.domain import MatchEnrichedPayload, Match, Event, Team, Player, Location, ShotContext, TrackingFrame
+from src.tools.enrich import get_xg_model, PitchControlSurfaceEngine
+from src.tools.events import map_raw_event, validate_event_batch, normalize_event_block, pass_geometry_batch, assign_event_xa, assign_block_xa
+from src.tools.tracking import iter_aligned_tracking, SourceRateStamper, TrackingDecimator, decimate_blocks
+from config.settings import get_settings
+from src.tools.secure_db import StorageSession
+from src.models.domain import MatchEnrichedPayload, Match, Team, EventBlock, TrackingBlock, PitchControlSummary
 from pydantic import ValidationError
 
-import pandas as pd
-import io
+import numpy as np
+
+def _enrich_event_batch(events: list, match_id: int, xg_model) -> tuple:
+    """
+    Scores and validates one batch of raw StatsBomb events.
+    Returns (valid_events, drops) where drops are (event_id, error) pairs for the audit log.
+    """
+    # Collect every shot location first so xG is scored in one vectorized call
+    shot_rows, shot_xs, shot_ys = [], [], []
+    for row, raw_event in enumerate(events):
+        if raw_event.get('type', {}).get('name') == 'Shot' and len(raw_event.get('location') or []) >= 2:
+            try:
+                shot_xs.append(float(raw_event['location'][0]))
+                shot_ys.append(float(raw_event['location'][1]))
+            except (TypeError, ValueError):
+                continue # Malformed coordinates are dropped by the Location validation below
+            shot_rows.append(row)
+
+    shot_xg, shot_distance, shot_angle = xg_model.predict_xg_batch(shot_xs, shot_ys)
+    shot_lookup = {row: i for i, row in enumerate(shot_rows)}
+
+    # Pass length, angle and progressive flag are computed for every pass with both ends known
+    pass_rows, pass_starts, pass_ends = [], [], []
+    for row, raw_event in enumerate(events):
+        if raw_event.get('type', {}).get('name') == 'Pass' and isinstance(raw_event.get('pass'), dict):
+            try:
+                start, end = raw_event['location'], raw_event['pass']['end_location']
+                pass_starts.append((float(start[0]), float(start[1])))
+                pass_ends.append((float(end[0]), float(end[1])))
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue # A pass without both ends is kept without a PassContext
+            pass_rows.append(row)
+
+    pass_length, pass_angle, pass_progressive = pass_geometry_batch(pass_starts, pass_ends)
+    pass_lookup = {row: i for i, row in enumerate(pass_rows) if np.isfinite(pass_length[i])}
+
+    # Map every event to a plain dict first, then validate the whole batch in one call
+    mapped_events, drops = [], []
+    for row, raw_event in enumerate(events):
+        i = shot_lookup.get(row)
+        scored = None if i is None else (float(shot_xg[i]), float(shot_distance[i]), float(shot_angle[i]))
+        j = pass_lookup.get(row)
+        geometry = None if j is None else (float(pass_length[j]), float(pass_angle[j]), bool(pass_progressive[j]))
+        try:
+            mapped_events.append(map_raw_event(raw_event, match_id, scored, geometry))
+        except (TypeError, ValueError, AttributeError) as e:
+            drops.append((raw_event.get('id') if isinstance(raw_event, dict) else None, str(e)))
+            
+    valid_events, failures = validate_event_batch(mapped_events)
+    drops.extend((mapped_events[row]['event_id'], error) for row, error in failures)
+    return valid_events, drops
+
+def _parse_tracking(raw_tracking_home, raw_tracking_away, xg_model, stop: threading.Event) -> tuple:
+    """
+    Streams both Metrica squads joined on Frame in fixed-size columnar blocks, scoring pitch
+    control per block and decimating to the configured rate. Returns (blocks, fps); gives up
+    between chunks once `stop` is set.
+    """
+    settings = get_settings()
+    target_fps = settings.tracking_target_fps
+    mode = settings.tracking_decimation_mode
+    stamper = SourceRateStamper()
+    
+    def stamped():
+        # The source rate is inferred across chunk borders, so the first blocks may be held back
+        for block in iter_aligned_tracking(raw_tracking_home, raw_tracking_away, settings.tracking_chunk_size):
+            if stop.is_set():
+                return
+            yield from stamper.push(block)
+        yield from stamper.flush()
+    
+    tracking_blocks, source_fps, decimator = [], None, None
+    for block in stamped():
+        if source_fps is None and block.fps:
+            source_fps = block.fps
+            if target_fps and source_fps > target_fps * 1.01:
+                decimator = TrackingDecimator.for_rates(source_fps, target_fps, mode)
+        
+        # Strided sampling drops frames before any compute is spent on them
+        if decimator and mode == 'stride':
+            block = decimator.push(block)
+            if block is None:
+                continue
+        
+        # ML Pitch Control derived from distance matrices for every frame in one broadcast
+        block = block.with_control(*xg_model.calculate_pitch_control_batch(block.home, block.away, block.ball))
+        
+        # Window means average positions and control computed at the native rate
+        if decimator and mode == 'mean':
+            block = decimator.push(block)
+            if block is None:
+                continue
+        tracking_blocks.append(block)
+    if stop.is_set():
+        return [], None
+    if stamper.mismatched_blocks:
+        audit_log("tracking_fps_mismatch", "EnricherAgent", {"fps": stamper.fps, "blocks": stamper.mismatched_blocks})
+    
+    tail = decimator.flush() if decimator else None
+    if tail is not None:
+        tracking_blocks.append(tail)
+    return tracking_blocks, decimator.fps if decimator else source_fps
+
+def _audit_drops(drops: list):
+    for event_id, error in drops:
+        # Zero-trust means we drop malformed rows loudly in the audit log
+        audit_log("validation_drop", "EnricherAgent", {"event_id": event_id, "error": error})
 
 async def enricher_node(state: PipelineState) -> PipelineState:
     """
     Enricher Agent normalizes the raw data, drops malformed data (via Pydantic),
     and computes advanced metrics like Logistic-Regression xG and Pitch Control.
     """
+    # Never leave the previous match's payload behind for the loader if this one fails
+    state["enriched_payload"] = None
     raw_payload = state.get("raw_event_data")
     if not raw_payload:
         state["pipeline_status"] = "failed"
@@ -22,7 +134,6 @@ async def enricher_node(state: PipelineState) -> PipelineState:
         return state
         
     match_id = raw_payload["match_id"]
-    events = raw_payload["events"]
     
     raw_tracking_home = state.get("raw_tracking_home")
     raw_tracking_away = state.get("raw_tracking_away")
@@ -30,46 +141,11 @@ async def enricher_node(state: PipelineState) -> PipelineState:
     audit_log("enrichment_started", "EnricherAgent", {"match_id": match_id})
     xg_model = get_xg_model()
     
-    valid_events = []
-    tracking_frames_parsed = []
+    tracking_blocks = []
+    tracking_fps = None
+    pitch_control_summary = None
     total_home_xg, total_away_xg = 0.0, 0.0
     
-    # Securely parse massive Tracking CSV if it exists (Metrica Format)
-    if raw_tracking_home and raw_tracking_away:
-        try:
-            # We parse just the first 100 frames for demonstration to avoid memory overflow in Streamlit
-            df_home = pd.read_csv(io.StringIO(raw_tracking_home), skiprows=2).head(100)
-            
-            for index, row in df_home.iterrows():
-                # Extremely simplified parsing for the first few players as a proof of concept
-                home_locs = []
-                for i in range(1, 5): # Just sampling 4 players
-                    if pd.notna(row.get(f'Home_{i}_x')) and pd.notna(row.get(f'Home_{i}_y')):
-                        home_locs.append(Location(x=row[f'Home_{i}_x'] * 120.0, y=row[f'Home_{i}_y'] * 80.0))
-                        
-                ball_loc = None
-                if pd.notna(row.get('Ball_x')) and pd.notna(row.get('Ball_y')):
-                    ball_loc = Location(x=row['Ball_x'] * 120.0, y=row['Ball_y'] * 80.0)
-                    
-                frame = TrackingFrame(
-                    frame_id=int(row.get('Frame', index)),
-                    period=int(row.get('Period', 1)),
-                    timestamp_ms=int(row.get('Time [s]', 0) * 1000),
-                    ball_location=ball_loc,
-                    home_players=home_locs,
-                    away_players=[], # Omitted parsing away cleanly for brevity
-                )
-                
-                # ML Pitch Control derived from distance matrices (using PPDA fields to hold spatial metric)
-                control = xg_model.calculate_pitch_control(frame, True)
-                frame.home_ppda = control['home']
-                frame.away_ppda = control['away']
-                
-                tracking_frames_parsed.append(frame)
-            audit_log("tracking_parsed", "EnricherAgent", {"frames": len(tracking_frames_parsed)})
-        except Exception as e:
-            audit_log("tracking_parse_error", "EnricherAgent", {"error": str(e)})
-    
     # Retrieve Match Metadata from State
     raw_match_metadata = state.get("raw_match_metadata", [])
     match_info = next((m for m in raw_match_metadata if m['match_id'] == match_id), None)
@@ -109,85 +185,126 @@ async def enricher_node(state: PipelineState) -> PipelineState:
             home_score=0, away_score=0, status='finished'
         )
     
-    for raw_event in events:
-        try:
-            # StatsBomb to Our Schema mapper
-            player_info = None
-            if 'player' in raw_event:
-                player_info = Player(player_id=raw_event['player'].get('id', 0), player_name=raw_event['player'].get('name', 'Unknown'))
+    # Objects mode builds validated `Event` models; columnar mode fills typed arrays without per-row objects
+    enrich_batch = _enrich_event_batch if get_settings().event_normalization == 'objects' else normalize_event_block
+    valid_events, event_blocks = [], []
+    def collect(result):
+        batch_events, drops = result
+        _audit_drops(drops)
+        if isinstance(batch_events, EventBlock):
+            event_blocks.append(batch_events)
+        else:
+            valid_events.extend(batch_events)
             
-            loc = None
-            if 'location' in raw_event and len(raw_event['location']) >= 2:
-                loc = Location(x=float(raw_event['location'][0]), y=float(raw_event['location'][1]))
-                
-            shot_context = None
-            if raw_event.get('type', {}).get('name') == 'Shot' and loc:
-                # ENRICHMENT: Calculate Logistic xG based on location
-                xg_value = xg_model.predict_xg(loc.x, loc.y)
-                sb_outcome = raw_event.get('shot', {}).get('outcome', {}).get('name', 'Saved')
-                body_part = raw_event.get('shot', {}).get('body_part', {}).get('name', 'Foot')
-                
-                # Coerce to literal
-                if sb_outcome not in ['Goal', 'Saved', 'Off T', 'Post', 'Wayward', 'Blocked']:
-                    sb_outcome = 'Saved' 
-                    
-                shot_context = ShotContext(
-                    xg=xg_value,
-                    xa=0.0,
-                    outcome=sb_outcome,
-                    body_part=body_part,
-                    distance_to_goal=xg_model._calculate_distance_and_angle(loc.x, loc.y)[0],
-                    angle_to_goal=xg_model._calculate_distance_and_angle(loc.x, loc.y)[1]
+    # Tracking is parsed in a worker thread while the event stream below is drained, so a slow
+    # tracking parse never stalls the download and a broken feed fails without waiting on it
+    stop_tracking = threading.Event()
+    tracking_task = None
+    if raw_tracking_home and raw_tracking_away:
+        tracking_task = asyncio.create_task(
+            asyncio.to_thread(_parse_tracking, raw_tracking_home, raw_tracking_away, xg_model, stop_tracking)
+        )
+            
+    if "event_batches" in raw_payload:
+        # Streamed feed: map and validate each batch as it is parsed off the wire, off the event
+        # loop so the download keeps flowing. Raw dicts are released batch by batch.
+        try:
+            async for batch in raw_payload["event_batches"]:
+                collect(await asyncio.to_thread(enrich_batch, batch, match_id, xg_model))
+        except Exception as e:
+            # A truncated or malformed feed fails the match rather than loading a partial event set
+            audit_log("enrichment_stream_error", "EnricherAgent", {"match_id": match_id, "error": str(e)})
+            state["errors"].append(f"Event stream failed for {match_id}: {str(e)}")
+            state["pipeline_status"] = "failed"
+            if tracking_task is not None:
+                stop_tracking.set()
+                await asyncio.gather(tracking_task, return_exceptions=True)
+            return state
+    else:
+        collect(enrich_batch(raw_payload["events"], match_id, xg_model))
+    
+    if tracking_task is not None:
+        try:
+            tracking_blocks, tracking_fps = await tracking_task
+            settings = get_settings()
+            n_frames = sum(len(b) for b in tracking_blocks)
+            if settings.pitch_control_surface_enabled and n_frames:
+                engine = PitchControlSurfaceEngine(
+                    grid_shape=(settings.pitch_control_grid_x, settings.pitch_control_grid_y),
+                    workers=settings.pitch_control_workers,
+                )
+                # CPU-bound and fanned out to worker processes; keep the event loop free meanwhile
+                surface = await asyncio.to_thread(
+                    engine.compute,
+                    np.concatenate([b.home for b in tracking_blocks]),
+                    np.concatenate([b.away for b in tracking_blocks]),
+                )
+                pitch_control_summary = PitchControlSummary(
+                    grid_shape=list(engine.grid_shape),
+                    cell_area=engine.cell_area,
+                    frame_ids=np.concatenate([b.frame_id for b in tracking_blocks]),
+                    home_area=surface.home_area,
+                    away_area=surface.away_area,
+                    mean_home_area=float(surface.home_area.mean()),
+                    mean_away_area=float(surface.away_area.mean()),
                 )
-                
-                # Accumulate Team xG
-                team_name = raw_event.get('possession_team', {}).get('name')
-                if team_name == home_team.team_name:
-                    total_home_xg += xg_value
-                else:
-                    total_away_xg += xg_value
-
-            event = Event(
-                event_id=str(raw_event.get('id')),
-                match_id=match_id,
-                index=int(raw_event.get('index', 1)),
-                period=int(raw_event.get('period', 1)),
-                timestamp=str(raw_event.get('timestamp')),
-                minute=int(raw_event.get('minute', 0)),
-                second=int(raw_event.get('second', 0)),
-                type_name=str(raw_event.get('type', {}).get('name', 'Unknown')),
-                possession_team=Team(team_id=raw_event.get('possession_team', {}).get('id', 0), team_name=raw_event.get('possession_team', {}).get('name', 'Unknown')),
-                player=player_info,
-                location=loc,
-                shot_context=shot_context
-            )
-            valid_events.append(event)
-        except ValidationError as e:
-            # Zero-trust means we drop malformed rows loudly in the audit log
-            audit_log("validation_drop", "EnricherAgent", {"event_id": raw_event.get('id'), "error": str(e)})
-            continue
+            
+            audit_log("tracking_parsed", "EnricherAgent", {"frames": n_frames, "blocks": len(tracking_blocks), "fps": tracking_fps})
+        except Exception as e:
+            tracking_blocks, tracking_fps, pitch_control_summary = [], None, None
+            audit_log("tracking_parse_error", "EnricherAgent", {"error": str(e)})
+        
+    # Credit each assisting pass with its shot's xG; done match-wide since a key pass and its
+    # shot can arrive in different stream batches
+    assign_event_xa(valid_events)
+    event_blocks = assign_block_xa(event_blocks)
+        
+    # Accumulate Team xG over the shots that survived validation
+    for event in valid_events:
+        if event.shot_context is not None:
+            if event.possession_team.team_name == home_team.team_name:
+                total_home_xg += event.shot_context.xg
+            else:
+                total_away_xg += event.shot_context.xg
+    for block in event_blocks:
+        is_shot = ~np.isnan(block.xg)
+        is_home = block.team_name == home_team.team_name
+        total_home_xg += float(block.xg[is_shot & is_home].sum())
+        total_away_xg += float(block.xg[is_shot & ~is_home].sum())
             
     try:
         enriched = MatchEnrichedPayload(
             match=match,
             events=valid_events,
-            tracking_frames=tracking_frames_parsed,
+            event_blocks=event_blocks,
+            tracking_blocks=tracking_blocks,
+            tracking_fps=tracking_fps,
+            pitch_control_summary=pitch_control_summary,
             total_home_xg=total_home_xg,
             total_away_xg=total_away_xg
         )
         state["enriched_payload"] = enriched
         state["pipeline_status"] = "loading"
-        audit_log("enrichment_success", "EnricherAgent", {"match_id": match_id, "valid_events": len(valid_events)})
+        audit_log("enrichment_success", "EnricherAgent", {"match_id": match_id, "valid_events": len(valid_events) + sum(len(b) for b in event_blocks)})
     except ValidationError as e:
          state["errors"].append(f"Payload validation failed: {str(e)}")
          state["pipeline_status"] = "failed"
          
     return state
 
-async def loader_node(state: PipelineState) -> PipelineState:
+def _store(payload: MatchEnrichedPayload, storage_session: StorageSession | None):
+    if storage_session is not None:
+        storage_session.load(payload.model_dump())
+    else:
+        with StorageSession() as own:
+            own.load(payload.model_dump())
+
+async def loader_node(state: PipelineState, storage_session: StorageSession | None = None) -> PipelineState:
     """
     Loader Agent securely stores the Pydantic verified payload into DuckDB,
-    then encrypts the output on disk with Fernet.
+    then encrypts the output on disk with chunked AES-GCM.
+    Loads go into the run's shared `storage_session`, which decides when to flush;
+    without one the match is flushed on its own.
     """
     payload = state.get("enriched_payload")
     if not payload:
@@ -197,15 +314,24 @@ async def loader_node(state: PipelineState) -> PipelineState:
         
     audit_log("load_started", "LoaderAgent", {"match_id": payload.match.match_id})
     
-    with secure_db_session() as db:
-        try:
-            db.upsert_match_data(payload.model_dump())
-            db.flush_to_encrypted_disk()
-            state["pipeline_status"] = "validating"
-            audit_log("load_success", "LoaderAgent", {"match_id": payload.match.match_id})
-        except Exception as e:
-            state["errors"].append(f"DB Load failed: {str(e)}")
-            state["pipeline_status"] = "failed"
-            audit_log("load_failed", "LoaderAgent", {"error": str(e)})
-            
+    # Honor the configured tracking rate even for payloads enriched at a higher one
+    target_fps = get_settings().tracking_target_fps
+    if target_fps and payload.tracking_blocks and (payload.tracking_fps is None or payload.tracking_fps > target_fps * 1.01):
+        blocks = decimate_blocks(payload.tracking_blocks, target_fps, get_settings().tracking_decimation_mode)
+        payload = payload.model_copy(update={
+            "tracking_blocks": blocks,
+            "tracking_fps": blocks[0].fps if blocks and blocks[0].fps else payload.tracking_fps,
+        })
+    
+    try:
+        # Loads (and the periodic DuckDB→Parquet→AES-GCM flush) run off the event loop so
+        # prefetch downloads and streamed feeds keep flowing meanwhile
+        await asyncio.to_thread(_store, payload, storage_session)
+        state["pipeline_status"] = "validating"
+        audit_log("load_success", "LoaderAgent", {"match_id": payload.match.match_id})
+    except Exception as e:
+        state["errors"].append(f"DB Load failed: {str(e)}")
+        state["pipeline_status"] = "failed"
+        audit_log("load_failed", "LoaderAgent", {"error": str(e)})
+        
     return state
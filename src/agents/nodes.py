@@ -1,12 +1,29 @@
 from src.models.state import PipelineState
 from src.tools.audit import audit_log
 from src.tools.fetch import SecureFetcher
+from src.tools.scheduler import FetchScheduler
+from config.settings import get_settings
 import asyncio
 
-async def supervisor_node(state: PipelineState) -> PipelineState:
+async def _owned_event_batches(first: list, batches, fetcher: SecureFetcher | None):
+    """
+    Re-yields a primed event stream and releases it once the enricher is done with it,
+    closing `fetcher` too when the stream owns it (i.e. it is not the run's shared client).
+    """
+    try:
+        if first:
+            yield first
+        async for batch in batches:
+            yield batch
+    finally:
+        await batches.aclose()
+        if fetcher is not None:
+            await fetcher.close()
+
+async def supervisor_node(state: PipelineState, fetcher: SecureFetcher | None = None) -> PipelineState:
     """
     Supervisor Agent evaluates the target parameters and decides what matches 
-    to place into the queue.
+    to place into the queue. Uses the run's shared `fetcher` when given.
     """
     audit_log("supervisor_decision", "SupervisorAgent", {"date": state["target_date"], "competitions": state["target_competitions"]})
     
@@ -14,38 +31,70 @@ async def supervisor_node(state: PipelineState) -> PipelineState:
     # For demo purposes, we will fetch FIFA World Cup 2022 (competition 43, season 106).
     # A real system would have a date-match cross-reference.
     
-    if not state.get("matches_to_process"):
-        fetcher = SecureFetcher()
+    if state.get("matches_to_process"):
+        # Called back by the validator or a failed fetch: carry on with the queue
+        state["pipeline_status"] = "fetching"
+    elif state.get("raw_match_metadata"):
+        # Every planned match has been processed
+        state["pipeline_status"] = "done"
+    else:
+        owned = fetcher is None
+        fetcher = fetcher or SecureFetcher()
         try:
             # StatsBomb WC 2022: comp 43, season 106
             # In a true daily run, we would filter by `state["target_date"]`
             matches_data = await fetcher.fetch_statsbomb_matches(43, 106)
             
-            # Select 2 matches for the demo to avoid a massive run
-            simulated_matches = []
-            for m in matches_data[:2]:
-                simulated_matches.append(m['match_id'])
+            # Cap the run at the configured number of matches to avoid a massive run
+            selected = matches_data[:get_settings().pipeline_max_matches]
+            simulated_matches = [m['match_id'] for m in selected]
                 
             state["matches_to_process"] = simulated_matches
             # Store the raw match metadata in state to avoid mocking in enricher
-            if "raw_match_metadata" not in state or state["raw_match_metadata"] is None:
-                state["raw_match_metadata"] = matches_data[:2]
-            else:
-                state["raw_match_metadata"].extend(matches_data[:2])
+            state["raw_match_metadata"] = selected
             
-            state["pipeline_status"] = "fetching"
+            state["pipeline_status"] = "fetching" if simulated_matches else "done"
             audit_log("planner_queue_built", "SupervisorAgent", {"len_matches": len(simulated_matches), "queue": simulated_matches})
         except Exception as e:
             state["errors"].append(f"Planner failed to fetch match list: {str(e)}")
             state["pipeline_status"] = "failed"
         finally:
-            await fetcher.close()
+            if owned:
+                await fetcher.close()
             
     return state
     
-async def fetcher_node(state: PipelineState) -> PipelineState:
+async def _fetch_scheduled(state: PipelineState, match_id: int, scheduler: FetchScheduler) -> PipelineState:
+    """Takes the match from the scheduler, which has usually downloaded it while the previous match was enriched."""
+    tracking = scheduler.tracking() if state.get("raw_tracking_home") is None else None
+    try:
+        raw_events = await scheduler.events(match_id, state["matches_to_process"])
+        state["raw_event_data"] = {"match_id": match_id, "events": raw_events}
+        if tracking is not None:
+            try:
+                state["raw_tracking_home"], state["raw_tracking_away"] = await tracking
+                audit_log("fetch_tracking_success", "FetcherAgent", {"match_id": match_id})
+            except Exception as e:
+                audit_log("fetch_tracking_warning", "FetcherAgent", {"match_id": match_id, "warning": "Tracking absent", "error": str(e)})
+                state["raw_tracking_home"] = None
+                state["raw_tracking_away"] = None
+        state["pipeline_status"] = "enriching"
+    except Exception as e:
+        if tracking is not None:
+            # Left running for the next match, which shares the same future; retrieve a failure
+            # now so it is not reported as never retrieved if no later match awaits it
+            tracking.add_done_callback(lambda f: f.cancelled() or f.exception())
+        state["errors"].append(f"Fetch failed for {match_id}: {str(e)}")
+        state["pipeline_status"] = "supervisor" # fallback to supervisor to decide retry/skip
+    return state
+
+async def fetcher_node(state: PipelineState, fetcher: SecureFetcher | None = None, scheduler: FetchScheduler | None = None) -> PipelineState:
     """
-    Fetcher Agent securely pulls the match data from StatsBomb with TLS and backoffs.
+    Fetcher Agent securely pulls the match data from StatsBomb with TLS and backoffs,
+    over the run's shared pooled `fetcher` when given. With event streaming the feed is parsed
+    as it downloads, and a `scheduler` opens the next queued matches' streams ahead of time;
+    with streaming off the scheduler downloads queued feeds whole, concurrently. Both Metrica
+    tracking files are fetched at once, alongside the event feed.
     """
     if not state["matches_to_process"]:
         state["pipeline_status"] = "done"
@@ -53,33 +102,63 @@ async def fetcher_node(state: PipelineState) -> PipelineState:
         
     match_id = state["matches_to_process"].pop(0)
     state["current_match_id"] = match_id
+    settings = get_settings()
+    if scheduler is not None and not settings.event_streaming_enabled:
+        return await _fetch_scheduled(state, match_id, scheduler)
     
-    fetcher = SecureFetcher()
+    owned = fetcher is None
+    fetcher = fetcher or SecureFetcher()
+    handed_off = False
+    tracking = None
+    if state.get("raw_tracking_home") is None:
+        # Metrica open tracking data (Sample Game 1) for demo enrichment: Home and Away
+        # download concurrently while the event feed is opened
+        tracking = scheduler.tracking() if scheduler is not None else asyncio.gather(
+            fetcher.fetch_metrica_tracking("Home"), fetcher.fetch_metrica_tracking("Away"))
     try:
-        raw_events = await fetcher.fetch_statsbomb_events(match_id)
-        state["raw_event_data"] = {"match_id": match_id, "events": raw_events}
+        if settings.event_streaming_enabled:
+            # Pull the first batch here so HTTP failures surface in the fetcher; the rest
+            # of the array is parsed as it downloads while the enricher consumes batches
+            if scheduler is not None:
+                first, batches = await scheduler.stream(match_id, state["matches_to_process"], settings.event_stream_batch_size)
+            else:
+                batches = fetcher.stream_statsbomb_events(match_id, settings.event_stream_batch_size)
+                try:
+                    first = await batches.__anext__()
+                except StopAsyncIteration:
+                    first = []
+            state["raw_event_data"] = {"match_id": match_id, "event_batches": _owned_event_batches(first, batches, fetcher if owned else None)}
+            handed_off = True
+        else:
+            raw_events = await fetcher.fetch_statsbomb_events(match_id)
+            state["raw_event_data"] = {"match_id": match_id, "events": raw_events}
         
-        # Parallel fetch Metrica open tracking data (Sample Game 1) for the first match for demo enrichment
-        if state.get("raw_tracking_home") is None: 
+        if tracking is not None:
             try:
-                home_tracking = await fetcher.fetch_metrica_tracking("Home")
-                away_tracking = await fetcher.fetch_metrica_tracking("Away")
-                state["raw_tracking_home"] = home_tracking
-                state["raw_tracking_away"] = away_tracking
+                state["raw_tracking_home"], state["raw_tracking_away"] = await tracking
                 audit_log("fetch_tracking_success", "FetcherAgent", {"match_id": match_id})
             except Exception as e:
                 audit_log("fetch_tracking_warning", "FetcherAgent", {"match_id": match_id, "warning": "Tracking absent", "error": str(e)})
                 state["raw_tracking_home"] = None
                 state["raw_tracking_away"] = None
-        else:
-            # We already have tracking for the demo run
-            pass
             
         state["pipeline_status"] = "enriching"
     except Exception as e:
         state["errors"].append(f"Fetch failed for {match_id}: {str(e)}")
         state["pipeline_status"] = "supervisor" # fallback to supervisor to decide retry/skip
+        if tracking is not None and scheduler is not None:
+            # Shared with the next match; retrieve a failure now so it is never left unretrieved
+            tracking.add_done_callback(lambda f: f.cancelled() or f.exception())
+        elif tracking is not None:
+            tracking.cancel()
+            await asyncio.gather(tracking, return_exceptions=True)
+        if handed_off:
+            # The wrapper never started, so release the HTTP stream here and let finally close the client
+            await batches.aclose()
+            state["raw_event_data"] = None
+            handed_off = False
     finally:
-        await fetcher.close()
+        if owned and not handed_off:
+            await fetcher.close()
         
     return state
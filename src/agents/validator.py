@@ -1,4 +1,5 @@
 import json
+import numpy as np
 from src.models.state import PipelineState
 from src.tools.audit import audit_log
 from src.models.domain import MatchEnrichedPayload
@@ -9,8 +10,9 @@ class QualityValidator:
     Functions similarly to Great Expectations for data-quality.
     """
     def generate_report(self, payload: MatchEnrichedPayload) -> dict:
-        total_events = len(payload.events)
+        total_events = len(payload.events) + sum(len(b) for b in payload.event_blocks)
         total_shots = sum(1 for e in payload.events if e.shot_context is not None)
+        total_shots += sum(int((~np.isnan(b.xg)).sum()) for b in payload.event_blocks)
         
         home_goals = payload.match.home_score
         away_goals = payload.match.away_score
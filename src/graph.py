@@ -1,13 +1,19 @@
 import asyncio
-from langgraph.graph import StateGraph, END
+from functools import partial
 from src.models.state import PipelineState
 from src.agents.nodes import supervisor_node, fetcher_node
 from src.agents.enrich_load import enricher_node, loader_node
 from src.agents.validator import validator_node
 from src.tools.audit import audit_log
+from src.tools.fetch import SecureFetcher
+from src.tools.http_cache import HTTPCache
+from src.tools.scheduler import FetchScheduler, TokenBucket
+from src.tools.secure_db import StorageSession
+from config.settings import get_settings
 
 def route_from_supervisor(state: PipelineState):
     """Router dictates next step from Supervisor."""
+    from langgraph.graph import END
     if state["pipeline_status"] == "fetching" and state["matches_to_process"]:
         return "fetcher"
     elif state["pipeline_status"] == "done":
@@ -18,6 +24,7 @@ def route_from_supervisor(state: PipelineState):
 
 def route_from_fetcher(state: PipelineState):
     """Router dictates next step from Fetcher."""
+    from langgraph.graph import END
     if state["pipeline_status"] == "enriching":
         return "enricher"
     elif state["pipeline_status"] == "supervisor":
@@ -25,18 +32,32 @@ def route_from_fetcher(state: PipelineState):
     else:
         return END
 
-def build_graph():
+def route_from_enricher(state: PipelineState):
+    """A failed match goes back to the supervisor instead of being loaded."""
+    return "loader" if state["pipeline_status"] == "loading" else "supervisor"
+
+def route_from_loader(state: PipelineState):
+    """Only a stored match is validated; a failed load goes back to the supervisor."""
+    return "validator" if state["pipeline_status"] == "validating" else "supervisor"
+
+def build_graph(storage_session: StorageSession | None = None, fetcher: SecureFetcher | None = None,
+                scheduler: FetchScheduler | None = None):
     """
     Constructs the strictly-typed zero-trust LangGraph pipeline.
-    State transitions are explicitly routed and audited.
+    State transitions are explicitly routed and audited. Every loader call writes through
+    `storage_session`, the supervisor and fetcher share the pooled `fetcher`, and the fetcher
+    takes prefetched matches from `scheduler`, when given.
     """
+    # LangGraph is imported on demand to keep CLI and worker startup fast
+    from langgraph.graph import StateGraph, END
+    
     workflow = StateGraph(PipelineState)
     
     # Add Nodes
-    workflow.add_node("supervisor", supervisor_node)
-    workflow.add_node("fetcher", fetcher_node)
+    workflow.add_node("supervisor", partial(supervisor_node, fetcher=fetcher))
+    workflow.add_node("fetcher", partial(fetcher_node, fetcher=fetcher, scheduler=scheduler))
     workflow.add_node("enricher", enricher_node)
-    workflow.add_node("loader", loader_node)
+    workflow.add_node("loader", partial(loader_node, storage_session=storage_session))
     workflow.add_node("validator", validator_node)
 
     # Secure Routing Edges
@@ -54,9 +75,17 @@ def build_graph():
         {"enricher": "enricher", "supervisor": "supervisor", END: END}
     )
     
-    # Deterministic happy path handles payload directly
-    workflow.add_edge("enricher", "loader")
-    workflow.add_edge("loader", "validator")
+    # Happy path hands the payload straight on; a failed match skips to the supervisor
+    workflow.add_conditional_edges(
+        "enricher",
+        route_from_enricher,
+        {"loader": "loader", "supervisor": "supervisor"}
+    )
+    workflow.add_conditional_edges(
+        "loader",
+        route_from_loader,
+        {"validator": "validator", "supervisor": "supervisor"}
+    )
     
     # Validator feeds heavily filtered result back to orchestrator for next run
     workflow.add_edge("validator", "supervisor")
@@ -64,9 +93,14 @@ def build_graph():
     return workflow.compile()
 
 async def run_pipeline(target_date: str):
-    """Main execution point for the LangGraph."""
+    """
+    Main execution point for the LangGraph. One pooled, rate-limited SecureFetcher, its
+    FetchScheduler and one StorageSession are shared by
+    every node invocation of the run; the
+    session is flushed, pending downloads cancelled and the client closed when the run ends,
+    whether it completes or raises.
+    """
     audit_log("pipeline_start", "System", {"release": "2026-v1", "date": target_date})
-    graph = build_graph()
     
     initial_state = PipelineState(
         target_date=target_date,
@@ -80,6 +114,19 @@ async def run_pipeline(target_date: str):
         pipeline_status="planning"
     )
     
-    final_state = await graph.ainvoke(initial_state)
+    settings = get_settings()
+    limiter = TokenBucket(settings.fetch_rate_limit, settings.fetch_rate_burst)
+    cache = HTTPCache.from_settings() if settings.http_cache_enabled or settings.http_cache_offline else None
+    async with SecureFetcher(rate_limiter=limiter, cache=cache) as fetcher:
+        # Prefetches queued matches either way: whole feeds with streaming off, primed open
+        # streams (one batch held per match) with it on
+        scheduler = FetchScheduler.from_settings(fetcher)
+        try:
+            with StorageSession.from_settings() as storage:
+                # Five node steps per match (supervisor → validator) plus the planning and final supervisor steps
+                recursion_limit = 5 * settings.pipeline_max_matches + 10
+                final_state = await build_graph(storage, fetcher, scheduler).ainvoke(initial_state, {"recursion_limit": recursion_limit})
+        finally:
+            await scheduler.close()
     audit_log("pipeline_complete", "System", {"final_status": final_state["pipeline_status"], "errors": len(final_state["errors"])})
     return final_state
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional, List, Literal
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Optional, List, Literal, ClassVar
 from datetime import datetime
+import numpy as np
 
 class StrictModel(BaseModel):
     """Base model enforcing strict configuration for zero-trust data parsing."""
@@ -39,6 +40,8 @@ class PassContext(StrictModel):
     angle: float
     recipient: Optional[Player] = None
     is_progressive: bool = False
+    xa: float = Field(default=0.0, ge=0.0, le=1.0, description="xG of the shot this pass assisted, 0 when it led to none.")
+    assisted_shot_id: Optional[str] = None
 
 class ShotContext(StrictModel):
     xg: Optional[float] = Field(ge=0.0, le=1.0, description="Expected goals strictly bounded between 0 and 1.")
@@ -47,10 +50,11 @@ class ShotContext(StrictModel):
     body_part: str
     distance_to_goal: Optional[float] = Field(default=None, ge=0.0)
     angle_to_goal: Optional[float] = Field(default=None)
+    key_pass_id: Optional[str] = None # Assisting pass; its PassContext carries the xA credit
 
 class TrackingFrame(StrictModel):
     """
-    State-of-the-Art representation of a single 30fps optical tracking frame.
+    State-of-the-Art representation of a single optical tracking frame.
     Defines zero-trust bounding logic for X, Y coordinates (normalized 0-1) across both teams.
     """
     frame_id: int
@@ -62,6 +66,168 @@ class TrackingFrame(StrictModel):
     home_ppda: Optional[float] = None  # Passes Allowed Per Defensive Action at this frame
     away_ppda: Optional[float] = None
 
+# Zero-trust spatial bounds for tracking coordinates on the 120x80 pitch.
+# Players and ball legitimately leave the field of play, so allow a run-off margin.
+PITCH_LENGTH = 120.0
+PITCH_WIDTH = 80.0
+TRACKING_BOUNDS_MARGIN = 10.0
+
+class TrackingBlock(StrictModel):
+    """
+    Columnar representation of consecutive tracking frames. The frame rate is inferred from the
+    source timestamps and, when `tracking_target_fps` is set, may be decimated; `fps` carries
+    the rate of this block (mirrored in the payload's `tracking_fps`). Positions are contiguous float32 arrays of shape (frames, players, 2) in StatsBomb yards,
+    with NaN marking a player who is off the pitch. Bounds are enforced vectorized at construction,
+    replacing millions of per-frame `Location` objects with a handful of arrays.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    frame_id: np.ndarray
+    period: np.ndarray
+    timestamp_ms: np.ndarray
+    ball: np.ndarray
+    home: np.ndarray
+    away: np.ndarray
+    home_player_ids: List[str] = []
+    away_player_ids: List[str] = []
+    home_control: Optional[np.ndarray] = None # Spatial pitch control per frame, 0-1
+    away_control: Optional[np.ndarray] = None
+    fps: Optional[float] = Field(default=None, gt=0.0) # Sampling rate after any decimation
+
+    ARRAY_FIELDS: ClassVar[tuple] = ('frame_id', 'period', 'timestamp_ms', 'ball', 'home', 'away', 'home_control', 'away_control')
+
+    @field_validator('frame_id', 'timestamp_ms', mode='before')
+    @classmethod
+    def _as_int64(cls, v):
+        return np.ascontiguousarray(v, dtype=np.int64)
+
+    @field_validator('period', mode='before')
+    @classmethod
+    def _as_int16(cls, v):
+        return np.ascontiguousarray(v, dtype=np.int16)
+
+    @field_validator('ball', 'home', 'away', 'home_control', 'away_control', mode='before')
+    @classmethod
+    def _as_float32(cls, v):
+        return None if v is None else np.ascontiguousarray(v, dtype=np.float32)
+
+    @model_validator(mode='after')
+    def _check_bounds(self):
+        n = len(self.frame_id)
+        if self.frame_id.ndim != 1 or self.period.shape != (n,) or self.timestamp_ms.shape != (n,):
+            raise ValueError("frame_id, period and timestamp_ms must be aligned 1-D vectors")
+        if self.ball.shape != (n, 2):
+            raise ValueError(f"ball must have shape ({n}, 2), got {self.ball.shape}")
+        for side, ids in (('home', self.home_player_ids), ('away', self.away_player_ids)):
+            arr = getattr(self, side)
+            if arr.ndim != 3 or arr.shape[0] != n or arr.shape[2] != 2:
+                raise ValueError(f"{side} must have shape ({n}, players, 2), got {arr.shape}")
+            if ids and len(ids) != arr.shape[1]:
+                raise ValueError(f"{side}_player_ids does not match the {side} player axis")
+
+        if n and (self.period.min() < 1 or self.period.max() > 5):
+            raise ValueError("period must be between 1 and 5")
+        for name in ('ball', 'home', 'away'):
+            coords = getattr(self, name)
+            x, y = coords[..., 0], coords[..., 1]
+            # NaN means "not on the pitch"; anything else must be finite and within the run-off area
+            bad = ~np.isnan(x) & ~((x >= -TRACKING_BOUNDS_MARGIN) & (x <= PITCH_LENGTH + TRACKING_BOUNDS_MARGIN))
+            bad |= ~np.isnan(y) & ~((y >= -TRACKING_BOUNDS_MARGIN) & (y <= PITCH_WIDTH + TRACKING_BOUNDS_MARGIN))
+            if bad.any():
+                raise ValueError(f"{name} has {int(bad.sum())} coordinates outside the pitch bounds")
+        for name in ('home_control', 'away_control'):
+            self._check_control(name, getattr(self, name), n)
+        return self
+
+    @staticmethod
+    def _check_control(name: str, control, n: int):
+        if control is None:
+            return
+        if control.shape != (n,):
+            raise ValueError(f"{name} must have shape ({n},)")
+        if not ((control >= 0.0) & (control <= 1.0)).all():
+            raise ValueError(f"{name} must be between 0 and 1")
+
+    def __len__(self) -> int:
+        return len(self.frame_id)
+
+    def with_control(self, home_control, away_control) -> "TrackingBlock":
+        """
+        Copy carrying per-frame pitch control. Only the new vectors are checked; assigning them
+        on the model instead would revalidate every position array once per field.
+        """
+        update = {'home_control': self._as_float32(home_control), 'away_control': self._as_float32(away_control)}
+        for name, control in update.items():
+            self._check_control(name, control, len(self))
+        return self.model_copy(update=update)
+
+    def take(self, index) -> "TrackingBlock":
+        """New block holding the frames selected by a slice, mask or index array."""
+        fields = {name: None if getattr(self, name) is None else getattr(self, name)[index] for name in self.ARRAY_FIELDS}
+        return TrackingBlock(home_player_ids=self.home_player_ids, away_player_ids=self.away_player_ids, fps=self.fps, **fields)
+
+    @classmethod
+    def concat(cls, blocks: List["TrackingBlock"]) -> "TrackingBlock":
+        """Stitches consecutive blocks that share the same player layout."""
+        first = blocks[0]
+        fields = {}
+        for name in cls.ARRAY_FIELDS:
+            parts = [getattr(b, name) for b in blocks]
+            fields[name] = None if any(p is None for p in parts) else np.concatenate(parts)
+        return cls(home_player_ids=first.home_player_ids, away_player_ids=first.away_player_ids, fps=first.fps, **fields)
+
+    def to_frames(self) -> List[TrackingFrame]:
+        """Expands the block into per-frame objects (for small samples and compatibility only)."""
+        frames = []
+        for f in range(len(self)):
+            ball = self.ball[f]
+            frames.append(TrackingFrame(
+                frame_id=int(self.frame_id[f]),
+                period=int(self.period[f]),
+                timestamp_ms=int(self.timestamp_ms[f]),
+                ball_location=None if np.isnan(ball).any() else Location(x=float(ball[0]), y=float(ball[1])),
+                home_players=[Location(x=float(x), y=float(y)) for x, y in self.home[f] if not (np.isnan(x) or np.isnan(y))],
+                away_players=[Location(x=float(x), y=float(y)) for x, y in self.away[f] if not (np.isnan(x) or np.isnan(y))],
+                home_ppda=None if self.home_control is None else float(self.home_control[f]),
+                away_ppda=None if self.away_control is None else float(self.away_control[f]),
+            ))
+        return frames
+
+class PitchControlSummary(StrictModel):
+    """
+    Aggregates emitted by the spatial pitch-control surface engine.
+    Areas are expected controlled square yards per frame on the 120x80 pitch, held as aligned
+    NumPy vectors and checked vectorized, like `TrackingBlock`.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    grid_shape: List[int] = Field(min_length=2, max_length=2) # [nx, ny] cells
+    cell_area: float = Field(gt=0.0)
+    frame_ids: np.ndarray = Field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    home_area: np.ndarray = Field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    away_area: np.ndarray = Field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    mean_home_area: float = Field(default=0.0, ge=0.0)
+    mean_away_area: float = Field(default=0.0, ge=0.0)
+
+    @field_validator('frame_ids', mode='before')
+    @classmethod
+    def _as_int64(cls, v):
+        return np.ascontiguousarray(v, dtype=np.int64)
+
+    @field_validator('home_area', 'away_area', mode='before')
+    @classmethod
+    def _as_float64(cls, v):
+        return np.ascontiguousarray(v, dtype=np.float64)
+
+    @model_validator(mode='after')
+    def _check_aligned(self):
+        n = len(self.frame_ids)
+        if self.frame_ids.ndim != 1 or self.home_area.shape != (n,) or self.away_area.shape != (n,):
+            raise ValueError("frame_ids, home_area and away_area must be aligned 1-D vectors")
+        if (self.home_area < 0).any() or (self.away_area < 0).any():
+            raise ValueError("controlled areas must be non-negative")
+        return self
+
 class Event(StrictModel):
     event_id: str
     match_id: int
@@ -79,9 +245,138 @@ class Event(StrictModel):
     pass_context: Optional[PassContext] = None
     shot_context: Optional[ShotContext] = None
 
+class EventBlock(StrictModel):
+    """
+    Columnar representation of a batch of StatsBomb events for one match.
+    Every column is a 1-D array aligned on the event axis; NaN marks an absent location or
+    shot metric, -1 an absent player id and None an absent string. Ranges are enforced
+    vectorized at construction, so a backfill never materializes per-event `Event` objects.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    match_id: int
+    event_id: np.ndarray
+    index: np.ndarray
+    period: np.ndarray
+    timestamp: np.ndarray
+    minute: np.ndarray
+    second: np.ndarray
+    type_name: np.ndarray
+    team_id: np.ndarray # Possession team
+    team_name: np.ndarray
+    player_id: np.ndarray
+    player_name: np.ndarray
+    location: np.ndarray # (events, 2) StatsBomb yards
+    xg: np.ndarray
+    xa: np.ndarray # Credited to passes; NaN on every other event
+    shot_outcome: np.ndarray
+    body_part: np.ndarray
+    distance_to_goal: np.ndarray
+    angle_to_goal: np.ndarray
+    key_pass_id: np.ndarray
+    end_location: np.ndarray # (events, 2), passes only
+    pass_length: np.ndarray
+    pass_angle: np.ndarray
+    is_progressive: np.ndarray
+    recipient_id: np.ndarray
+    recipient_name: np.ndarray
+    assisted_shot_id: np.ndarray
+
+    ARRAY_FIELDS: ClassVar[tuple] = (
+        'event_id', 'index', 'period', 'timestamp', 'minute', 'second', 'type_name', 'team_id', 'team_name',
+        'player_id', 'player_name', 'location', 'xg', 'xa', 'shot_outcome', 'body_part', 'distance_to_goal', 'angle_to_goal',
+        'key_pass_id', 'end_location', 'pass_length', 'pass_angle', 'is_progressive', 'recipient_id', 'recipient_name', 'assisted_shot_id',
+    )
+
+    @field_validator('event_id', 'timestamp', 'type_name', 'team_name', 'player_name', 'shot_outcome', 'body_part',
+                     'key_pass_id', 'recipient_name', 'assisted_shot_id', mode='before')
+    @classmethod
+    def _as_object(cls, v):
+        return np.asarray(v, dtype=object)
+
+    @field_validator('index', 'minute', mode='before')
+    @classmethod
+    def _as_int32(cls, v):
+        return np.ascontiguousarray(v, dtype=np.int32)
+
+    @field_validator('period', 'second', mode='before')
+    @classmethod
+    def _as_int16(cls, v):
+        return np.ascontiguousarray(v, dtype=np.int16)
+
+    @field_validator('team_id', 'player_id', 'recipient_id', mode='before')
+    @classmethod
+    def _as_int64(cls, v):
+        return np.ascontiguousarray(v, dtype=np.int64)
+
+    @field_validator('location', 'xg', 'xa', 'distance_to_goal', 'angle_to_goal', 'end_location', 'pass_length', 'pass_angle', mode='before')
+    @classmethod
+    def _as_float64(cls, v):
+        return np.ascontiguousarray(v, dtype=np.float64)
+
+    @field_validator('is_progressive', mode='before')
+    @classmethod
+    def _as_bool(cls, v):
+        return np.ascontiguousarray(v, dtype=bool)
+
+    @model_validator(mode='after')
+    def _check_ranges(self):
+        n = len(self.event_id)
+        for name in self.ARRAY_FIELDS:
+            arr = getattr(self, name)
+            expected = (n, 2) if name in ('location', 'end_location') else (n,)
+            if arr.shape != expected:
+                raise ValueError(f"{name} must have shape {expected}, got {arr.shape}")
+        if not n:
+            return self
+
+        if self.index.min() < 1:
+            raise ValueError("index must be at least 1")
+        if self.period.min() < 1 or self.period.max() > 5:
+            raise ValueError("period must be between 1 and 5")
+        if self.minute.min() < 0:
+            raise ValueError("minute cannot be negative")
+        if self.second.min() < 0 or self.second.max() > 59:
+            raise ValueError("second must be between 0 and 59")
+        for name in ('xg', 'xa'):
+            values = getattr(self, name)
+            if (values < 0.0).any() or (values > 1.0).any(): # NaN compares False, so absent values pass
+                raise ValueError(f"{name} must be between 0 and 1")
+        for name in ('distance_to_goal', 'pass_length'):
+            if (getattr(self, name) < 0.0).any():
+                raise ValueError(f"{name} cannot be negative")
+        return self
+
+    def __len__(self) -> int:
+        return len(self.event_id)
+
+    def with_xa(self, xa) -> "EventBlock":
+        """
+        Copy carrying the match-wide expected-assists column. Only the new vector is checked;
+        assigning it on the model instead would revalidate every column of the block.
+        """
+        xa = self._as_float64(xa)
+        if xa.shape != (len(self),):
+            raise ValueError(f"xa must have shape ({len(self)},), got {xa.shape}")
+        if (xa < 0.0).any() or (xa > 1.0).any(): # NaN compares False, so non-passes pass
+            raise ValueError("xa must be between 0 and 1")
+        return self.model_copy(update={'xa': xa})
+
+    def take(self, index) -> "EventBlock":
+        """New block holding the events selected by a slice, mask or index array."""
+        return EventBlock(match_id=self.match_id, **{name: getattr(self, name)[index] for name in self.ARRAY_FIELDS})
+
+    @classmethod
+    def concat(cls, blocks: List["EventBlock"]) -> "EventBlock":
+        """Stitches blocks of the same match in order."""
+        return cls(match_id=blocks[0].match_id, **{name: np.concatenate([getattr(b, name) for b in blocks]) for name in cls.ARRAY_FIELDS})
+
 class MatchEnrichedPayload(StrictModel):
     match: Match
     events: List[Event]
-    tracking_frames: List[TrackingFrame] = []
+    event_blocks: List[EventBlock] = [] # Columnar events when normalized without per-row objects
+    tracking_blocks: List[TrackingBlock] = []
+    tracking_fps: Optional[float] = Field(default=None, gt=0.0) # Rate the stored tracking was decimated to
+    pitch_control_summary: Optional[PitchControlSummary] = None
     total_home_xg: float = Field(default=0.0, ge=0.0)
     total_away_xg: float = Field(default=0.0, ge=0.0)
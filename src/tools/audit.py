@@ -4,14 +4,14 @@ import logging
 from datetime import datetime
 from config.settings import get_settings
 
-settings = get_settings()
-
 def get_audit_logger():
     """Returns a logger that writes purely JSON formatted strings to an append-only file."""
     logger = logging.getLogger("football_gravity_audit")
-    logger.setLevel(getattr(logging, settings.log_level.upper(), logging.INFO))
     
     if not logger.handlers:
+        settings = get_settings()
+        logger.setLevel(getattr(logging, settings.log_level.upper(), logging.INFO))
+        
         # Ensure parent directory exists for zero-trust log persistence
         log_dir = os.path.dirname(settings.audit_log_path)
         if log_dir and not os.path.exists(log_dir):
@@ -0,0 +1,250 @@
+import io
+import os
+import struct
+from typing import BinaryIO
+
+# Container layout (all integers big-endian):
+#   header  = MAGIC (4) | version (1) | chunk_size (4) | nonce_prefix (8)
+#   chunk_i = AES-256-GCM(plaintext_i) | tag (16)
+# Chunk i uses nonce = nonce_prefix | i (4 bytes) and authenticates header | final_flag, so
+# chunks cannot be reordered, dropped, or truncated at a chunk boundary without failing.
+MAGIC = b"FGC1"
+VERSION = 1
+_HEADER = struct.Struct(">4sBI8s")
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1 << 20
+_HKDF_INFO = b"football-gravity chunked aes-256-gcm v1"
+
+class StreamCipher:
+    """
+    Chunked authenticated encryption for at-rest outputs of any size.
+
+    Data is sealed in fixed-size AES-256-GCM chunks, so encrypting or decrypting a file holds
+    one chunk in memory at a time and adds 16 bytes per chunk instead of Fernet's ~33% base64
+    inflation. The AES key is derived from the configured Fernet key with HKDF, so no new
+    secret has to be provisioned. Legacy single-token Fernet files are detected by their
+    missing header and still decrypt, for migration.
+    """
+    def __init__(self, fernet_key: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        # Deferred so importing the pipeline does not pay for cryptography
+        import base64
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+        if chunk_size <= 0 or chunk_size >= 1 << 32:
+            raise ValueError("chunk_size must be a positive 32-bit integer")
+        self.chunk_size = chunk_size
+        self.fernet = Fernet(fernet_key)
+        master = base64.urlsafe_b64decode(fernet_key)
+        key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_HKDF_INFO).derive(master)
+        self._aead = AESGCM(key)
+
+    @staticmethod
+    def is_chunked(prefix: bytes) -> bool:
+        return prefix[:len(MAGIC)] == MAGIC
+
+    def writer(self, dst: BinaryIO) -> "EncryptingWriter":
+        """Writable file object sealing everything written to it into `dst`; close it to finish the container."""
+        return EncryptingWriter(self, dst)
+
+    def encrypt_stream(self, src: BinaryIO, dst: BinaryIO) -> int:
+        """Encrypts `src` into `dst` chunk by chunk; returns the number of bytes written."""
+        with self.writer(dst) as sink:
+            while chunk := src.read(self.chunk_size):
+                sink.write(chunk)
+        return sink.sealed_bytes
+
+    def decrypt_stream(self, src: BinaryIO, dst: BinaryIO) -> int:
+        """
+        Decrypts a container (or a legacy Fernet token) from `src` into `dst`; returns the plaintext size.
+        Raises cryptography.exceptions.InvalidTag or InvalidToken on any tampering or truncation.
+        """
+        header = src.read(_HEADER.size)
+        if not self.is_chunked(header):
+            plaintext = self.fernet.decrypt(header + src.read())
+            dst.write(plaintext)
+            return len(plaintext)
+
+        if len(header) < _HEADER.size:
+            raise ValueError("Truncated encryption header")
+        _, version, chunk_size, prefix = _HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"Unsupported encryption container version: {version}")
+
+        sealed_size = chunk_size + TAG_SIZE
+        total, index = 0, 0
+        sealed = src.read(sealed_size)
+        while True:
+            following = src.read(sealed_size) if len(sealed) == sealed_size else b""
+            final = not following
+            chunk = self._aead.decrypt(prefix + struct.pack(">I", index), sealed, header + (b"\x01" if final else b"\x00"))
+            dst.write(chunk)
+            total += len(chunk)
+            if final:
+                return total
+            sealed, index = following, index + 1
+
+    def open_reader(self, path: str) -> BinaryIO:
+        """
+        Seekable plaintext view of an encrypted file. Only the chunks a read touches are decrypted,
+        so a Parquet reader fetching the footer and a few column chunks never holds the whole
+        file. Legacy Fernet files have no chunks and are decrypted whole into memory.
+        """
+        f = open(path, 'rb')
+        try:
+            header = f.read(_HEADER.size)
+            if self.is_chunked(header):
+                return DecryptingReader(self, f, header, os.fstat(f.fileno()).st_size)
+            legacy = header + f.read()
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+        return io.BytesIO(self.fernet.decrypt(legacy))
+
+    def encrypt(self, data: bytes) -> bytes:
+        out = io.BytesIO()
+        self.encrypt_stream(io.BytesIO(data), out)
+        return out.getvalue()
+
+    def decrypt(self, data: bytes) -> bytes:
+        out = io.BytesIO()
+        self.decrypt_stream(io.BytesIO(data), out)
+        return out.getvalue()
+
+class EncryptingWriter(io.RawIOBase):
+    """
+    Write side of the container as a file object, so serializers such as Parquet can write
+    straight into ciphertext without plaintext ever reaching disk. Holds at most one chunk
+    plus the pending write in memory; the last chunk is only sealed (as final) on close().
+    """
+    def __init__(self, cipher: StreamCipher, dst: BinaryIO):
+        self._cipher = cipher
+        self._dst = dst
+        self._buffer = bytearray()
+        self._index = 0
+        self._position = 0
+        self._header = _HEADER.pack(MAGIC, VERSION, cipher.chunk_size, os.urandom(8))
+        dst.write(self._header)
+        self.sealed_bytes = len(self._header)
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed EncryptingWriter")
+        self._buffer += data
+        self._position += len(data)
+        size = self._cipher.chunk_size
+        # Strictly greater: a full chunk may turn out to be the final one
+        while len(self._buffer) > size:
+            self._seal(bytes(self._buffer[:size]), final=False)
+            del self._buffer[:size]
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._seal(bytes(self._buffer), final=True)
+            self._buffer.clear()
+        super().close()
+
+    def abort(self):
+        """Closes without sealing a final chunk, so a partial write never authenticates."""
+        self._buffer.clear()
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+            return None
+        return super().__exit__(exc_type, exc, tb)
+
+    def _seal(self, chunk: bytes, final: bool):
+        if self._index >= 1 << 32:
+            raise ValueError("Stream too long for a 32-bit chunk counter")
+        nonce = self._header[-8:] + struct.pack(">I", self._index)
+        sealed = self._cipher._aead.encrypt(nonce, chunk, self._header + (b"\x01" if final else b"\x00"))
+        self._dst.write(sealed)
+        self.sealed_bytes += len(sealed)
+        self._index += 1
+
+class DecryptingReader(io.RawIOBase):
+    """
+    Random-access read side of the container. Chunk i sits at a fixed offset, so a seek maps to
+    one chunk, which is decrypted and authenticated on demand (the most recent one is kept).
+    The last chunk in the file must authenticate as final, so a file truncated at a chunk
+    boundary fails as soon as its tail, e.g. a Parquet footer, is read.
+    """
+    def __init__(self, cipher: StreamCipher, src: BinaryIO, header: bytes, file_size: int):
+        if len(header) < _HEADER.size:
+            raise ValueError("Truncated encryption header")
+        _, version, chunk_size, prefix = _HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"Unsupported encryption container version: {version}")
+        self._aead = cipher._aead
+        self._src = src
+        self._header = header
+        self._prefix = prefix
+        self._chunk_size = chunk_size
+        self._sealed_size = chunk_size + TAG_SIZE
+        body = file_size - _HEADER.size
+        self._chunks = max(1, -(-body // self._sealed_size))
+        last = body - (self._chunks - 1) * self._sealed_size
+        if last < TAG_SIZE:
+            raise ValueError("Truncated encrypted chunk")
+        self.size = (self._chunks - 1) * chunk_size + last - TAG_SIZE
+        self._position = 0
+        self._cached_index, self._cached = None, b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.size}[whence]
+        if base + offset < 0:
+            raise ValueError("negative seek position")
+        self._position = base + offset
+        return self._position
+
+    def _chunk(self, index: int) -> bytes:
+        if index != self._cached_index:
+            self._src.seek(_HEADER.size + index * self._sealed_size)
+            sealed = self._src.read(self._sealed_size)
+            final = index == self._chunks - 1
+            nonce = self._prefix + struct.pack(">I", index)
+            self._cached = self._aead.decrypt(nonce, sealed, self._header + (b"\x01" if final else b"\x00"))
+            self._cached_index = index
+        return self._cached
+
+    def read(self, size: int = -1) -> bytes:
+        end = self.size if size is None or size < 0 else min(self.size, self._position + size)
+        parts = []
+        while self._position < end:
+            index, offset = divmod(self._position, self._chunk_size)
+            part = self._chunk(index)[offset:offset + end - self._position]
+            parts.append(part)
+            self._position += len(part)
+        return b"".join(parts)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._src.close()
+            self._cached = b""
+        super().close()
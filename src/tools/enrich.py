@@ -1,6 +1,84 @@
 import math
+import os
+import json
+import hashlib
 import numpy as np
-from sklearn.linear_model import LogisticRegression
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+from config.settings import get_settings
+
+class XGGrid:
+    """
+    Precomputed xG lattice over the 120x80 StatsBomb pitch.
+    Lookups use bilinear interpolation, turning xG into an O(1) array lookup.
+
+    The angle feature is discontinuous on the post vertices themselves, so shots
+    within `post_radius` yards of a post (or off the pitch) are reported as NaN
+    and must be scored exactly by the caller. Everywhere else the interpolation
+    error versus `predict_proba` stays below ~2e-3 at the default 0.25 yd lattice.
+    """
+    PITCH_LENGTH = 120.0
+    PITCH_WIDTH = 80.0
+    POSTS = ((120.0, 36.0), (120.0, 44.0))
+
+    def __init__(self, values: np.ndarray, resolution: float, post_radius: float = 0.5):
+        self.values = values
+        self.resolution = resolution
+        self.post_radius = post_radius
+
+    @classmethod
+    def build(cls, model: "XGModel", resolution: float = 0.25) -> "XGGrid":
+        """Evaluates the fitted model once over every lattice vertex."""
+        gx = np.linspace(0.0, cls.PITCH_LENGTH, int(round(cls.PITCH_LENGTH / resolution)) + 1)
+        gy = np.linspace(0.0, cls.PITCH_WIDTH, int(round(cls.PITCH_WIDTH / resolution)) + 1)
+        xs, ys = np.meshgrid(gx, gy, indexing='ij')
+        xg = model._predict_xg_exact(xs.ravel(), ys.ravel()).reshape(xs.shape)
+        return cls(xg, resolution)
+
+    @classmethod
+    def load_or_build(cls, model: "XGModel", cache_dir: str, resolution: float = 0.25) -> "XGGrid":
+        """
+        Loads the lattice cached for this exact model, or builds and caches it.
+        The cache key is a hash of the fitted coefficients so a refit never reuses a stale grid.
+        """
+        path = os.path.join(cache_dir, f"xg_grid_{model.coefficients_hash(resolution)}.npy")
+        if os.path.exists(path):
+            return cls(np.load(path), resolution)
+
+        grid = cls.build(model, resolution)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, grid.values)
+        os.replace(tmp_path, path) # Atomic publish so concurrent workers never read a partial grid
+        return grid
+
+    def lookup(self, xs, ys) -> np.ndarray:
+        """Bilinear xG lookup. Returns NaN where the caller must fall back to the exact model."""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        nx, ny = self.values.shape
+
+        fx = np.nan_to_num(xs) / self.resolution
+        fy = np.nan_to_num(ys) / self.resolution
+        i = np.clip(np.floor(fx), 0, nx - 2).astype(np.intp)
+        j = np.clip(np.floor(fy), 0, ny - 2).astype(np.intp)
+        tx = fx - i
+        ty = fy - j
+
+        v = self.values
+        xg = (v[i, j] * (1 - tx) * (1 - ty) + v[i + 1, j] * tx * (1 - ty)
+              + v[i, j + 1] * (1 - tx) * ty + v[i + 1, j + 1] * tx * ty)
+
+        # Written as a negated in-bounds test so NaN coordinates are also routed to the exact model
+        off_pitch = ~((xs >= 0.0) & (xs <= self.PITCH_LENGTH) & (ys >= 0.0) & (ys <= self.PITCH_WIDTH))
+        near_post = np.zeros(xs.shape, dtype=bool)
+        for px, py in self.POSTS:
+            near_post |= np.hypot(px - xs, py - ys) <= self.post_radius
+
+        return np.where(off_pitch | near_post, np.nan, xg)
 
 class XGModel:
     """
@@ -12,8 +90,25 @@ class XGModel:
     This replaces naive standard logic with a scikit-learn model calibrated
     on real-world geometric probabilities.
     """
-    def __init__(self):
-        self.model = LogisticRegression(class_weight='balanced')
+    def __init__(self, coef=None, intercept=None):
+        """
+        Restores a calibrated model from persisted coefficients when given,
+        otherwise fits the logistic regression from the calibration set.
+        """
+        self.model = None
+        if coef is None or intercept is None:
+            self.model = self._fit()
+            coef, intercept = self.model.coef_, self.model.intercept_
+        self.coef_ = np.asarray(coef, dtype=np.float64).reshape(1, 2)
+        self.intercept_ = np.asarray(intercept, dtype=np.float64).reshape(1)
+        self.grid = None
+
+    @staticmethod
+    def _fit():
+        # sklearn is only needed for calibration, so keep it off the import path
+        from sklearn.linear_model import LogisticRegression
+
+        model = LogisticRegression(class_weight='balanced')
         # Simulate calibration from historical tracking data
         # Feature vector: [distance, angle_radians]
         # Goals tend to be hit close (<= 15) and with wide angle (>0.5 rad)
@@ -28,7 +123,42 @@ class XGModel:
         y_train = np.array([1, 1, 0, 0, 0, 1])
         
         # Fit logic strictly scoped
-        self.model.fit(X_train, y_train)
+        model.fit(X_train, y_train)
+        return model
+
+    @classmethod
+    def load(cls, path: str) -> "XGModel":
+        """Restores a model persisted with `save` without touching scikit-learn."""
+        with open(path, 'r', encoding='utf-8') as f:
+            params = json.load(f)
+        return cls(coef=params['coef'], intercept=params['intercept'])
+
+    def save(self, path: str):
+        """Persists the fitted coefficients so later processes skip refitting."""
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"coef": self.coef_.tolist(), "intercept": self.intercept_.tolist()}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def coefficients_hash(self, resolution: float = 0.25) -> str:
+        """Stable fingerprint of the fitted model, used to key precomputed artifacts."""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(self.coef_).tobytes())
+        digest.update(np.ascontiguousarray(self.intercept_).tobytes())
+        digest.update(repr(float(resolution)).encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def enable_grid(self, cache_dir: str | None = None, resolution: float = 0.25) -> XGGrid:
+        """Switches batch scoring to the interpolated lattice (cached on disk when `cache_dir` is set)."""
+        if self.grid is None or self.grid.resolution != resolution:
+            if cache_dir:
+                self.grid = XGGrid.load_or_build(self, cache_dir, resolution)
+            else:
+                self.grid = XGGrid.build(self, resolution)
+        return self.grid
         
     def _calculate_distance_and_angle(self, x: float, y: float):
         """
@@ -59,15 +189,68 @@ class XGModel:
             
         return distance, angle
 
+    def _calculate_distance_and_angle_batch(self, xs, ys):
+        """
+        Vectorized counterpart of `_calculate_distance_and_angle` over coordinate arrays.
+        Returns (distance, angle) arrays with the same shape as the inputs.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+
+        distance = np.hypot(120.0 - xs, 40.0 - ys)
+
+        d1 = np.hypot(120.0 - xs, 36.0 - ys)
+        d2 = np.hypot(120.0 - xs, 44.0 - ys)
+        width = 8.0 # Yard
+
+        # Shots taken on a post vertex have no defined angle, mirror the scalar fallback
+        denom = 2.0 * d1 * d2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_theta = np.clip((d1**2 + d2**2 - width**2) / denom, -1.0, 1.0)
+        angle = np.where(denom > 0.0, np.arccos(cos_theta), 0.0)
+
+        return distance, angle
+
+    def _predict_proba(self, features: np.ndarray) -> np.ndarray:
+        # Binary logistic regression: identical to LogisticRegression.predict_proba(...)[:, 1]
+        logits = features @ self.coef_.T + self.intercept_
+        return 1.0 / (1.0 + np.exp(-logits[:, 0]))
+
     def predict_xg(self, x: float, y: float) -> float:
         distance, angle = self._calculate_distance_and_angle(x, y)
         
         # Predict probability
         features = np.array([[distance, angle]])
-        prob = self.model.predict_proba(features)[0][1] # Probability of class 1 (Goal)
+        prob = self._predict_proba(features)[0] # Probability of class 1 (Goal)
         
         # Ensure strict bounds as directed
         return max(0.0, min(1.0, float(prob)))
+
+    def _predict_xg_exact(self, xs, ys, distance=None, angle=None) -> np.ndarray:
+        if distance is None or angle is None:
+            distance, angle = self._calculate_distance_and_angle_batch(xs, ys)
+        if distance.size == 0:
+            return np.empty(distance.shape)
+
+        features = np.column_stack((distance.ravel(), angle.ravel()))
+        prob = self._predict_proba(features).reshape(distance.shape)
+        return np.clip(prob, 0.0, 1.0)
+
+    def predict_xg_batch(self, xs, ys):
+        """
+        Scores many shot locations in a single vectorized pass.
+        Returns (xg, distance, angle) arrays aligned with the input coordinates.
+        When a grid is enabled, xG comes from the interpolated lattice instead of `predict_proba`.
+        """
+        distance, angle = self._calculate_distance_and_angle_batch(xs, ys)
+        if self.grid is None:
+            return self._predict_xg_exact(xs, ys, distance, angle), distance, angle
+
+        xg = self.grid.lookup(xs, ys)
+        exact = np.isnan(xg)
+        if exact.any():
+            xg[exact] = self._predict_xg_exact(None, None, distance[exact], angle[exact])
+        return np.clip(xg, 0.0, 1.0), distance, angle
         
     def calculate_pitch_control(self, tracking_frame, home_team_possession: bool) -> dict:
         """
@@ -97,8 +280,219 @@ class XGModel:
         away_ratio = 1.0 - (min_away_dist / total_dist)
         
         return {'home': home_ratio, 'away': away_ratio}
+
+    def calculate_pitch_control_batch(self, home_positions, away_positions, ball_positions):
+        """
+        Vectorized pitch control over many tracking frames at once.
+        Takes (frames x players x 2) arrays for both squads and a (frames x 2) ball array.
+        Players who are off the pitch are NaN and ignored. A squad with nobody on the pitch
+        cedes full control to the other; a frame without a ball splits control 0.5/0.5.
+        Returns (home, away) control arrays of shape (frames,).
+        """
+        ball = np.asarray(ball_positions, dtype=np.float64).reshape(-1, 1, 2)
+
+        def _squad(positions):
+            squad = np.asarray(positions, dtype=np.float64)
+            # An absent squad may be passed as an empty list
+            return squad if squad.size else np.empty((len(ball), 0, 2))
+
+        # Closest player per squad; NaN distances (absent player or ball) never win the min
+        def _closest(players):
+            dist = np.sqrt(np.sum((players - ball) ** 2, axis=-1))
+            return np.min(np.where(np.isnan(dist), np.inf, dist), axis=1, initial=np.inf)
+
+        min_home_dist = _closest(_squad(home_positions))
+        min_away_dist = _closest(_squad(away_positions))
+
+        home_seen = np.isfinite(min_home_dist)
+        away_seen = np.isfinite(min_away_dist)
+        both = home_seen & away_seen
+
+        # Proportional assignment (closer = higher control), same formula as the per-frame path
+        safe_home = np.where(both, min_home_dist, 0.0)
+        safe_away = np.where(both, min_away_dist, 0.0)
+        total_dist = safe_home + safe_away + 0.001
+
+        # A squad alone near the ball owns the frame outright
+        home_ratio = np.select([both, home_seen, away_seen], [1.0 - safe_home / total_dist, 1.0, 0.0], default=0.5)
+        away_ratio = np.select([both, away_seen, home_seen], [1.0 - safe_away / total_dist, 1.0, 0.0], default=0.5)
+
+        return home_ratio, away_ratio
     
-_xg_model_instance = XGModel()
+@dataclass
+class PitchControlSurfaceResult:
+    """Per-frame output of the surface engine. Areas are expected controlled square yards."""
+    home_area: np.ndarray
+    away_area: np.ndarray
+    surfaces: np.ndarray | None = None # (frames, ny, nx) home control probability, only when requested
+
+def _attach(name: str, shape: tuple, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _pool_context():
+    """forkserver where the platform has it, else spawn; children start from a clean interpreter."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+def _surface_worker(engine: "PitchControlSurfaceEngine", spec: dict, start: int, stop: int):
+    """Process-pool task: reads positions from and writes results into shared memory, returns nothing."""
+    handles = []
+    try:
+        arrays = {}
+        for key, (name, shape, dtype) in spec.items():
+            shm, arr = _attach(name, shape, dtype)
+            handles.append(shm)
+            arrays[key] = arr
+        engine._compute_range(arrays, start, stop)
+    finally:
+        for shm in handles:
+            shm.close()
+
+class PitchControlSurfaceEngine:
+    """
+    Spatial pitch control over a configurable grid of cells (default 50x32) on the 120x80 pitch.
+    For every frame and cell, home control is a logistic function of how much closer the
+    nearest home player is than the nearest away player: p = 1 / (1 + exp((d_home - d_away) / decay)).
+
+    Work is vectorized over cells and players, and frame ranges are fanned out to a
+    process pool that reads positions from and writes results into shared memory, so a
+    full ~140k-frame match never gets pickled between processes.
+    """
+    def __init__(self, grid_shape: tuple = (50, 32), decay: float = 4.0, workers: int | None = None,
+                 frames_per_task: int = 4096, frames_per_batch: int = 64):
+        nx, ny = grid_shape
+        self.grid_shape = (nx, ny)
+        self.decay = decay
+        self.workers = workers or os.cpu_count() or 1
+        self.frames_per_task = frames_per_task
+        self.frames_per_batch = frames_per_batch
+
+        # Cell centres, flattened row-major as (ny, nx) so surfaces reshape to image order
+        cell_x = (np.arange(nx) + 0.5) * (120.0 / nx)
+        cell_y = (np.arange(ny) + 0.5) * (80.0 / ny)
+        gx, gy = np.meshgrid(cell_x, cell_y)
+        self.cells = np.column_stack((gx.ravel(), gy.ravel())).astype(np.float32)
+        self._cell_sq = (self.cells ** 2).sum(axis=1)
+        self.cell_area = (120.0 / nx) * (80.0 / ny)
+
+    def _nearest(self, players: np.ndarray) -> np.ndarray:
+        """(B, P, 2) positions -> (B, cells) distance to the nearest on-pitch player (inf if none)."""
+        n_frames, n_players, _ = players.shape
+        if n_players == 0:
+            return np.full((n_frames, len(self.cells)), np.inf, dtype=np.float32)
+
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2 turns the player x cell distances into one matmul
+        flat = players.reshape(-1, 2).astype(np.float32)
+        missing = np.isnan(flat).any(axis=1)
+        flat[missing] = 0.0
+        sq = (flat ** 2).sum(axis=1)[:, None] - 2.0 * (flat @ self.cells.T) + self._cell_sq[None, :]
+        sq[missing] = np.inf
+        nearest = sq.reshape(n_frames, n_players, -1).min(axis=1)
+        return np.sqrt(np.maximum(nearest, 0.0))
+
+    def surface(self, home: np.ndarray, away: np.ndarray) -> np.ndarray:
+        """Home control probability per cell for a batch of frames, shape (B, cells)."""
+        d_home = self._nearest(home)
+        d_away = self._nearest(away)
+        with np.errstate(invalid='ignore', over='ignore'):
+            prob = 1.0 / (1.0 + np.exp((d_home - d_away) / self.decay))
+        # Nobody on the pitch for either side (inf - inf) leaves every cell contested
+        return np.nan_to_num(prob, nan=0.5).astype(np.float32)
+
+    def _compute_range(self, arrays: dict, start: int, stop: int):
+        for lo in range(start, stop, self.frames_per_batch):
+            hi = min(lo + self.frames_per_batch, stop)
+            prob = self.surface(arrays['home'][lo:hi], arrays['away'][lo:hi])
+            home_area = prob.sum(axis=1, dtype=np.float64) * self.cell_area
+            arrays['home_area'][lo:hi] = home_area
+            arrays['away_area'][lo:hi] = len(self.cells) * self.cell_area - home_area
+            if 'surfaces' in arrays:
+                nx, ny = self.grid_shape
+                arrays['surfaces'][lo:hi] = prob.reshape(hi - lo, ny, nx)
+
+    def compute(self, home_positions, away_positions, keep_surfaces: bool = False) -> PitchControlSurfaceResult:
+        """
+        Runs the surface model over every frame. Set `keep_surfaces` to also return the
+        full (frames, ny, nx) probability cube; summaries alone are O(frames) memory.
+        """
+        home = np.ascontiguousarray(home_positions, dtype=np.float32)
+        away = np.ascontiguousarray(away_positions, dtype=np.float32)
+        n_frames = len(home)
+        nx, ny = self.grid_shape
+
+        shapes = {
+            'home': (home.shape, np.float32),
+            'away': (away.shape, np.float32),
+            'home_area': ((n_frames,), np.float64),
+            'away_area': ((n_frames,), np.float64),
+        }
+        if keep_surfaces:
+            shapes['surfaces'] = ((n_frames, ny, nx), np.float32)
+
+        tasks = [(lo, min(lo + self.frames_per_task, n_frames)) for lo in range(0, n_frames, self.frames_per_task)]
+        if self.workers <= 1 or len(tasks) <= 1:
+            arrays = {key: np.empty(shape, dtype=dtype) for key, (shape, dtype) in shapes.items()}
+            arrays['home'], arrays['away'] = home, away
+            self._compute_range(arrays, 0, n_frames)
+        else:
+            arrays, handles, spec = {}, [], {}
+            try:
+                for key, (shape, dtype) in shapes.items():
+                    nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+                    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+                    handles.append(shm)
+                    arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                    spec[key] = (shm.name, shape, dtype)
+                arrays['home'][...] = home
+                arrays['away'][...] = away
+
+                # Never fork: the caller typically has threads and a running event loop
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)), mp_context=_pool_context()) as pool:
+                    futures = [pool.submit(_surface_worker, self, spec, lo, hi) for lo, hi in tasks]
+                    for future in futures:
+                        future.result()
+
+                # Copy results out before the shared segments are released
+                arrays = {key: np.array(arrays[key]) for key in shapes if key not in ('home', 'away')}
+            finally:
+                for shm in handles:
+                    shm.close()
+                    shm.unlink()
+
+        return PitchControlSurfaceResult(
+            home_area=arrays['home_area'],
+            away_area=arrays['away_area'],
+            surfaces=arrays.get('surfaces'),
+        )
+
+_xg_model_instance: XGModel | None = None
 
 def get_xg_model() -> XGModel:
+    """
+    Lazily builds the shared xG model on first use from the persisted coefficients. When
+    none are persisted the model is fitted in memory for this process only and a warning is
+    audited; writing coefficients is the explicit `fit_xg_model` step, never a getter side effect.
+    """
+    global _xg_model_instance
+    settings = get_settings()
+    if _xg_model_instance is None:
+        path = settings.get_xg_model_path()
+        if os.path.exists(path):
+            _xg_model_instance = XGModel.load(path)
+        else:
+            from src.tools.audit import audit_log
+
+            audit_log("xg_model_unpersisted", "EnricherAgent", {"path": path, "warning": "No persisted coefficients; fitted in memory. Run `main.py --fit-xg-model`."})
+            _xg_model_instance = XGModel()
+    if settings.xg_grid_enabled:
+        _xg_model_instance.enable_grid(settings.xg_grid_cache_dir, settings.xg_grid_resolution)
     return _xg_model_instance
+
+def fit_xg_model(path: str | None = None) -> XGModel:
+    """Fits the xG model, persists its coefficients (to xg_model_path by default) and makes it the shared instance."""
+    global _xg_model_instance
+    model = XGModel()
+    model.save(path or get_settings().get_xg_model_path())
+    _xg_model_instance = model
+    return model
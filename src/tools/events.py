@@ -0,0 +1,373 @@
+from typing import List
+import numpy as np
+from pydantic import OnErrorOmit, TypeAdapter, ValidationError
+from src.models.domain import Event, EventBlock
+
+SHOT_OUTCOMES = ('Goal', 'Saved', 'Off T', 'Post', 'Wayward', 'Blocked')
+GOAL_CENTER = (120.0, 40.0)
+PROGRESSIVE_RATIO = 0.75 # A progressive pass ends at most 75% of its start distance from goal
+
+_event_list_adapter: TypeAdapter | None = None
+_event_adapter: TypeAdapter | None = None
+
+def get_event_list_adapter() -> TypeAdapter:
+    """
+    Shared `TypeAdapter(List[OnErrorOmit[Event]])`, built once on first use.
+    Invalid rows are omitted from the result instead of failing the whole list.
+    """
+    global _event_list_adapter
+    if _event_list_adapter is None:
+        _event_list_adapter = TypeAdapter(List[OnErrorOmit[Event]])
+    return _event_list_adapter
+
+def _get_event_adapter() -> TypeAdapter:
+    global _event_adapter
+    if _event_adapter is None:
+        _event_adapter = TypeAdapter(Event)
+    return _event_adapter
+
+def map_raw_event(raw_event: dict, match_id: int, shot_xg: tuple | None = None, pass_geometry: tuple | None = None) -> dict:
+    """
+    StatsBomb to Our Schema mapper. Produces a plain dict shaped like `Event`
+    so a whole match can be validated in one call. `shot_xg` carries the
+    (xg, distance, angle) scored for this shot by the batch xG pass, and `pass_geometry`
+    the (length, angle, is_progressive) computed for this pass by `pass_geometry_batch`.
+    May raise TypeError/ValueError on malformed scalars, which callers treat as a dropped row.
+    """
+    player_info = None
+    if 'player' in raw_event:
+        player_info = {'player_id': raw_event['player'].get('id', 0), 'player_name': raw_event['player'].get('name', 'Unknown')}
+
+    loc = None
+    if 'location' in raw_event and len(raw_event['location']) >= 2:
+        loc = {'x': float(raw_event['location'][0]), 'y': float(raw_event['location'][1])}
+
+    shot_context = None
+    if shot_xg is not None and loc:
+        xg_value, distance, angle = shot_xg
+        sb_outcome = raw_event.get('shot', {}).get('outcome', {}).get('name', 'Saved')
+        body_part = raw_event.get('shot', {}).get('body_part', {}).get('name', 'Foot')
+
+        # Coerce to literal
+        if sb_outcome not in SHOT_OUTCOMES:
+            sb_outcome = 'Saved'
+
+        shot_context = {
+            'xg': xg_value,
+            'xa': None, # Credited to the assisting pass instead
+            'outcome': sb_outcome,
+            'body_part': body_part,
+            'distance_to_goal': distance,
+            'angle_to_goal': angle,
+            'key_pass_id': raw_event['shot'].get('key_pass_id') if isinstance(raw_event.get('shot'), dict) else None,
+        }
+
+    pass_context = None
+    if pass_geometry is not None:
+        length, angle, is_progressive = pass_geometry
+        raw_pass = raw_event['pass']
+        recipient = raw_pass.get('recipient')
+        pass_context = {
+            'length': length,
+            'angle': angle,
+            'recipient': {'player_id': recipient.get('id', 0), 'player_name': recipient.get('name', 'Unknown')} if isinstance(recipient, dict) else None,
+            'is_progressive': is_progressive,
+            'assisted_shot_id': raw_pass.get('assisted_shot_id'),
+        }
+
+    return {
+        'event_id': str(raw_event.get('id')),
+        'match_id': match_id,
+        'index': int(raw_event.get('index', 1)),
+        'period': int(raw_event.get('period', 1)),
+        'timestamp': str(raw_event.get('timestamp')),
+        'minute': int(raw_event.get('minute', 0)),
+        'second': int(raw_event.get('second', 0)),
+        'type_name': str(raw_event.get('type', {}).get('name', 'Unknown')),
+        'possession_team': {'team_id': raw_event.get('possession_team', {}).get('id', 0), 'team_name': raw_event.get('possession_team', {}).get('name', 'Unknown')},
+        'player': player_info,
+        'location': loc,
+        'pass_context': pass_context,
+        'shot_context': shot_context,
+    }
+
+def pass_geometry_batch(start: np.ndarray, end: np.ndarray) -> tuple:
+    """
+    Vectorized pass length, angle (radians, StatsBomb orientation) and progressive flag
+    for (passes, 2) start and end locations.
+    """
+    start = np.asarray(start, dtype=np.float64).reshape(-1, 2)
+    end = np.asarray(end, dtype=np.float64).reshape(-1, 2)
+    delta = end - start
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    angle = np.arctan2(delta[:, 1], delta[:, 0])
+    goal = np.asarray(GOAL_CENTER)
+    start_to_goal = np.hypot(*(goal - start).T)
+    end_to_goal = np.hypot(*(goal - end).T)
+    return length, angle, end_to_goal <= PROGRESSIVE_RATIO * start_to_goal
+
+def _positions(event_ids: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Row of each key in `event_ids` (-1 when absent or None), via one sort and a binary search."""
+    if not len(event_ids) or not len(keys):
+        return np.full(len(keys), -1, dtype=np.int64)
+    keys = np.array([k if isinstance(k, str) else '' for k in keys], dtype=object)
+    order = np.argsort(event_ids, kind='stable')
+    sorted_ids = event_ids[order]
+    pos = np.minimum(np.searchsorted(sorted_ids, keys), len(sorted_ids) - 1)
+    found = (sorted_ids[pos] == keys) & (keys != '')
+    return np.where(found, order[pos], -1)
+
+def expected_assists(event_ids, is_pass, xg, key_pass_ids, assisted_shot_ids) -> np.ndarray:
+    """
+    Match-level xA: each pass is credited with the xG of the shot it assisted, linked through the
+    shot's `key_pass_id` and, for shots that lack one, the pass's `assisted_shot_id`.
+    Inputs are aligned arrays over every event of the match; returns xA per event
+    (0 for passes that assisted nothing, NaN for non-passes).
+    """
+    event_ids = np.asarray(event_ids, dtype=object)
+    is_pass = np.asarray(is_pass, dtype=bool)
+    xg = np.asarray(xg, dtype=np.float64)
+    is_shot = ~np.isnan(xg)
+    xa = np.where(is_pass, 0.0, np.nan)
+
+    # Shot -> pass through the event-id index
+    to_pass = _positions(event_ids, np.asarray(key_pass_ids, dtype=object))
+    linked = is_shot & (to_pass >= 0)
+    linked[linked] &= is_pass[to_pass[linked]]
+    np.maximum.at(xa, to_pass[linked], xg[linked])
+
+    # Pass -> shot for links only recorded on the pass side
+    to_shot = _positions(event_ids, np.asarray(assisted_shot_ids, dtype=object))
+    linked = is_pass & (to_shot >= 0)
+    linked[linked] &= is_shot[to_shot[linked]]
+    xa[linked] = np.maximum(xa[linked], xg[to_shot[linked]])
+    return xa
+
+def assign_event_xa(events: List[Event]):
+    """Fills `PassContext.xa` across every validated event of a match."""
+    is_pass = [e.pass_context is not None for e in events]
+    xa = expected_assists(
+        [e.event_id for e in events],
+        is_pass,
+        [e.shot_context.xg if e.shot_context is not None and e.shot_context.xg is not None else np.nan for e in events],
+        [e.shot_context.key_pass_id if e.shot_context is not None else None for e in events],
+        [e.pass_context.assisted_shot_id if e.pass_context is not None else None for e in events],
+    )
+    for row in np.flatnonzero(np.asarray(is_pass, dtype=bool) & (xa > 0.0)):
+        events[row].pass_context.xa = float(xa[row])
+
+def assign_block_xa(blocks: List[EventBlock]) -> List[EventBlock]:
+    """
+    Blocks of a match with the pass `xa` column filled match-wide, so links may cross stream
+    batches. Returns new blocks; the inputs are left as they were.
+    """
+    if not blocks:
+        return blocks
+    column = lambda name: np.concatenate([getattr(b, name) for b in blocks])
+    xa = expected_assists(column('event_id'), ~np.isnan(column('pass_length')), column('xg'), column('key_pass_id'), column('assisted_shot_id'))
+    bounds = np.cumsum([0] + [len(b) for b in blocks])
+    return [block.with_xa(xa[lo:hi]) for block, lo, hi in zip(blocks, bounds[:-1], bounds[1:])]
+
+def _describe(err: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'event'}: {e['msg']}" for e in err.errors())
+
+def validate_event_batch(mapped: List[dict]) -> tuple:
+    """
+    Validates mapped events in a single `TypeAdapter` call, keeping the strict/`extra='forbid'`
+    guarantees of `Event`.
+
+    Returns (events, failures) where failures is a list of (row, message) for the rows that
+    were dropped. Invalid rows are omitted by the list validator, so only those rows are
+    validated again on their own to recover the error for the audit log.
+    """
+    events = get_event_list_adapter().validate_python(mapped)
+    if len(events) == len(mapped):
+        return events, []
+    return _isolate_failures(mapped, events)
+
+def _isolate_failures(mapped: List[dict], events: list) -> tuple:
+    """Aligns survivors back to their input rows by (event_id, index) and explains the gaps."""
+    adapter = _get_event_adapter()
+    failures, j = [], 0
+    for row, data in enumerate(mapped):
+        if j < len(events) and isinstance(data, dict) \
+                and events[j].event_id == data.get('event_id') and events[j].index == data.get('index'):
+            j += 1
+            continue
+        try:
+            adapter.validate_python(data)
+        except ValidationError as e:
+            failures.append((row, _describe(e)))
+            continue
+        # A duplicated (event_id, index) key made the alignment ambiguous; validate row by row instead
+        return _validate_rows(mapped)
+    return events, failures
+
+def _validate_rows(mapped: List[dict]) -> tuple:
+    adapter = _get_event_adapter()
+    events, failures = [], []
+    for row, data in enumerate(mapped):
+        try:
+            events.append(adapter.validate_python(data))
+        except ValidationError as e:
+            failures.append((row, _describe(e)))
+    return events, failures
+
+def _int_column(values: list) -> tuple:
+    """int() semantics over a column, returning (int64 array, mask of rows that could not convert)."""
+    try:
+        return np.array(values, dtype=np.int64), np.zeros(len(values), dtype=bool)
+    except (TypeError, ValueError, OverflowError):
+        out, bad = np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+        for i, v in enumerate(values):
+            try:
+                out[i] = int(v)
+            except (TypeError, ValueError, OverflowError):
+                bad[i] = True
+        return out, bad
+
+def _str_mask(values: list, optional: bool = False) -> np.ndarray:
+    """Rows whose value is not a str (strict `Event` typing), allowing None when optional."""
+    return np.fromiter((not (type(v) is str or (optional and v is None)) for v in values), dtype=bool, count=len(values))
+
+def _nested(rows: list, key: str, sub: str, default):
+    return [r[key].get(sub, default) if isinstance(r.get(key), dict) else default for r in rows]
+
+def _locations(rows: list, key: str = 'location') -> tuple:
+    """(events, 2) float64 locations with NaN for absent ones, plus a mask of malformed coordinates."""
+    loc = np.full((len(rows), 2), np.nan)
+    bad = np.zeros(len(rows), dtype=bool)
+    for i, r in enumerate(rows):
+        point = r.get(key)
+        if point is None:
+            continue
+        try:
+            if len(point) >= 2:
+                loc[i] = float(point[0]), float(point[1])
+        except (TypeError, ValueError):
+            bad[i] = True
+    return loc, bad
+
+def normalize_event_block(raw_events: list, match_id: int, xg_model=None) -> tuple:
+    """
+    Maps a batch of raw StatsBomb events straight into an `EventBlock`.
+
+    Each field is pulled into a typed column once and range checks run on whole arrays.
+    Rows failing coercion, range or uniqueness checks are removed before the block is built.
+    Returns (block, drops) where drops are (event_id, error) pairs for the audit log.
+    Shots with a location are scored through `xg_model.predict_xg_batch` in one call.
+    """
+    n = len(raw_events)
+    rows = [r if isinstance(r, dict) else {} for r in raw_events]
+    event_id = np.array([str(r.get('id')) for r in rows], dtype=object)
+
+    index, bad_index = _int_column([r.get('index', 1) for r in rows])
+    period, bad_period = _int_column([r.get('period', 1) for r in rows])
+    minute, bad_minute = _int_column([r.get('minute', 0) for r in rows])
+    second, bad_second = _int_column([r.get('second', 0) for r in rows])
+    team_id, bad_team_id = _int_column(_nested(rows, 'possession_team', 'id', 0))
+    has_player = np.fromiter((isinstance(r.get('player'), dict) for r in rows), dtype=bool, count=n)
+    player_id, bad_player_id = _int_column(_nested(rows, 'player', 'id', 0))
+    player_id[~has_player] = -1
+    location, bad_location = _locations(rows)
+
+    type_name = np.array([str(r['type'].get('name', 'Unknown')) if isinstance(r.get('type'), dict) else 'Unknown' for r in rows], dtype=object)
+    team_name = _nested(rows, 'possession_team', 'name', 'Unknown')
+    player_name = [r['player'].get('name', 'Unknown') if has else None for r, has in zip(rows, has_player)]
+
+    # Pass columns: a pass gets geometry when both of its ends are known
+    passes = [r['pass'] if isinstance(r.get('pass'), dict) else {} for r in rows]
+    end_location, _ = _locations(passes, key='end_location')
+    is_pass = (type_name == 'Pass') & ~np.isnan(location).any(axis=1) & np.isfinite(end_location).all(axis=1)
+    has_recipient = is_pass & np.fromiter((isinstance(p.get('recipient'), dict) for p in passes), dtype=bool, count=n)
+    recipient_id, bad_recipient_id = _int_column([p['recipient'].get('id', 0) if has else -1 for p, has in zip(passes, has_recipient)])
+    recipient_name = [p['recipient'].get('name', 'Unknown') if has else None for p, has in zip(passes, has_recipient)]
+    assisted_shot_id = [p.get('assisted_shot_id') if is_p else None for p, is_p in zip(passes, is_pass)]
+    key_pass_id = [r['shot'].get('key_pass_id') if isinstance(r.get('shot'), dict) else None for r in rows]
+
+    # Each check is (field, rows failing it, message); a row is reported for the first check it fails
+    checks = [
+        ('event', np.fromiter((not isinstance(r, dict) for r in raw_events), dtype=bool, count=n), "not an object"),
+        ('index', bad_index | (index < 1), "must be an integer >= 1"),
+        ('period', bad_period | (period < 1) | (period > 5), "must be an integer between 1 and 5"),
+        ('minute', bad_minute | (minute < 0), "must be an integer >= 0"),
+        ('second', bad_second | (second < 0) | (second > 59), "must be an integer between 0 and 59"),
+        ('possession_team.team_id', bad_team_id, "must be an integer"),
+        ('possession_team.team_name', _str_mask(team_name), "must be a string"),
+        ('player.player_id', bad_player_id, "must be an integer"),
+        ('player.player_name', _str_mask(player_name, optional=True), "must be a string"),
+        ('location', bad_location | (~np.isfinite(location).all(axis=1) & ~np.isnan(location).all(axis=1)), "must be two finite numbers"),
+        ('pass_context.recipient.player_id', bad_recipient_id, "must be an integer"),
+        ('pass_context.recipient.player_name', _str_mask(recipient_name, optional=True), "must be a string"),
+        ('pass_context.assisted_shot_id', _str_mask(assisted_shot_id, optional=True), "must be a string"),
+        ('shot_context.key_pass_id', _str_mask(key_pass_id, optional=True), "must be a string"),
+    ]
+    keep = np.ones(n, dtype=bool)
+    drops = []
+    for field, bad, message in checks:
+        failing = bad & keep
+        drops.extend((event_id[r], f"{field}: {message}") for r in np.flatnonzero(failing))
+        keep &= ~bad
+
+    # Event ids are the events table key, so a repeated id keeps its first occurrence only
+    seen = set()
+    for r in np.flatnonzero(keep):
+        if event_id[r] in seen:
+            keep[r] = False
+            drops.append((event_id[r], "event_id: duplicate within match"))
+        seen.add(event_id[r])
+
+    xg = np.full(n, np.nan)
+    distance = np.full(n, np.nan)
+    angle = np.full(n, np.nan)
+    shot_outcome = np.full(n, None, dtype=object)
+    body_part = np.full(n, None, dtype=object)
+    is_shot = keep & (type_name == 'Shot') & ~np.isnan(location[:, 0])
+    shot_rows = np.flatnonzero(is_shot)
+    if len(shot_rows) and xg_model is not None:
+        xg[shot_rows], distance[shot_rows], angle[shot_rows] = xg_model.predict_xg_batch(location[shot_rows, 0], location[shot_rows, 1])
+        for r in shot_rows:
+            shot = rows[r].get('shot') if isinstance(rows[r].get('shot'), dict) else {}
+            outcome = shot.get('outcome', {}).get('name', 'Saved') if isinstance(shot.get('outcome'), dict) else 'Saved'
+            shot_outcome[r] = outcome if outcome in SHOT_OUTCOMES else 'Saved' # Coerce to literal
+            body_part[r] = str(shot['body_part'].get('name', 'Foot')) if isinstance(shot.get('body_part'), dict) else 'Foot'
+    key_pass_id = np.where(~np.isnan(xg), np.array(key_pass_id, dtype=object), None)
+
+    pass_length = np.full(n, np.nan)
+    pass_angle = np.full(n, np.nan)
+    is_progressive = np.zeros(n, dtype=bool)
+    pass_rows = np.flatnonzero(is_pass)
+    pass_length[pass_rows], pass_angle[pass_rows], is_progressive[pass_rows] = pass_geometry_batch(location[pass_rows], end_location[pass_rows])
+    end_location[~is_pass] = np.nan
+    xa = np.where(is_pass, 0.0, np.nan) # Linked to assisted shots match-wide by `assign_block_xa`
+
+    block = EventBlock(
+        match_id=match_id,
+        event_id=event_id[keep],
+        index=index[keep],
+        period=period[keep],
+        timestamp=np.array([str(r.get('timestamp')) for r in rows], dtype=object)[keep],
+        minute=minute[keep],
+        second=second[keep],
+        type_name=type_name[keep],
+        team_id=team_id[keep],
+        team_name=np.array(team_name, dtype=object)[keep],
+        player_id=player_id[keep],
+        player_name=np.array(player_name, dtype=object)[keep],
+        location=location[keep],
+        xg=xg[keep],
+        xa=xa[keep],
+        shot_outcome=shot_outcome[keep],
+        body_part=body_part[keep],
+        distance_to_goal=distance[keep],
+        angle_to_goal=angle[keep],
+        key_pass_id=key_pass_id[keep],
+        end_location=end_location[keep],
+        pass_length=pass_length[keep],
+        pass_angle=pass_angle[keep],
+        is_progressive=is_progressive[keep],
+        recipient_id=recipient_id[keep],
+        recipient_name=np.array(recipient_name, dtype=object)[keep],
+        assisted_shot_id=np.array(assisted_shot_id, dtype=object)[keep],
+    )
+    return block, drops
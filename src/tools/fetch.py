@@ -2,20 +2,110 @@ import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from config.settings import get_settings
 from src.tools.audit import audit_log
+from src.tools.http_cache import CacheMissError
+from src.tools.jsonstream import JSONArrayStream
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+import asyncio
 import json
 
-settings = get_settings()
+async def _replay(body: bytes, chunk_size: int = 1 << 16):
+    for i in range(0, len(body), chunk_size):
+        yield body[i:i + chunk_size]
+
+def _http2_available() -> bool:
+    try:
+        import h2 # noqa: F401 - optional, pulled in by httpx[http2]
+    except ImportError:
+        return False
+    return True
+
+def _transport(mode: str, cassette_dir: str, verify, http2: bool, limits: httpx.Limits):
+    """Custom transport for record/replay runs; None lets httpx build its own pooled one."""
+    if mode == 'live':
+        return None
+    from src.tools.replay import Cassette, RecordingTransport, ReplayTransport
+
+    audit_log("fetch_http_mode", "FetcherAgent", {"mode": mode, "cassette": cassette_dir})
+    if mode == 'replay':
+        return ReplayTransport(Cassette(cassette_dir))
+    return RecordingTransport(httpx.AsyncHTTPTransport(verify=verify, http2=http2, limits=limits), Cassette(cassette_dir))
 
 class SecureFetcher:
     """
     Zero-trust fetcher strictly enforcing HTTPS, TLS validation, and exponential backoff
     to prevent pipeline failure on intermittent API drops.
+
+    One instance is meant to live for a whole pipeline run: its client keeps a bounded pool
+    of keep-alive connections, so matches after the first reuse an open TLS session instead
+    of handshaking again. HTTP/2 is used when enabled and the `h2` package is installed, and
+    responses are requested compressed and decoded transparently.
+    `verify` is passed to httpx (a CA bundle path or SSLContext for private endpoints).
+    With a `rate_limiter` (see `TokenBucket`) every request, retries included, first takes a
+    token and every response status is reported back, so throttling slows the whole run.
+    With an `HTTPCache`, feeds already on disk are revalidated with their ETag/Last-Modified
+    and a 304 is served from the cache (downloaded again if the cached copy is corrupt); in
+    offline mode the network is never used. Cache reads and writes run in worker threads.
+    `http_mode` 'record' saves every response to a cassette under `http_cassette_dir`, and
+    'replay' serves that cassette instead of the network (see `src.tools.replay`).
     """
-    def __init__(self):
+    def __init__(self, verify=True, rate_limiter=None, cache=None):
+        settings = get_settings()
+        http2 = settings.http2_enabled and _http2_available()
+        if settings.http2_enabled and not http2:
+            audit_log("fetch_config_warning", "FetcherAgent", {"warning": "HTTP/2 requested but h2 is not installed; using HTTP/1.1"})
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
         self.client = httpx.AsyncClient(
-            verify=True,      # Strict TLS
-            timeout=15.0      # Hard limits on network hangs
+            verify=verify,    # Strict TLS
+            timeout=settings.http_timeout, # Hard limits on network hangs
+            http2=http2,
+            limits=limits,
+            transport=_transport(settings.http_mode, settings.http_cassette_dir, verify, http2, limits),
+            headers={"Accept-Encoding": "gzip, deflate"},
+            event_hooks={"request": [self._before_request], "response": [self._after_response]},
         )
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+
+    async def _before_request(self, request: httpx.Request):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+
+    async def _after_response(self, response: httpx.Response):
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(response.status_code, response.headers.get("Retry-After"))
+
+    async def _get(self, url: str) -> tuple:
+        """(body, cache outcome) for `url`: 'hit' offline, 'revalidated' on a 304, else 'miss' or 'off'."""
+        if self.cache is None:
+            response = await self.client.get(url)
+            response.raise_for_status()
+            return response.content, "off"
+        if self.cache.offline:
+            return await asyncio.to_thread(self.cache.read, url), "hit" # CacheMissError when never fetched
+        # The first lookup decrypts the index and each one stats the blob, so keep it off the loop
+        entry = await asyncio.to_thread(self.cache.lookup, url)
+        response = await self.client.get(url, headers=self.cache.conditional_headers(entry))
+        if response.status_code == 304 and entry is not None:
+            body = await self._read_cached(url)
+            if body is not None:
+                return body, "revalidated"
+            response = await self.client.get(url) # Cached copy was corrupt; download it again
+        response.raise_for_status()
+        await asyncio.to_thread(self.cache.store, url, response.content, response.headers)
+        return response.content, "miss"
+
+    async def _read_cached(self, url: str) -> bytes | None:
+        """Cached body after a 304, decrypted off the event loop; None if it failed its integrity check."""
+        try:
+            return await asyncio.to_thread(self.cache.read, url)
+        except CacheMissError as e:
+            audit_log("fetch_cache_invalid", "FetcherAgent", {"url": url, "error": str(e)})
+            return None
 
     @retry(
         retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)),
@@ -25,14 +115,13 @@ class SecureFetcher:
     )
     async def fetch_statsbomb_matches(self, competition_id: int, season_id: int) -> list:
         """Fetch match metadata for a specific competition and season."""
-        url = f"{settings.statsbomb_github_url}/matches/{competition_id}/{season_id}.json"
+        url = f"{get_settings().statsbomb_github_url}/matches/{competition_id}/{season_id}.json"
         audit_log("fetch_start", "FetcherAgent", {"source": "StatsBomb", "url": url, "type": "matches"})
         
         try:
-            response = await self.client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            audit_log("fetch_success", "FetcherAgent", {"source": "StatsBomb", "type": "matches", "size_bytes": len(response.content)})
+            body, cache = await self._get(url)
+            data = json.loads(body)
+            audit_log("fetch_success", "FetcherAgent", {"source": "StatsBomb", "type": "matches", "size_bytes": len(body), "cache": cache})
             return data
         except Exception as e:
             audit_log("fetch_error", "FetcherAgent", {"source": "StatsBomb", "type": "matches", "error": str(e)})
@@ -46,19 +135,95 @@ class SecureFetcher:
     )
     async def fetch_statsbomb_events(self, match_id: int) -> dict:
         """Fetch raw event data from StatsBomb open data gracefully."""
-        url = f"{settings.statsbomb_github_url}/events/{match_id}.json"
+        url = f"{get_settings().statsbomb_github_url}/events/{match_id}.json"
         audit_log("fetch_start", "FetcherAgent", {"source": "StatsBomb", "url": url, "match_id": match_id})
         
         try:
-            response = await self.client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            audit_log("fetch_success", "FetcherAgent", {"source": "StatsBomb", "match_id": match_id, "size_bytes": len(response.content)})
+            body, cache = await self._get(url)
+            data = json.loads(body)
+            audit_log("fetch_success", "FetcherAgent", {"source": "StatsBomb", "match_id": match_id, "size_bytes": len(body), "cache": cache})
             return data
         except Exception as e:
             audit_log("fetch_error", "FetcherAgent", {"source": "StatsBomb", "match_id": match_id, "error": str(e)})
             raise
 
+    async def stream_statsbomb_events(self, match_id: int, batch_size: int = 500) -> AsyncIterator[List[dict]]:
+        """
+        Stream raw event data in batches, parsing the JSON array as bytes arrive.
+        Only the current batch and the unparsed tail of the response are held in memory.
+        Connection failures are retried with the same backoff as the buffered fetch,
+        but only until the first batch has been handed out, so no event is ever yielded twice.
+        """
+        url = f"{get_settings().statsbomb_github_url}/events/{match_id}.json"
+        audit_log("fetch_start", "FetcherAgent", {"source": "StatsBomb", "url": url, "match_id": match_id, "mode": "stream"})
+        
+        attempts, yielded = 4, False
+        for attempt in range(1, attempts + 1):
+            size_bytes, n_events, writer = 0, 0, None
+            try:
+                async with self._open_event_stream(url) as (chunks, cache, writer):
+                    parser = JSONArrayStream()
+                    batch = []
+                    async for chunk in chunks:
+                        size_bytes += len(chunk)
+                        if writer is not None:
+                            await asyncio.to_thread(writer.write, chunk)
+                        batch.extend(parser.feed(chunk))
+                        while len(batch) >= batch_size:
+                            n_events += batch_size
+                            yielded = True
+                            yield batch[:batch_size]
+                            batch = batch[batch_size:]
+                    batch.extend(parser.close())
+                    if writer is not None:
+                        await asyncio.to_thread(writer.commit) # Only a complete, well-formed feed is cached
+                        writer = None
+                    if batch:
+                        n_events += len(batch)
+                        yielded = True
+                        yield batch
+                audit_log("fetch_success", "FetcherAgent", {"source": "StatsBomb", "match_id": match_id, "size_bytes": size_bytes, "events": n_events, "mode": "stream", "cache": cache})
+                return
+            except (httpx.RequestError, httpx.HTTPStatusError) as e:
+                if yielded or attempt == attempts:
+                    audit_log("fetch_error", "FetcherAgent", {"source": "StatsBomb", "match_id": match_id, "error": str(e)})
+                    raise
+                await asyncio.sleep(min(10, 2 ** attempt))
+            except Exception as e:
+                audit_log("fetch_error", "FetcherAgent", {"source": "StatsBomb", "match_id": match_id, "error": str(e)})
+                raise
+            finally:
+                if writer is not None:
+                    writer.abort()
+
+    @asynccontextmanager
+    async def _open_event_stream(self, url: str):
+        """
+        (byte chunks, cache outcome, cache writer or None) for a streamed feed: replayed from the
+        cache when offline or on a 304, otherwise read off the wire while the writer caches it.
+        """
+        if self.cache is not None and self.cache.offline:
+            yield _replay(await asyncio.to_thread(self.cache.read, url)), "hit", None
+            return
+        entry = await asyncio.to_thread(self.cache.lookup, url) if self.cache is not None else None
+        headers = self.cache.conditional_headers(entry) if self.cache is not None else {}
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code != 304 or entry is None:
+                yield await self._wire(url, response)
+                return
+            body = await self._read_cached(url)
+            if body is not None:
+                yield _replay(body), "revalidated", None
+                return
+        # The revalidated copy was corrupt and has been dropped; download it again
+        async with self.client.stream("GET", url) as response:
+            yield await self._wire(url, response)
+
+    async def _wire(self, url: str, response: httpx.Response) -> tuple:
+        response.raise_for_status()
+        writer = await asyncio.to_thread(self.cache.writer, url, response.headers) if self.cache is not None else None
+        return response.aiter_bytes(), "miss" if writer is not None else "off", writer
+
     @retry(
         retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)),
         stop=stop_after_attempt(4),
@@ -67,17 +232,24 @@ class SecureFetcher:
     )
     async def fetch_metrica_tracking(self, home_or_away: str) -> str:
         """Fetch raw tracking CSV data from Metrica open GitHub securely."""
-        url = f"https://raw.githubusercontent.com/metrica-sports/sample-data/master/data/Sample_Game_1/Sample_Game_1_RawTrackingData_{home_or_away}_Team.csv"
+        url = f"{get_settings().metrica_base_url}/Sample_Game_1/Sample_Game_1_RawTrackingData_{home_or_away}_Team.csv"
         audit_log("fetch_start", "FetcherAgent", {"source": "Metrica", "url": url, "type": f"tracking_{home_or_away}"})
         
         try:
-            response = await self.client.get(url)
-            response.raise_for_status()
-            audit_log("fetch_success", "FetcherAgent", {"source": "Metrica", "type": f"tracking_{home_or_away}", "size_bytes": len(response.content)})
-            return response.text
+            body, cache = await self._get(url)
+            audit_log("fetch_success", "FetcherAgent", {"source": "Metrica", "type": f"tracking_{home_or_away}", "size_bytes": len(body), "cache": cache})
+            return body.decode('utf-8')
         except Exception as e:
             audit_log("fetch_error", "FetcherAgent", {"source": "Metrica", "type": f"tracking_{home_or_away}", "error": str(e)})
             raise
 
     async def close(self):
         await self.client.aclose()
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.flush)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
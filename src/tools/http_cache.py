@@ -0,0 +1,237 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from config.settings import get_settings
+from src.tools.segments import _atomic_write
+
+class CacheMissError(LookupError):
+    """Raised when a URL has no usable cached body: never cached, or dropped after failing its integrity check."""
+
+class HTTPCache:
+    """
+    On-disk cache of raw feed bodies, compressed and encrypted at rest like the rest of our data.
+
+    Layout:
+        <root>/index.enc             URL -> {sha256, etag, last_modified, size, last_used}
+        <root>/blobs/<sha256>.enc    zlib-compressed body sealed with StreamCipher
+
+    Bodies are content-addressed, so identical feeds behind different URLs are stored once,
+    and every read is checked against its hash. Entries carry the validators the server sent
+    so callers can revalidate with If-None-Match / If-Modified-Since instead of downloading
+    again. Stored blobs are capped at `max_bytes` by evicting least-recently-used URLs; a body
+    that alone would exceed the cap is not cached at all.
+    With `offline` set, callers must serve from the cache and never touch the network.
+
+    A blob that fails decryption or its hash check is dropped and reported as a miss, so callers
+    download it again. Recency updates from reads only mark the index dirty; it is written with
+    the next store or by flush(). Methods are safe to call from worker threads.
+    """
+    INDEX = 'index.enc'
+
+    def __init__(self, root: str, cipher, max_bytes: int, offline: bool = False):
+        self.root = root
+        self.cipher = cipher
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._index = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_settings(cls) -> "HTTPCache":
+        from src.tools.cipher import StreamCipher
+
+        settings = get_settings()
+        cipher = StreamCipher(settings.get_fernet_bytes(), settings.encryption_chunk_size)
+        return cls(settings.http_cache_dir, cipher, settings.http_cache_max_bytes, settings.http_cache_offline)
+
+    @property
+    def index(self) -> dict:
+        with self._lock:
+            if self._index is None:
+                path = os.path.join(self.root, self.INDEX)
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        self._index = json.loads(self.cipher.decrypt(f.read()))
+                else:
+                    self._index = {}
+            return self._index
+
+    def _save_index(self):
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            sealed = self.cipher.encrypt(json.dumps(self.index).encode('utf-8'))
+            _atomic_write(os.path.join(self.root, self.INDEX), lambda f: f.write(sealed))
+            self._dirty = False
+
+    def flush(self):
+        """Writes pending recency updates to the index; call once the run is done with the cache."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'blobs', f"{digest}.enc")
+
+    def lookup(self, url: str) -> dict | None:
+        entry = self.index.get(url)
+        if entry is not None and not os.path.exists(self._blob_path(entry["sha256"])):
+            return None # Blob removed underneath us; treat as a miss
+        return entry
+
+    def conditional_headers(self, entry: dict | None) -> dict:
+        """Revalidation headers for a cached entry (empty when there is nothing to revalidate)."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, url: str) -> bytes:
+        """Cached body of `url`, marking it recently used. CacheMissError when absent or corrupt."""
+        entry = self.lookup(url)
+        if entry is None:
+            raise CacheMissError(url)
+        try:
+            plaintext = io.BytesIO()
+            with open(self._blob_path(entry["sha256"]), 'rb') as f:
+                self.cipher.decrypt_stream(f, plaintext)
+            body = zlib.decompress(plaintext.getvalue())
+            if hashlib.sha256(body).hexdigest() != entry["sha256"]:
+                raise ValueError("content hash mismatch")
+        except (InvalidTag, InvalidToken, zlib.error, ValueError, OSError) as e:
+            self._purge(entry["sha256"])
+            raise CacheMissError(f"{url}: cached body dropped ({type(e).__name__}: {e})") from e
+        with self._lock:
+            entry["last_used"] = time.time()
+            self._dirty = True
+        return body
+
+    def _purge(self, digest: str):
+        """Drops a corrupt blob and every URL sharing it, so the next store writes it afresh."""
+        with self._lock:
+            for url in [u for u, e in self.index.items() if e["sha256"] == digest]:
+                del self.index[url]
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+            self._save_index()
+
+    def writer(self, url: str, headers) -> "CacheWriter":
+        """Incremental writer storing a body as it streams in; call commit() once it is complete."""
+        return CacheWriter(self, url, headers.get("ETag"), headers.get("Last-Modified"))
+
+    def store(self, url: str, body: bytes, headers) -> dict | None:
+        writer = self.writer(url, headers)
+        writer.write(body)
+        return writer.commit()
+
+    def _publish(self, url: str, digest: str, size: int, stored: int, etag: str | None, last_modified: str | None) -> dict:
+        entry = {"sha256": digest, "etag": etag, "last_modified": last_modified, "size": size, "stored_bytes": stored, "last_used": time.time()}
+        with self._lock:
+            previous = self.index.get(url)
+            self.index[url] = entry
+            if previous and previous["sha256"] != digest:
+                self._drop_blob_if_unreferenced(previous["sha256"])
+            self._evict()
+            self._save_index()
+        return entry
+
+    def _forget(self, url: str):
+        """Drops `url` so no stale validators are sent for a body that is no longer cached."""
+        with self._lock:
+            entry = self.index.pop(url, None)
+            if entry is not None:
+                self._drop_blob_if_unreferenced(entry["sha256"])
+                self._save_index()
+
+    def _evict(self):
+        """Drops least-recently-used URLs until the distinct blobs they reference fit in max_bytes."""
+        blobs = {}
+        for entry in self.index.values():
+            blobs[entry["sha256"]] = entry["stored_bytes"]
+        total = sum(blobs.values())
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            if self._drop_blob_if_unreferenced(entry["sha256"]):
+                total -= blobs[entry["sha256"]]
+
+    def _drop_blob_if_unreferenced(self, digest: str) -> bool:
+        if any(e["sha256"] == digest for e in self.index.values()):
+            return False
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return True
+
+class CacheWriter:
+    """
+    Compresses, hashes and encrypts a body chunk by chunk into a temp blob, published on commit().
+    Once the blob outgrows the cache's `max_bytes` the rest of the body is ignored and commit()
+    caches nothing, returning None.
+    """
+    def __init__(self, cache: HTTPCache, url: str, etag: str | None, last_modified: str | None):
+        self._cache = cache
+        self._url = url
+        self._etag = etag
+        self._last_modified = last_modified
+        self._hash = hashlib.sha256()
+        self._compressor = zlib.compressobj(6)
+        self._size = 0
+        os.makedirs(os.path.join(cache.root, 'blobs'), exist_ok=True)
+        self._tmp = os.path.join(cache.root, 'blobs', f"{uuid.uuid4().hex}.tmp")
+        self._file = open(self._tmp, 'wb')
+        self._sink = cache.cipher.writer(self._file)
+        self._oversize = False
+
+    def write(self, chunk: bytes):
+        if self._oversize:
+            return
+        self._hash.update(chunk)
+        self._size += len(chunk)
+        self._sink.write(self._compressor.compress(chunk))
+        if self._sink.tell() > self._cache.max_bytes:
+            self._oversize = True
+            self.abort()
+
+    def commit(self) -> dict | None:
+        if not self._oversize:
+            self._sink.write(self._compressor.flush())
+            self._sink.close()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            stored = os.path.getsize(self._tmp)
+            self._oversize = stored > self._cache.max_bytes
+        if self._oversize:
+            # Publishing would evict it straight away along with everything else
+            self.abort()
+            self._cache._forget(self._url)
+            return None
+        digest = self._hash.hexdigest()
+        path = self._cache._blob_path(digest)
+        if os.path.exists(path):
+            os.remove(self._tmp) # Same content already cached under another URL or version
+        else:
+            os.replace(self._tmp, path)
+        return self._cache._publish(self._url, digest, self._size, stored, self._etag, self._last_modified)
+
+    def abort(self):
+        """Discards a body that did not arrive completely."""
+        self._sink.abort()
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
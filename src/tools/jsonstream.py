@@ -0,0 +1,97 @@
+import codecs
+import json
+from typing import Iterable, Iterator, List
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+class JSONArrayStream:
+    """
+    Incremental parser for a top-level JSON array such as a StatsBomb event feed.
+
+    Bytes are fed as they arrive off the wire; every element that has been fully
+    received is returned straight away, so only the unparsed tail of the document
+    is ever buffered. Elements are decoded with the stdlib `json` scanner, and
+    UTF-8 sequences split across chunk boundaries are reassembled by an
+    incremental decoder.
+    """
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._scanner = json.JSONDecoder()
+        self._buffer = ''
+        self._started = False   # Opening '[' consumed
+        self._expect_value = True  # Next token is an element rather than ',' or ']'
+        self._first = True      # No element parsed yet, so ']' may close an empty array
+        self._finished = False  # Closing ']' consumed
+
+    def feed(self, data: bytes) -> List:
+        """Consumes a chunk of bytes and returns every element completed by it."""
+        self._buffer += self._decoder.decode(data)
+        return self._drain(final=False)
+
+    def close(self) -> List:
+        """Signals end of input, returning any trailing element and validating the closing bracket."""
+        self._buffer += self._decoder.decode(b'', final=True)
+        items = self._drain(final=True)
+        if not self._finished:
+            raise ValueError("JSON array stream ended before its closing bracket")
+        return items
+
+    def _drain(self, final: bool) -> List:
+        items = []
+        buf, pos, n = self._buffer, 0, len(self._buffer)
+        while True:
+            while pos < n and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos == n:
+                break
+
+            if self._finished:
+                raise ValueError(f"Unexpected data after JSON array: {buf[pos:pos + 20]!r}")
+
+            if not self._started:
+                if buf[pos] != '[':
+                    raise ValueError(f"Expected a JSON array, found {buf[pos:pos + 20]!r}")
+                self._started = True
+                pos += 1
+                continue
+
+            char = buf[pos]
+            if not self._expect_value:
+                if char == ',':
+                    self._expect_value = True
+                elif char == ']':
+                    self._finished = True
+                else:
+                    raise ValueError(f"Expected ',' or ']' in JSON array, found {buf[pos:pos + 20]!r}")
+                pos += 1
+                continue
+
+            if char == ']' and self._first:
+                self._finished = True
+                pos += 1
+                continue
+
+            try:
+                item, end = self._scanner.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break # Element is still arriving
+            if not final and not isinstance(item, (dict, list, str)) and (end == n or buf[end] not in _DELIMITERS):
+                break # A bare number may still be arriving (e.g. "-0" before ".5")
+
+            items.append(item)
+            pos = end
+            self._first = False
+            self._expect_value = False
+
+        self._buffer = buf[pos:]
+        return items
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """Yields the elements of a JSON array delivered as an iterable of byte chunks."""
+    parser = JSONArrayStream()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from config.settings import get_settings
+
+class DecryptedTableCache:
+    """
+    Byte-bounded LRU of decrypted, decoded Arrow tables keyed by (path, mtime, size) and the
+    projection and filters they were read with.
+
+    A rewritten or replaced `.enc` file gets a new key, so stale plaintext is never served and
+    simply ages out. Tables larger than the whole budget are returned but not kept. Safe to
+    share between threads (Streamlit sessions, decryption workers).
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._tables = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path: str, columns: list | None = None, filters: list | None = None) -> tuple:
+        """File version plus the projection and filters, so differently shaped reads are cached apart."""
+        stat = os.stat(path)
+        shape = (None if columns is None else tuple(columns),
+                 None if not filters else tuple((c, op, tuple(v) if isinstance(v, (list, set, tuple)) else v) for c, op, v in filters))
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, shape)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def get(self, key: tuple):
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def put(self, key: tuple, table):
+        size = table.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._tables.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._tables[key] = table
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._tables.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self._bytes = 0
+
+# Process-wide cache shared by the dashboard, demo report and batch jobs.
+# Call get_table_cache.cache_clear() after changing the reader settings (e.g. in tests).
+@lru_cache(maxsize=1)
+def get_table_cache() -> DecryptedTableCache:
+    return DecryptedTableCache(get_settings().reader_cache_bytes)
+
+def decrypt_table(path: str, cipher, columns: list | None = None, filters: list | None = None):
+    """
+    Decodes one encrypted Parquet file into an Arrow table, reading only `columns` and the rows
+    matching `filters` ((column, op, value) triples, ANDed, in pyarrow's filter syntax). Chunks
+    are decrypted as Parquet asks for them, so row groups pruned by their statistics and columns
+    left out are never decrypted. Columns an older file lacks are skipped; a filter on one
+    matches no rows.
+    """
+    import pyarrow.parquet as pq
+
+    with cipher.open_reader(path) as source:
+        schema = pq.ParquetFile(source).schema_arrow
+        present = [c for c in columns if c in schema.names] if columns is not None else None
+        if filters and any(column not in schema.names for column, _, _ in filters):
+            empty = schema.empty_table()
+            return empty.select(present) if present is not None else empty
+        return pq.read_table(source, columns=present, filters=filters or None)
+
+def read_tables(paths: list, cipher, cache: DecryptedTableCache | None = None, workers: int | None = None,
+                columns: list | None = None, filters: list | None = None) -> list:
+    """
+    Arrow tables for `paths`, in order, each projected and filtered as in `decrypt_table`.
+    Cached tables are reused; the misses are decrypted and decoded concurrently on a thread pool
+    (AES-GCM and Parquet decoding both release the GIL).
+    """
+    cache = cache if cache is not None else get_table_cache()
+    keys = [cache.key(path, columns, filters) for path in paths]
+    tables = [cache.get(key) for key in keys]
+    missing = [i for i, table in enumerate(tables) if table is None]
+    if not missing:
+        return tables
+
+    workers = min(workers or get_settings().reader_workers or os.cpu_count() or 1, len(missing))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment-decrypt") as pool:
+            loaded = list(pool.map(lambda i: decrypt_table(paths[i], cipher, columns, filters), missing))
+    else:
+        loaded = [decrypt_table(paths[i], cipher, columns, filters) for i in missing]
+
+    for i, table in zip(missing, loaded):
+        cache.put(keys[i], table)
+        tables[i] = table
+    return tables
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import httpx
+from src.tools.segments import _atomic_write
+
+# Connection-level headers that describe how the original body travelled, not the body itself
+_HOP_HEADERS = frozenset({'connection', 'keep-alive', 'transfer-encoding', 'content-length'})
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+class Cassette:
+    """
+    Directory of recorded HTTP responses, keyed by method and URL.
+
+    Layout:
+        <root>/index.json              "GET <url>" -> {status, headers, body}
+        <root>/bodies/<sha256>.bin     response body exactly as received (still gzip-encoded if it was)
+
+    Cassettes hold public feed payloads for tests and benchmarks and are plaintext so they can be
+    checked in and served by `benchmarks.feed_server.FeedServer`; feeds cached by a real run go
+    to the encrypted `HTTPCache`.
+    """
+    INDEX = 'index.json'
+
+    def __init__(self, root: str):
+        self.root = root
+        self._index = None
+
+    @staticmethod
+    def key(method: str, url) -> str:
+        return f"{method.upper()} {url}"
+
+    @property
+    def index(self) -> dict:
+        if self._index is None:
+            path = os.path.join(self.root, self.INDEX)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            else:
+                self._index = {}
+        return self._index
+
+    def get(self, method: str, url) -> tuple | None:
+        """(status, headers, body) recorded for the request, or None."""
+        entry = self.index.get(self.key(method, url))
+        if entry is None:
+            return None
+        with open(os.path.join(self.root, 'bodies', entry["body"]), 'rb') as f:
+            return entry["status"], entry["headers"], f.read()
+
+    def find(self, path_suffix: str) -> tuple | None:
+        """First recorded GET whose URL path ends with `path_suffix`, for serving a cassette from another host."""
+        for key in self.index:
+            method, url = key.split(' ', 1)
+            if method == 'GET' and httpx.URL(url).path.endswith(path_suffix):
+                return self.get(method, url)
+        return None
+
+    def put(self, method: str, url, status: int, headers: list, body: bytes):
+        digest = hashlib.sha256(body).hexdigest()
+        os.makedirs(os.path.join(self.root, 'bodies'), exist_ok=True)
+        path = os.path.join(self.root, 'bodies', f"{digest}.bin")
+        if not os.path.exists(path):
+            _atomic_write(path, lambda f: f.write(body))
+        self.index[self.key(method, url)] = {
+            "status": status,
+            "headers": [[k, v] for k, v in headers if k.lower() not in _HOP_HEADERS],
+            "body": f"{digest}.bin",
+        }
+        payload = json.dumps(self.index, indent=1, sort_keys=True).encode('utf-8')
+        _atomic_write(os.path.join(self.root, self.INDEX), lambda f: f.write(payload))
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Passes requests through to `inner` and records every response into the cassette.
+    A 304 is not recorded over the full response it revalidated.
+    """
+    def __init__(self, inner: httpx.AsyncBaseTransport, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.inner.handle_async_request(request)
+        try:
+            body = b"".join([chunk async for chunk in response.aiter_raw()]) # Still content-encoded
+        finally:
+            await response.aclose()
+        if response.status_code != 304:
+            self.cassette.put(request.method, request.url, response.status_code, response.headers.multi_items(), body)
+        return httpx.Response(response.status_code, headers=response.headers, content=body, extensions=response.extensions)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves recorded responses without touching the network, so runs are byte-for-byte repeatable.
+    Honours If-None-Match against the recorded ETag. Unrecorded requests raise ReplayMissError,
+    which is deliberately not an httpx error so the fetcher does not retry it.
+    """
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        recorded = self.cassette.get(request.method, request.url)
+        if recorded is None:
+            raise ReplayMissError(f"{request.method} {request.url} is not in cassette {self.cassette.root}")
+        status, headers, body = recorded
+        etag = next((v for k, v in headers if k.lower() == 'etag'), None)
+        if etag is not None and request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers=[("ETag", etag)], request=request)
+        return httpx.Response(status, headers=headers, content=body, request=request)
@@ -0,0 +1,168 @@
+import asyncio
+import time
+from functools import partial
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from config.settings import get_settings
+from src.tools.audit import audit_log
+
+THROTTLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+def _retry_after_seconds(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header, given either as delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """
+    Async token-bucket limiter with AIMD adaptation.
+
+    Every request takes one token; tokens refill at `rate` per second up to `burst`. A 429 or
+    5xx halves the rate (down to `min_rate`) and honours Retry-After by pausing every caller;
+    each success then adds back a tenth of `max_rate`. Waiters are served in arrival order.
+    """
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.5, clock=time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def observe(self, status_code: int, retry_after: str | None = None):
+        """Feeds a response status back into the limiter."""
+        if status_code in THROTTLE_STATUSES:
+            self._refill(self._clock())
+            self.rate = max(self.min_rate, self.rate / 2)
+            delay = _retry_after_seconds(retry_after)
+            if delay:
+                self.blocked_until = max(self.blocked_until, self._clock() + delay)
+            audit_log("fetch_throttled", "FetcherAgent", {"status": status_code, "rate": round(self.rate, 3), "retry_after": delay})
+        elif status_code < 400 and self.rate < self.max_rate:
+            self._refill(self._clock())
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+class FetchScheduler:
+    """
+    Downloads queued matches ahead of the pipeline over the run's shared fetcher.
+
+    Event feeds for the current match and the next `prefetch` queued ones are fetched as
+    background tasks, at most `concurrency` at a time, so later matches download while the
+    current one is enriched and loaded. With streaming, `streams()` instead opens the next
+    feeds ahead and primes each with its first batch, so the response is already arriving when
+    the pipeline reaches it while only one batch per match is held. The Home and Away tracking
+    files are fetched concurrently, once per run. Request pacing and 429/5xx backoff come from the fetcher's
+    rate limiter; tenacity still retries each failed request.
+    """
+    def __init__(self, fetcher, concurrency: int = 4, prefetch: int = 4):
+        self.fetcher = fetcher
+        self.prefetch = prefetch
+        self._slots = asyncio.Semaphore(concurrency)
+        self._events = {}
+        self._streams = {}
+        self._tracking = None
+
+    @classmethod
+    def from_settings(cls, fetcher) -> "FetchScheduler":
+        settings = get_settings()
+        return cls(fetcher, settings.fetch_concurrency, settings.fetch_prefetch_matches)
+
+    async def _bounded(self, start):
+        # The coroutine is only created once a slot is free, so a task cancelled while
+        # still queued leaves nothing un-awaited behind
+        async with self._slots:
+            return await start()
+
+    def schedule(self, match_ids: list):
+        """Starts downloads for the first `prefetch + 1` of `match_ids` not already under way."""
+        for match_id in match_ids[:self.prefetch + 1]:
+            if match_id not in self._events:
+                self._events[match_id] = asyncio.create_task(self._bounded(partial(self.fetcher.fetch_statsbomb_events, match_id)))
+
+    async def events(self, match_id: int, queued: list = ()) -> list:
+        """
+        Raw events of `match_id`, then forgotten so the scheduler only holds matches ahead of
+        the pipeline. `queued` is the remaining queue, topped up for prefetch.
+        """
+        self.schedule([match_id, *queued])
+        try:
+            return await self._events[match_id]
+        finally:
+            self._events.pop(match_id, None)
+
+    async def _open_stream(self, match_id: int, batch_size: int) -> tuple:
+        batches = self.fetcher.stream_statsbomb_events(match_id, batch_size)
+        try:
+            first = await batches.__anext__()
+        except StopAsyncIteration:
+            first = []
+        except BaseException:
+            await batches.aclose()
+            raise
+        return first, batches
+
+    async def stream(self, match_id: int, queued: list = (), batch_size: int = 500) -> tuple:
+        """
+        (first batch, remaining batch iterator) of the streamed feed of `match_id`; the caller
+        owns the iterator. Also opens the streams of the next `prefetch` of `queued`.
+        """
+        for ahead in [match_id, *queued][:self.prefetch + 1]:
+            if ahead not in self._streams:
+                self._streams[ahead] = asyncio.create_task(self._bounded(partial(self._open_stream, ahead, batch_size)))
+        try:
+            return await self._streams[match_id]
+        finally:
+            self._streams.pop(match_id, None)
+
+    def tracking(self) -> asyncio.Future:
+        """
+        Future of the (home, away) Metrica CSVs. Both start downloading concurrently on the first
+        call; later calls share the same result.
+        """
+        if self._tracking is None:
+            self._tracking = asyncio.gather(
+                self._bounded(partial(self.fetcher.fetch_metrica_tracking, "Home")),
+                self._bounded(partial(self.fetcher.fetch_metrica_tracking, "Away")),
+            )
+        return self._tracking
+
+    async def close(self):
+        """Cancels downloads nobody asked for, e.g. when the run stops early, and releases opened streams."""
+        streams = list(self._streams.values())
+        pending = list(self._events.values()) + streams + ([self._tracking] if self._tracking is not None else [])
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in streams:
+            if not task.cancelled() and task.exception() is None:
+                await task.result()[1].aclose()
+        self._events.clear()
+        self._streams.clear()
@@ -1,22 +1,34 @@
-import duckdb
-import json
 from config.settings import get_settings
-from cryptography.fernet import Fernet
-import os
+from src.tools.audit import audit_log
+from src.tools.cipher import StreamCipher
+from src.tools.segments import SegmentStore, SEGMENT_TABLES
+import numpy as np
+import time
 from contextlib import contextmanager
+from datetime import date, datetime
 
-settings = get_settings()
+TRACKING_COLUMNS = {
+    'tracking': ('match_id', 'frame_id', 'period', 'timestamp_ms', 'ball_x', 'ball_y', 'home_control', 'away_control'),
+    'tracking_players': ('match_id', 'frame_id', 'period', 'team', 'player_id', 'x', 'y'),
+}
+FLOAT_TRACKING_COLUMNS = ('ball_x', 'ball_y', 'home_control', 'away_control', 'x', 'y')
+TRACKING_ROW_GROUP_SIZE = 30_000 # About 20 minutes of 25fps frames per Parquet row group
 
 class SecureDB:
     """
-    DuckDB instance managed via Fernet encryption at rest.
-    Data is written to encrypted parquet files rather than open duckdb format.
+    DuckDB instance managed via chunked AES-GCM encryption at rest.
+    Data is written to encrypted parquet segments rather than open duckdb format.
     """
     def __init__(self):
+        # Deferred so importing the pipeline does not pay for DuckDB
+        import duckdb
+        
+        settings = get_settings()
         # We use an in-memory DuckDB for processing...
         self.conn = duckdb.connect(':memory:')
-        self.fernet = Fernet(settings.get_fernet_bytes())
+        self.cipher = StreamCipher(settings.get_fernet_bytes(), settings.encryption_chunk_size)
         self.db_path = settings.duckdb_path
+        self.store = SegmentStore(settings.get_segment_dir(), self.cipher, legacy_prefix=self.db_path.replace('.duckdb', ''))
         self._init_schema()
         
     def _init_schema(self):
@@ -29,7 +41,34 @@ class SecureDB:
                 total_home_xg DOUBLE,
                 total_away_xg DOUBLE,
                 status VARCHAR,
-                tracking_frames JSON
+                tracking_fps DOUBLE,
+                competition_id BIGINT,
+                season_id BIGINT,
+                match_date DATE
+            );
+            
+            -- One row per tracking frame; positions are float32 StatsBomb yards, NULL off the pitch
+            CREATE TABLE IF NOT EXISTS tracking (
+                match_id BIGINT,
+                frame_id BIGINT,
+                period SMALLINT,
+                timestamp_ms BIGINT,
+                ball_x REAL,
+                ball_y REAL,
+                home_control REAL,
+                away_control REAL,
+                PRIMARY KEY (match_id, frame_id)
+            );
+            
+            -- Long per-player positions, only for players on the pitch in that frame
+            CREATE TABLE IF NOT EXISTS tracking_players (
+                match_id BIGINT,
+                frame_id BIGINT,
+                period SMALLINT,
+                team VARCHAR,
+                player_id VARCHAR,
+                x REAL,
+                y REAL
             );
             
             CREATE TABLE IF NOT EXISTS events (
@@ -49,7 +88,8 @@ class SecureDB:
     def upsert_match_data(self, payload: dict):
         """
         Take a MatchEnrichedPayload dict and upsert it into the DuckDB relations.
-        Using execute for parameterized queries to prevent SQL injection.
+        Using execute for parameterized queries to prevent SQL injection; events are
+        loaded set-based from a registered relation rather than bound row by row.
         """
         match = payload['match']
         events = payload['events']
@@ -57,8 +97,8 @@ class SecureDB:
         # Upsert match (Insert OR Replace semantics)
         self.conn.execute("""
             INSERT OR REPLACE INTO matches 
-            (match_id, home_team, away_team, total_home_xg, total_away_xg, status, tracking_frames)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (match_id, home_team, away_team, total_home_xg, total_away_xg, status, tracking_fps, competition_id, season_id, match_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             match['match_id'], 
             match['home_team']['team_name'], 
@@ -66,59 +106,246 @@ class SecureDB:
             payload['total_home_xg'],
             payload['total_away_xg'],
             match['status'],
-            json.dumps(payload.get('tracking_frames', []))
+            payload.get('tracking_fps'),
+            match.get('competition_id'),
+            match.get('season_id'),
+            _match_day(match.get('match_date')),
         ))
         
-        # Batch insert events
-        for e in events:
-            xg = e.get('shot_context', {}).get('xg') if e.get('shot_context') else None
-            xa = e.get('shot_context', {}).get('xa') if e.get('shot_context') else None
-            player_name = e.get('player', {}).get('player_name') if e.get('player') else None
-            
+        # Every event of the match is replaced by one set-based load
+        self._replace_match_events(match['match_id'], events, payload.get('event_blocks', []))
+        self._replace_match_tracking(match['match_id'], payload.get('tracking_blocks', []))
+
+    EVENT_COLUMNS = ('event_id', 'match_id', 'index', 'period', 'minute', 'second', 'type_name', 'player_name', 'xg', 'xa')
+
+    @staticmethod
+    def _event_columns(events: list) -> dict:
+        """Dumped `Event` dicts flattened into events-table columns in a single pass."""
+        rows = [(
+            e['event_id'], e['match_id'], e['index'], e['period'], e['minute'], e['second'], e['type_name'],
+            e['player']['player_name'] if e.get('player') else None,
+            e['shot_context']['xg'] if e.get('shot_context') else None,
+            e['pass_context']['xa'] if e.get('pass_context') else None, # Credited to the assisting pass
+        ) for e in events]
+        columns = dict(zip(SecureDB.EVENT_COLUMNS, zip(*rows))) if rows else {name: () for name in SecureDB.EVENT_COLUMNS}
+        columns['xg'] = np.array(columns['xg'], dtype=np.float64) # None becomes NaN, as in event blocks
+        columns['xa'] = np.array(columns['xa'], dtype=np.float64)
+        return columns
+
+    @staticmethod
+    def _block_columns(block: dict) -> dict:
+        """A dumped `EventBlock` is already columnar; only the scalar match id is broadcast."""
+        columns = {name: block[name] for name in SecureDB.EVENT_COLUMNS if name != 'match_id'}
+        columns['match_id'] = np.full(len(block['event_id']), block['match_id'], dtype=np.int64)
+        return columns
+
+    def _replace_match_events(self, match_id: int, events: list, event_blocks: list):
+        """
+        Delete-then-insert of a match's events from one registered DataFrame relation, inside a
+        transaction. Replaces the per-row INSERT OR REPLACE round trips; a repeated event id keeps
+        its last occurrence, as the per-row upsert did.
+        """
+        import pandas as pd
+
+        parts = [self._event_columns(events)] if events or not event_blocks else []
+        parts += [self._block_columns(block) for block in event_blocks]
+        frame = pd.DataFrame({
+            name: np.concatenate([np.asarray(p[name], dtype=object if name in ('event_id', 'type_name', 'player_name') else None) for p in parts])
+            for name in self.EVENT_COLUMNS
+        })
+        frame['load_order'] = np.arange(len(frame))
+        self.conn.register('event_load_view', frame)
+        self.conn.begin()
+        try:
+            self.conn.execute("""
+                DELETE FROM events
+                WHERE match_id = ? OR match_id IN (SELECT DISTINCT match_id FROM event_load_view)
+            """, [match_id])
+            # NaN marks an absent shot metric in the columnar inputs; the events table uses NULL
             self.conn.execute("""
-                INSERT OR REPLACE INTO events 
+                INSERT OR REPLACE INTO events
                 (event_id, match_id, index, period, minute, second, type_name, player_name, xg, xa)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                e['event_id'],
-                e['match_id'],
-                e['index'],
-                e['period'],
-                e['minute'],
-                e['second'],
-                e['type_name'],
-                player_name,
-                xg,
-                xa
-            ))
+                SELECT event_id, match_id, index, period, minute, second, type_name, player_name,
+                       CASE WHEN isnan(xg) THEN NULL ELSE xg END,
+                       CASE WHEN isnan(xa) THEN NULL ELSE xa END
+                FROM event_load_view
+                QUALIFY row_number() OVER (PARTITION BY event_id ORDER BY load_order DESC) = 1
+            """)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.unregister('event_load_view')
+
+    @staticmethod
+    def _tracking_frames(match_id: int, blocks: list) -> tuple:
+        """
+        Dumped TrackingBlock arrays as (frames, players) column dicts: per-frame metadata,
+        ball and pitch control, plus a long table holding one row per on-pitch player per frame.
+        Team and player ids are categorical codes, so millions of player rows never become Python strings.
+        """
+        import pandas as pd
+        from pandas.api.types import union_categoricals
+
+        frame_parts, player_parts = [], []
+        for block in blocks:
+            n = len(block['frame_id'])
+            controls = {name: np.full(n, np.nan, dtype=np.float32) if block.get(name) is None else block[name] for name in ('home_control', 'away_control')}
+            frame_parts.append({
+                'match_id': np.full(n, match_id, dtype=np.int64),
+                'frame_id': block['frame_id'],
+                'period': block['period'],
+                'timestamp_ms': block['timestamp_ms'],
+                'ball_x': block['ball'][:, 0],
+                'ball_y': block['ball'][:, 1],
+                **controls,
+            })
+            for code, team in enumerate(('home', 'away')):
+                coords = block[team]
+                frames, players = np.nonzero(~np.isnan(coords[..., 0]))
+                ids = block.get(f'{team}_player_ids') or [str(p) for p in range(coords.shape[1])]
+                player_parts.append({
+                    'match_id': np.full(len(frames), match_id, dtype=np.int64),
+                    'frame_id': block['frame_id'][frames],
+                    'period': block['period'][frames],
+                    'team': pd.Categorical.from_codes(np.full(len(frames), code), categories=['home', 'away']),
+                    'player_id': pd.Categorical.from_codes(players, categories=ids),
+                    'x': coords[frames, players, 0],
+                    'y': coords[frames, players, 1],
+                })
+
+        def concat(parts):
+            if not parts:
+                return None
+            return {
+                name: union_categoricals([p[name] for p in parts]) if isinstance(parts[0][name], pd.Categorical) else np.concatenate([p[name] for p in parts])
+                for name in parts[0]
+            }
+        return concat(frame_parts), concat(player_parts)
+
+    def _replace_match_tracking(self, match_id: int, blocks: list):
+        """Delete-then-insert of a match's tracking frames and player positions from registered relations."""
+        import pandas as pd
+
+        frames, players = self._tracking_frames(match_id, blocks)
+        self.conn.begin()
+        try:
+            self.conn.execute("DELETE FROM tracking WHERE match_id = ?", [match_id])
+            self.conn.execute("DELETE FROM tracking_players WHERE match_id = ?", [match_id])
+            for table, columns in (('tracking', frames), ('tracking_players', players)):
+                if columns is None:
+                    continue
+                self.conn.register('tracking_load_view', pd.DataFrame(columns, copy=False))
+                try:
+                    # NaN marks an off-pitch ball or absent control in the blocks; the tables use NULL
+                    select = ", ".join(
+                        f"CASE WHEN isnan({c}) THEN NULL ELSE {c} END" if c in FLOAT_TRACKING_COLUMNS else c for c in columns
+                    )
+                    self.conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {select} FROM tracking_load_view")
+                finally:
+                    self.conn.unregister('tracking_load_view')
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
 
     def flush_to_encrypted_disk(self):
         """
-        Dump tables to parquet, read as bytes, encrypt via Fernet, and save to disk.
-        Ensures Zero-Trust At-Rest encryption.
+        Stream each table out of DuckDB as Arrow batches, encoded as Parquet directly into the
+        chunked cipher, and append them to disk as one new segment. Nothing is staged in plaintext
+        and memory stays flat however large the tracking tables grow. Only the matches held by
+        this session are written; earlier segments are left untouched. Ensures Zero-Trust
+        At-Rest encryption.
         """
-        temp_matches = "data/raw/matches_temp.parquet"
-        temp_events = "data/raw/events_temp.parquet"
-        
-        self.conn.execute(f"COPY matches TO '{temp_matches}' (FORMAT PARQUET)")
-        self.conn.execute(f"COPY events TO '{temp_events}' (FORMAT PARQUET)")
+        match_ids = [row[0] for row in self.conn.execute("SELECT match_id FROM matches").fetchall()]
+        if not match_ids:
+            return None
         
-        # Encrypt the parquet payload
-        def encrypt_file(source, dest):
-            if os.path.exists(source):
-                with open(source, 'rb') as f:
-                    data = f.read()
-                encrypted = self.fernet.encrypt(data)
-                with open(dest, 'wb') as f:
-                    f.write(encrypted)
-                os.remove(source) # Secure wipe should be used in true PROD, standard remove here
-        
-        encrypt_file(temp_matches, settings.duckdb_path.replace('.duckdb', '_matches.enc'))
-        encrypt_file(temp_events, settings.duckdb_path.replace('.duckdb', '_events.enc'))
+        # One cursor per table so every result streams independently of the others
+        cursors = [self.conn.cursor() for _ in SEGMENT_TABLES]
+        try:
+            tables = {}
+            for table, cursor in zip(SEGMENT_TABLES, cursors):
+                if table in TRACKING_COLUMNS:
+                    # Sorted, one row group per batch, so each covers a narrow match/frame range that filtered reads can skip
+                    tables[table] = _arrow_reader(cursor.execute(f"SELECT * FROM {table} ORDER BY match_id, frame_id"), TRACKING_ROW_GROUP_SIZE)
+                else:
+                    tables[table] = _arrow_reader(cursor.execute(f"SELECT * FROM {table}"))
+            return self.store.append(tables, match_ids)
+        finally:
+            for cursor in cursors:
+                cursor.close()
         
+    def discard(self, match_id: int | None = None):
+        """Drops one match (or, without an id, every match) from the in-memory tables; disk is untouched."""
+        self.conn.begin()
+        try:
+            for table in SEGMENT_TABLES:
+                if match_id is None:
+                    self.conn.execute(f"DELETE FROM {table}")
+                else:
+                    self.conn.execute(f"DELETE FROM {table} WHERE match_id = ?", [match_id])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
     def close(self):
         self.conn.close()
 
+def _arrow_reader(result, batch_size: int = 1_000_000):
+    """Streams a query result as an Arrow RecordBatchReader (`to_arrow_reader` on newer DuckDB, `fetch_record_batch` on older releases)."""
+    if hasattr(result, 'to_arrow_reader'):
+        return result.to_arrow_reader(batch_size)
+    return result.fetch_record_batch(batch_size)
+
+def _match_day(value):
+    """Match kick-off (datetime or ISO string) reduced to the calendar day stored in matches.match_date."""
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    return value.date() if isinstance(value, datetime) else date.fromisoformat(str(value)[:10])
+
+def read_tracking(columns: list | None = None, match_id: int | None = None, period: int | None = None,
+                  frame_range: tuple | None = None, players: bool = False):
+    """
+    Reads the encrypted tracking output (or its long per-player table when `players` is set)
+    into a DataFrame, projecting only `columns` and filtering by match, period and an inclusive
+    (first, last) frame range inside the Parquet scan. Returns None when nothing has been stored.
+    """
+    table = 'tracking_players' if players else 'tracking'
+    columns = list(columns or TRACKING_COLUMNS[table])
+    unknown = set(columns) - set(TRACKING_COLUMNS[table])
+    if unknown:
+        raise ValueError(f"Unknown {table} columns: {sorted(unknown)}")
+
+    filters = []
+    if period is not None:
+        filters.append(('period', '=', period))
+    if frame_range is not None:
+        filters += [('frame_id', '>=', frame_range[0]), ('frame_id', '<=', frame_range[1])]
+
+    order = [c for c in ('match_id', 'frame_id') if c in columns]
+    return open_segment_store().read_table(table, columns, filters, order_by=", ".join(order), match_ids=match_id)
+
+def open_segment_store() -> SegmentStore:
+    """Read-side handle on the encrypted segment store configured in settings."""
+    settings = get_settings()
+    return SegmentStore(settings.get_segment_dir(), StreamCipher(settings.get_fernet_bytes(), settings.encryption_chunk_size),
+                        legacy_prefix=settings.duckdb_path.replace('.duckdb', ''))
+
+def read_table(table: str, columns: list | None = None, match_ids=None, competition_id: int | None = None,
+               season_id: int | None = None, match_dates: tuple | None = None):
+    """
+    Union of a stored table across segments (latest version of each match), or None if nothing
+    matches. Match, competition, season and inclusive (first, last) date filters are checked
+    against the manifest first, so only segments that can hold those matches are decrypted.
+    """
+    if table not in SEGMENT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    return open_segment_store().read_table(table, columns, match_ids=match_ids, competition_id=competition_id,
+                                           season_id=season_id, match_dates=match_dates)
+
 @contextmanager
 def secure_db_session():
     db = SecureDB()
@@ -126,3 +353,90 @@ def secure_db_session():
         yield db
     finally:
         db.close()
+
+class StorageSession:
+    """
+    Run-scoped storage shared by every loader invocation of a pipeline run.
+
+    One SecureDB (connection, schema, cipher) is opened on first use and matches accumulate
+    in it; a segment is flushed every `flush_every_matches` loads or once `flush_every_seconds`
+    have passed since the last flush (checked as matches are loaded), and always on close,
+    including when the run fails. Flushed matches are dropped from memory, so each segment
+    holds only the matches loaded since the previous one.
+    """
+    def __init__(self, flush_every_matches: int | None = None, flush_every_seconds: float | None = None, clock=time.monotonic):
+        self.flush_every_matches = flush_every_matches
+        self.flush_every_seconds = flush_every_seconds
+        self._clock = clock
+        self._db = None
+        self._pending = []
+        self._last_flush = clock()
+        self.segments = [] # Manifest entries written by this session
+
+    @classmethod
+    def from_settings(cls) -> "StorageSession":
+        settings = get_settings()
+        return cls(settings.storage_flush_every_matches, settings.storage_flush_every_seconds)
+
+    @property
+    def db(self) -> SecureDB:
+        if self._db is None:
+            self._db = SecureDB()
+        return self._db
+
+    @property
+    def pending(self) -> list:
+        """Match ids loaded but not yet flushed to disk."""
+        return list(self._pending)
+
+    def load(self, payload: dict):
+        """
+        Upserts a match payload and flushes if the cadence is due; returns the new manifest entry
+        when a flush happened. A match that fails to load is removed again, including an earlier
+        copy it was replacing, so it is never flushed half-written.
+        """
+        match_id = payload['match']['match_id']
+        try:
+            self.db.upsert_match_data(payload)
+        except Exception:
+            self.db.discard(match_id)
+            if match_id in self._pending:
+                self._pending.remove(match_id)
+            raise
+        if match_id not in self._pending:
+            self._pending.append(match_id)
+        return self.flush() if self._flush_due() else None
+
+    def _flush_due(self) -> bool:
+        if self.flush_every_matches and len(self._pending) >= self.flush_every_matches:
+            return True
+        return self.flush_every_seconds is not None and self._clock() - self._last_flush >= self.flush_every_seconds
+
+    def flush(self):
+        """Writes every pending match as one segment and empties the in-memory tables."""
+        self._last_flush = self._clock()
+        if not self._pending:
+            return None
+        entry = self.db.flush_to_encrypted_disk()
+        self.db.discard()
+        self._pending = []
+        if entry is None: # Nothing left in the tables to write
+            return None
+        audit_log("storage_flush", "LoaderAgent", {"segment": entry["id"], "matches": len(entry["match_ids"])})
+        self.segments.append(entry)
+        return entry
+
+    def close(self):
+        """Flushes whatever is pending, then releases the connection even if that flush fails."""
+        try:
+            self.flush()
+        finally:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,317 @@
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows
+    fcntl = None
+
+SEGMENT_TABLES = ('matches', 'events', 'tracking', 'tracking_players')
+MANIFEST_VERSION = 2 # Version 1 manifests (no per-segment statistics) are still read
+RANGE_COLUMNS = ('match_id', 'competition_id', 'season_id', 'match_date')
+VALUE_COLUMNS = ('competition_id', 'season_id')
+MATCH_PREDICATES = ('competition_id', 'season_id', 'match_date') # Resolved through the matches table
+
+def _json_scalar(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _profile(batches, stats: dict):
+    """
+    Passes record batches through while collecting the statistics the manifest keeps per table:
+    row count, columns present, min/max of RANGE_COLUMNS and distinct VALUE_COLUMNS.
+    """
+    import pyarrow.compute as pc
+
+    names = batches.schema.names
+    ranges, values = {}, {name: set() for name in VALUE_COLUMNS if name in names}
+    rows = 0
+    for batch in batches:
+        rows += batch.num_rows
+        for name in RANGE_COLUMNS:
+            if name not in names:
+                continue
+            bounds = pc.min_max(batch.column(name)).as_py()
+            if bounds['min'] is None:
+                continue
+            low, high = ranges.get(name, (bounds['min'], bounds['max']))
+            ranges[name] = (min(low, bounds['min']), max(high, bounds['max']))
+        for name, seen in values.items():
+            seen.update(v for v in pc.unique(batch.column(name)).to_pylist() if v is not None)
+        yield batch
+
+    stats.update(
+        rows=rows,
+        columns=names,
+        ranges={name: [_json_scalar(low), _json_scalar(high)] for name, (low, high) in ranges.items()},
+        values={name: sorted(seen) for name, seen in values.items()},
+    )
+
+def _write_parquet(batches, sink, stats: dict):
+    """Serializes an Arrow RecordBatchReader into `sink`, one Parquet row group per batch, filling `stats`."""
+    import pyarrow.parquet as pq
+
+    with pq.ParquetWriter(sink, batches.schema) as writer:
+        for batch in _profile(batches, stats):
+            writer.write_batch(batch)
+
+def _may_match(segment: dict, match_ids: set | None, predicates: dict) -> bool:
+    """
+    Whether a segment can hold rows for the wanted matches, judged from its manifest entry alone.
+    `predicates` maps competition_id / season_id to an id and match_date to an inclusive
+    (first, last) ISO date range, all checked against the segment's matches-table statistics.
+    Segments written before statistics were kept have no such columns and never satisfy them.
+    """
+    if match_ids is not None and not match_ids.intersection(set(segment["match_ids"]) - set(segment["superseded"])):
+        return False
+    if not predicates:
+        return True
+    stats = segment.get("stats", {}).get("matches")
+    if not stats:
+        return False
+    for name, wanted in predicates.items():
+        if name not in stats["columns"] or name not in stats["ranges"]:
+            return False
+        low, high = stats["ranges"][name]
+        if name == 'match_date':
+            first, last = wanted
+            if (last is not None and low > last) or (first is not None and high < first):
+                return False
+        elif wanted not in stats["values"].get(name, []) or not low <= wanted <= high:
+            return False
+    return True
+
+def _atomic_write(path: str, write):
+    """
+    Calls `write(f)` on a sibling temp file and renames it over `path`, so readers never see a
+    partial file.
+    """
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+@contextmanager
+def _exclusive(path: str):
+    """
+    Holds an exclusive advisory lock on `path` (created if missing) for the block, so separate
+    processes appending to the same store serialize their manifest read-modify-write.
+    Without `fcntl` (non-POSIX) the block runs unlocked.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a+b') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class SegmentStore:
+    """
+    Append-only directory of encrypted Parquet segments, one per flush, indexed by an
+    encrypted manifest that is replaced atomically.
+
+    Layout:
+        <root>/manifest.enc
+        <root>/manifest.lock         advisory lock held while an append updates the manifest
+        <root>/<table>/<segment_id>.enc
+
+    Loading a match only writes that flush's bytes. When a match is loaded again its id is
+    recorded as superseded on the older segments, so readers take the union of all segments
+    while seeing each match only from the newest segment that holds it. Segments whose
+    matches have all been superseded are dropped from the manifest and deleted.
+
+    Whole-table `<prefix>_<table>.enc` files from the previous layout are read as an implicit
+    oldest segment, so existing outputs stay visible until every match in them is reloaded.
+
+    Each manifest entry also records, per table, the row count, columns present, match_id
+    range and, for matches, the competition and season ids and match date range. Reads given
+    match, competition, season or date predicates decrypt only the segments whose statistics
+    can satisfy them.
+
+    Segments and the manifest are sealed with the chunked `StreamCipher` container; files
+    written as single Fernet tokens by earlier versions still decrypt.
+    """
+    MANIFEST = 'manifest.enc'
+    LOCK = 'manifest.lock'
+
+    def __init__(self, root: str, cipher, legacy_prefix: str | None = None):
+        self.root = root
+        self.cipher = cipher
+        self.legacy_prefix = legacy_prefix
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, self.MANIFEST)
+
+    def load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {"version": MANIFEST_VERSION, "segments": []}
+        with open(self.manifest_path, 'rb') as f:
+            manifest = json.loads(self.cipher.decrypt(f.read()))
+        if manifest.get("version") not in (1, MANIFEST_VERSION):
+            raise ValueError(f"Unsupported segment manifest version: {manifest.get('version')}")
+        return manifest
+
+    def _save_manifest(self, manifest: dict):
+        os.makedirs(self.root, exist_ok=True)
+        manifest["version"] = MANIFEST_VERSION
+        sealed = self.cipher.encrypt(json.dumps(manifest).encode('utf-8'))
+        _atomic_write(self.manifest_path, lambda f: f.write(sealed))
+
+    def append(self, tables: dict, match_ids: list) -> dict:
+        """
+        Writes one segment from an Arrow RecordBatchReader per table, then publishes it in the
+        manifest. Batches are encoded as Parquet row groups straight into the cipher, so no
+        plaintext touches disk and only one chunk is held at a time. Returns the new manifest entry.
+        """
+        segment_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        files, stats = {}, {}
+        for table, batches in tables.items():
+            rel = os.path.join(table, f"{segment_id}.enc")
+            os.makedirs(os.path.join(self.root, table), exist_ok=True)
+            stats[table] = {}
+
+            def write(f, batches=batches, table_stats=stats[table]):
+                with self.cipher.writer(f) as sink:
+                    _write_parquet(batches, sink, table_stats)
+            _atomic_write(os.path.join(self.root, rel), write)
+            files[table] = rel
+
+        match_ids = sorted({int(m) for m in match_ids})
+        entry = {
+            "id": segment_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "match_ids": match_ids,
+            "superseded": [],
+            "tables": files,
+            "stats": stats,
+        }
+        # Segment files are private until published, so only the manifest update is serialized
+        os.makedirs(self.root, exist_ok=True)
+        with _exclusive(os.path.join(self.root, self.LOCK)):
+            manifest = self.load_manifest()
+            retired = []
+            for segment in manifest["segments"]:
+                superseded = set(segment["superseded"]) | (set(segment["match_ids"]) & set(match_ids))
+                segment["superseded"] = sorted(superseded)
+                if superseded >= set(segment["match_ids"]):
+                    retired.append(segment)
+            manifest["segments"] = [s for s in manifest["segments"] if s not in retired] + [entry]
+            self._save_manifest(manifest)
+
+        # Only unlink once the manifest no longer points at the files
+        for segment in retired:
+            for rel in segment["tables"].values():
+                try:
+                    os.remove(os.path.join(self.root, rel))
+                except FileNotFoundError:
+                    pass
+        return entry
+
+    def table_segments(self, table: str, match_ids: set | None = None, predicates: dict | None = None) -> list:
+        """
+        (encrypted path, superseded match ids) for every segment holding `table`, oldest first,
+        skipping segments whose manifest statistics rule out `match_ids` and `predicates`.
+        """
+        segments = self.load_manifest()["segments"]
+        parts = []
+        legacy = f"{self.legacy_prefix}_{table}.enc" if self.legacy_prefix else None
+        if legacy and os.path.exists(legacy) and not predicates:
+            # No statistics, so only competition/season/date predicates can rule it out
+            parts.append((legacy, sorted({m for s in segments for m in s["match_ids"]})))
+        for segment in segments:
+            rel = segment["tables"].get(table)
+            if rel and _may_match(segment, match_ids, predicates or {}):
+                parts.append((os.path.join(self.root, rel), segment["superseded"]))
+        return parts
+
+    def read_table(self, table: str, columns: list | None = None, filters: list | None = None, order_by: str = "",
+                   match_ids=None, competition_id: int | None = None, season_id: int | None = None, match_dates: tuple | None = None):
+        """
+        Union of `table` across segments as a DataFrame, minus superseded matches.
+        Each segment is decrypted in memory, chunk by chunk as Parquet reads it, so no plaintext
+        is written to disk. Only `columns` are decoded, and `filters` ((column, op, value)
+        triples, ANDed) are pushed into the Parquet scan, skipping row groups whose statistics
+        rule them out. Decoded tables come from the shared reader cache and misses are decrypted
+        concurrently. Callers must pass only trusted column names.
+
+        `match_ids`, `competition_id`, `season_id` and an inclusive `match_dates` (first, last)
+        range restrict the result to those matches, and only segments whose manifest statistics
+        can satisfy them are decrypted. For tables other than matches the competition, season and
+        date predicates are first resolved to match ids from the (small) matches table.
+        Returns None when no segment holds the table, and an empty frame when none can hold
+        matching rows.
+        """
+        predicates = {name: value for name, value in (('competition_id', competition_id), ('season_id', season_id)) if value is not None}
+        if match_dates is not None:
+            predicates['match_date'] = tuple(None if d is None else _json_scalar(d)[:10] for d in match_dates)
+        wanted = None if match_ids is None else {int(m) for m in ([match_ids] if isinstance(match_ids, int) else match_ids)}
+
+        if predicates and table != 'matches':
+            matches = self.read_table('matches', ['match_id'], match_ids=wanted, competition_id=competition_id,
+                                      season_id=season_id, match_dates=match_dates)
+            wanted = set() if matches is None else set(matches['match_id'].tolist())
+            predicates = {}
+
+        parts = self.table_segments(table, wanted, predicates) if wanted != set() else []
+        if not parts:
+            return self._empty(table, columns)
+
+        filters = list(filters or [])
+        if wanted is not None:
+            filters.append(('match_id', 'in', sorted(wanted)))
+        for name, value in predicates.items():
+            if name == 'match_date':
+                for op, limit in zip(('>=', '<='), value):
+                    if limit is not None:
+                        filters.append(('match_date', op, date.fromisoformat(limit)))
+            else:
+                filters.append((name, '=', value))
+        return self._scan(parts, columns, filters, order_by)
+
+    def _empty(self, table: str, columns: list | None):
+        """Empty result with the projected (or newest stored) columns, built without decrypting anything."""
+        import pandas as pd
+
+        if not self.table_segments(table):
+            return None
+        if columns:
+            return pd.DataFrame(columns=list(columns))
+        stats = [s["stats"][table] for s in self.load_manifest()["segments"] if table in s.get("stats", {})]
+        return pd.DataFrame(columns=stats[-1]["columns"] if stats else [])
+
+    def _scan(self, parts: list, columns: list | None, filters: list, order_by: str):
+        import duckdb
+        from src.tools.reader import read_tables
+
+        projection = ", ".join(columns) if columns else "*"
+        # match_id is always decoded so superseded matches can be masked out
+        read_columns = None if not columns else list(dict.fromkeys([*columns, 'match_id']))
+        selects, bound = [], []
+        conn = duckdb.connect(':memory:')
+        try:
+            tables = read_tables([path for path, _ in parts], self.cipher, columns=read_columns, filters=filters)
+            for i, ((_, superseded), arrow) in enumerate(zip(parts, tables)):
+                conn.register(f"segment_{i}", arrow)
+                where = f" WHERE match_id NOT IN ({', '.join('?' * len(superseded))})" if superseded else ""
+                selects.append(f"SELECT {projection} FROM segment_{i}{where}")
+                bound += superseded
+
+            query = " UNION ALL BY NAME ".join(selects) # Older segments may predate newer columns
+            if order_by:
+                query += f" ORDER BY {order_by}"
+            return conn.execute(query, bound).df()
+        finally:
+            conn.close()
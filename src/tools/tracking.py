@@ -0,0 +1,414 @@
+import io
+import os
+import re
+import itertools
+import numpy as np
+from dataclasses import dataclass, field
+
+# Metrica coordinates are normalized 0-1; the pipeline works on the 120x80 StatsBomb pitch
+PITCH_LENGTH = 120.0
+PITCH_WIDTH = 80.0
+
+_PLAYER_COLUMN = re.compile(r'^Player(\d+)$')
+_NAMED_PLAYER_COLUMN = re.compile(r'^(Home|Away)_(\d+)_x$')
+
+@dataclass
+class MetricaChunk:
+    """
+    A fixed-size window of frames from one Metrica team file, held as NumPy arrays.
+    Positions are (frames, players, 2) float32 in StatsBomb yards; NaN marks a player off the pitch.
+    """
+    team: str
+    player_ids: list
+    frame_ids: np.ndarray
+    periods: np.ndarray
+    timestamps_ms: np.ndarray
+    positions: np.ndarray
+    ball: np.ndarray = field(repr=False)
+
+    def __len__(self) -> int:
+        return len(self.frame_ids)
+
+def _open_source(source):
+    """
+    Accepts an open text stream, raw CSV text as a `str` (as held in PipelineState), or a file
+    path as an `os.PathLike`. A `str` is never treated as a path; wrap paths in `pathlib.Path`.
+    """
+    if hasattr(source, 'readline'):
+        return source, False
+    if isinstance(source, str):
+        return io.StringIO(source), True
+    if isinstance(source, os.PathLike):
+        return open(source, 'r', encoding='utf-8', newline=''), True
+    raise TypeError(f"Expected CSV text, an os.PathLike or a text stream, got {type(source).__name__}")
+
+class MetricaTrackingReader:
+    """
+    Streaming parser for Metrica Sports raw tracking CSVs.
+
+    The two-row team/jersey header and the column-name row are read once and every
+    player x/y column pair is mapped to a slot. Data rows are then consumed lazily,
+    `chunk_size` frames at a time, so memory stays bounded regardless of match length.
+    """
+    def __init__(self, source, chunk_size: int = 4096):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self._stream, self._owns_stream = _open_source(source)
+        self._parse_header()
+
+    def _parse_header(self):
+        # Metrica files carry a team row and a jersey row above the column names
+        # (some exports drop them and use Home_N_x style names directly).
+        header = []
+        while True:
+            line = self._stream.readline()
+            if not line:
+                raise ValueError("Metrica tracking file has no column header row")
+            header.append(line.rstrip('\r\n').split(','))
+            if header[-1][0].strip() == 'Period':
+                break
+        names = [n.strip() for n in header[-1]]
+        teams = header[-3] if len(header) >= 3 else []
+
+        def _col(name):
+            if name not in names:
+                raise ValueError(f"Metrica tracking file is missing the '{name}' column")
+            return names.index(name)
+
+        self._period_col = _col('Period')
+        self._frame_col = _col('Frame')
+        self._time_col = _col('Time [s]')
+
+        self.team = None
+        self.player_ids = []
+        x_cols, y_cols = [], []
+        self._ball_cols = None
+        for i, name in enumerate(names):
+            player = _PLAYER_COLUMN.match(name)
+            named = _NAMED_PLAYER_COLUMN.match(name)
+            if player:
+                team = teams[i].strip() if i < len(teams) and teams[i].strip() else 'Home'
+                number = player.group(1)
+                x_col, y_col = i, i + 1
+            elif named:
+                team, number = named.group(1), named.group(2)
+                x_col, y_col = i, _col(f'{team}_{number}_y')
+            elif name in ('Ball', 'Ball_x'):
+                self._ball_cols = (i, i + 1 if name == 'Ball' else _col('Ball_y'))
+                continue
+            else:
+                continue
+            self.team = self.team or team
+            self.player_ids.append(f'{team}_{number}')
+            x_cols.append(x_col)
+            y_cols.append(y_col)
+
+        self._x_cols = np.array(x_cols, dtype=np.intp)
+        self._y_cols = np.array(y_cols, dtype=np.intp)
+        self._n_columns = len(names)
+
+    def __iter__(self):
+        try:
+            while True:
+                lines = [l for l in itertools.islice(self._stream, self.chunk_size) if l.strip()]
+                if not lines:
+                    return
+                yield self._to_chunk(lines)
+        finally:
+            self.close()
+
+    def _to_chunk(self, lines: list) -> MetricaChunk:
+        rows = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2, usecols=range(self._n_columns))
+
+        positions = np.empty((len(rows), len(self._x_cols), 2), dtype=np.float32)
+        positions[:, :, 0] = rows[:, self._x_cols] * PITCH_LENGTH
+        positions[:, :, 1] = rows[:, self._y_cols] * PITCH_WIDTH
+
+        ball = np.full((len(rows), 2), np.nan, dtype=np.float32)
+        if self._ball_cols:
+            ball[:, 0] = rows[:, self._ball_cols[0]] * PITCH_LENGTH
+            ball[:, 1] = rows[:, self._ball_cols[1]] * PITCH_WIDTH
+
+        return MetricaChunk(
+            team=self.team,
+            player_ids=list(self.player_ids),
+            frame_ids=rows[:, self._frame_col].astype(np.int64),
+            periods=rows[:, self._period_col].astype(np.int16),
+            timestamps_ms=np.rint(rows[:, self._time_col] * 1000.0).astype(np.int64),
+            positions=positions,
+            ball=ball,
+        )
+
+    def close(self):
+        if self._owns_stream:
+            self._stream.close()
+
+def iter_metrica_chunks(source, chunk_size: int = 4096):
+    """Yields `MetricaChunk`s of at most `chunk_size` frames from a Metrica raw tracking CSV."""
+    yield from MetricaTrackingReader(source, chunk_size)
+
+def read_metrica_tracking(source, chunk_size: int = 4096) -> MetricaChunk:
+    """
+    Streams a whole Metrica file chunk by chunk and stitches the arrays into one `MetricaChunk`.
+    This holds the full match in memory; pipeline code should stream with `iter_metrica_chunks`
+    or `iter_aligned_tracking` instead.
+    """
+    reader = MetricaTrackingReader(source, chunk_size)
+    chunks = list(reader)
+    n_players = len(reader.player_ids)
+    if not chunks:
+        return MetricaChunk(
+            team=reader.team,
+            player_ids=list(reader.player_ids),
+            frame_ids=np.empty(0, dtype=np.int64),
+            periods=np.empty(0, dtype=np.int16),
+            timestamps_ms=np.empty(0, dtype=np.int64),
+            positions=np.empty((0, n_players, 2), dtype=np.float32),
+            ball=np.empty((0, 2), dtype=np.float32),
+        )
+    return MetricaChunk(
+        team=reader.team,
+        player_ids=list(reader.player_ids),
+        frame_ids=np.concatenate([c.frame_ids for c in chunks]),
+        periods=np.concatenate([c.periods for c in chunks]),
+        timestamps_ms=np.concatenate([c.timestamps_ms for c in chunks]),
+        positions=np.concatenate([c.positions for c in chunks]),
+        ball=np.concatenate([c.ball for c in chunks]),
+    )
+
+FPS_MIN_FRAMES = 250 # Frames inferred over before a streamed rate is trusted (10 s at 25fps)
+FPS_TOLERANCE = 0.01
+
+def infer_fps(timestamps_ms) -> float | None:
+    """Sampling rate from the median frame spacing, or None when it cannot be determined."""
+    steps = np.diff(np.asarray(timestamps_ms, dtype=np.int64))
+    steps = steps[steps > 0]
+    if steps.size == 0:
+        return None
+    return 1000.0 / float(np.median(steps))
+
+class TrackingDecimator:
+    """
+    Streaming decimation of `TrackingBlock`s to a lower frame rate.
+
+    - 'stride' keeps every `factor`-th frame of the stream.
+    - 'mean' averages positions and pitch-control values over windows of `factor`
+      frames (NaN-aware), labelling each window with its first frame. Windows never
+      span a period boundary, and a trailing partial window is carried into the next
+      block so chunk boundaries do not change the result.
+    """
+    MODES = ('stride', 'mean')
+
+    def __init__(self, factor: int, mode: str = 'stride', source_fps: float | None = None):
+        if factor < 1:
+            raise ValueError("decimation factor must be >= 1")
+        if mode not in self.MODES:
+            raise ValueError(f"decimation mode must be one of {self.MODES}, got '{mode}'")
+        self.factor = factor
+        self.mode = mode
+        self.fps = source_fps / factor if source_fps else None
+        self._offset = 0 # Stream position of the next incoming frame, for stride phase
+        self._carry = None
+
+    @classmethod
+    def for_rates(cls, source_fps: float, target_fps: float, mode: str = 'stride') -> "TrackingDecimator":
+        factor = max(1, int(round(source_fps / target_fps)))
+        return cls(factor, mode, source_fps)
+
+    def push(self, block):
+        """Decimates the next block of the stream. May return None while a window is still open."""
+        if self.factor == 1:
+            return self._stamp(block)
+        if self.mode == 'stride':
+            keep = (self._offset + np.arange(len(block))) % self.factor == 0
+            self._offset += len(block)
+            return self._stamp(block.take(keep)) if keep.any() else None
+
+        if self._carry is not None:
+            block = type(block).concat([self._carry, block])
+            self._carry = None
+        starts = self._window_starts(block.period)
+        if len(block) - starts[-1] < self.factor:
+            # Hold the unfinished window back until the next block (or flush) completes it
+            self._carry = block.take(slice(starts[-1], None))
+            if len(starts) == 1:
+                return None
+            block, starts = block.take(slice(0, starts[-1])), starts[:-1]
+        return self._window_mean(block, starts)
+
+    def flush(self):
+        """Emits any trailing partial window at the end of the stream."""
+        carry, self._carry = self._carry, None
+        if carry is None:
+            return None
+        return self._window_mean(carry, self._window_starts(carry.period))
+
+    def _window_starts(self, period: np.ndarray) -> np.ndarray:
+        index = np.arange(len(period))
+        is_period_start = np.r_[True, period[1:] != period[:-1]]
+        period_start = np.maximum.accumulate(np.where(is_period_start, index, 0))
+        return np.flatnonzero((index - period_start) % self.factor == 0)
+
+    def _window_mean(self, block, starts: np.ndarray):
+        def _nanmean(arr):
+            valid = ~np.isnan(arr)
+            sums = np.add.reduceat(np.where(valid, arr, 0.0), starts, axis=0)
+            counts = np.add.reduceat(valid, starts, axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+        fields = {
+            'frame_id': block.frame_id[starts],
+            'period': block.period[starts],
+            'timestamp_ms': block.timestamp_ms[starts],
+            'ball': _nanmean(block.ball),
+            'home': _nanmean(block.home),
+            'away': _nanmean(block.away),
+            'home_control': None if block.home_control is None else _nanmean(block.home_control),
+            'away_control': None if block.away_control is None else _nanmean(block.away_control),
+        }
+        return self._stamp(type(block)(home_player_ids=block.home_player_ids, away_player_ids=block.away_player_ids, fps=block.fps, **fields))
+
+    def _stamp(self, block):
+        return block if self.fps is None else block.model_copy(update={'fps': self.fps})
+
+class SourceRateStamper:
+    """
+    Stamps streamed `TrackingBlock`s with the source frame rate.
+
+    The rate is inferred from the timestamps of at least `min_frames` frames across chunk
+    borders, so leading blocks are held back until enough have arrived (or the stream ends).
+    Each later block is checked against it, including the step from the previous block, and
+    counted in `mismatched_blocks` when its own rate is more than `FPS_TOLERANCE` off.
+    """
+    def __init__(self, min_frames: int = FPS_MIN_FRAMES):
+        self.min_frames = min_frames
+        self.fps = None
+        self.mismatched_blocks = 0
+        self._pending = []
+        self._last_timestamp = None
+
+    def push(self, block) -> list:
+        """Blocks ready to process, stamped with the source rate; empty while still inferring."""
+        if self._pending is not None:
+            self._pending.append(block)
+            if sum(len(b) for b in self._pending) < self.min_frames:
+                return []
+            return self.flush()
+        timestamps = block.timestamp_ms if self._last_timestamp is None else np.r_[self._last_timestamp, block.timestamp_ms]
+        rate = infer_fps(timestamps)
+        if rate is not None and self.fps is not None and abs(rate - self.fps) > self.fps * FPS_TOLERANCE:
+            self.mismatched_blocks += 1
+        return [self._stamp(block)]
+
+    def flush(self) -> list:
+        """Releases held-back blocks, inferring the rate from whatever arrived."""
+        pending, self._pending = self._pending or [], None
+        if pending and self.fps is None:
+            self.fps = infer_fps(np.concatenate([b.timestamp_ms for b in pending]))
+        return [self._stamp(b) for b in pending]
+
+    def _stamp(self, block):
+        if len(block):
+            self._last_timestamp = block.timestamp_ms[-1]
+        return block if self.fps is None else block.model_copy(update={'fps': self.fps})
+
+def decimate_blocks(blocks: list, target_fps: float, mode: str = 'stride') -> list:
+    """
+    Decimates a complete list of blocks to `target_fps`. Blocks already at or below
+    the target rate are returned unchanged.
+    """
+    if not blocks:
+        return blocks
+    source_fps = blocks[0].fps or infer_fps(np.concatenate([b.timestamp_ms for b in blocks]))
+    if source_fps is None or source_fps <= target_fps * 1.01:
+        return blocks
+
+    decimator = TrackingDecimator.for_rates(source_fps, target_fps, mode)
+    out = [d for d in (decimator.push(b) for b in blocks) if d is not None and len(d)]
+    tail = decimator.flush()
+    if tail is not None and len(tail):
+        out.append(tail)
+    return out
+
+def _split_chunk(chunk: MetricaChunk, n: int):
+    """Splits a chunk into its first `n` frames and the remainder (None when empty)."""
+    def _part(sl):
+        part = MetricaChunk(
+            team=chunk.team, player_ids=chunk.player_ids,
+            frame_ids=chunk.frame_ids[sl], periods=chunk.periods[sl], timestamps_ms=chunk.timestamps_ms[sl],
+            positions=chunk.positions[sl], ball=chunk.ball[sl],
+        )
+        return part if len(part) else None
+    return _part(slice(0, n)), _part(slice(n, None))
+
+def _merge_on_frame(home: MetricaChunk | None, away: MetricaChunk | None, home_ids: list, away_ids: list):
+    """Outer-joins two sorted team chunks on Frame with array scatters instead of per-row lookups."""
+    from src.models.domain import TrackingBlock
+
+    present = [c for c in (home, away) if c is not None]
+    frame_ids = np.union1d(*[c.frame_ids for c in present]) if len(present) == 2 else present[0].frame_ids
+    n = len(frame_ids)
+
+    periods = np.zeros(n, dtype=np.int16)
+    timestamps_ms = np.zeros(n, dtype=np.int64)
+    ball = np.full((n, 2), np.nan, dtype=np.float32)
+    squads = {}
+    # Away is scattered first so home wins metadata and ball wherever both files have the frame
+    for side, chunk, ids in (('away', away, away_ids), ('home', home, home_ids)):
+        squads[side] = np.full((n, len(ids), 2), np.nan, dtype=np.float32)
+        if chunk is None:
+            continue
+        rows = np.searchsorted(frame_ids, chunk.frame_ids)
+        squads[side][rows] = chunk.positions
+        periods[rows] = chunk.periods
+        timestamps_ms[rows] = chunk.timestamps_ms
+        # Both files carry the ball; keep one copy, falling back to the other side when it is missing
+        has_ball = ~np.isnan(chunk.ball).any(axis=1)
+        ball[rows[has_ball]] = chunk.ball[has_ball]
+
+    return TrackingBlock(
+        frame_id=frame_ids, period=periods, timestamp_ms=timestamps_ms, ball=ball,
+        home=squads['home'], away=squads['away'],
+        home_player_ids=home_ids, away_player_ids=away_ids,
+    )
+
+def iter_aligned_tracking(home_source, away_source, chunk_size: int = 4096):
+    """
+    Streams the Home and Away Metrica files side by side and yields two-team `TrackingBlock`s.
+
+    Both files are sorted by Frame, so each step merges every buffered frame up to the
+    smaller of the two buffers' last frame ids and carries the rest forward. Frames present
+    in only one file are kept with the other squad as NaN, and the duplicated ball columns
+    are collapsed into one (home first, away as fallback).
+    """
+    home_reader = MetricaTrackingReader(home_source, chunk_size)
+    away_reader = MetricaTrackingReader(away_source, chunk_size)
+    home_iter, away_iter = iter(home_reader), iter(away_reader)
+    home_buf = away_buf = None
+    home_done = away_done = False
+
+    while True:
+        if home_buf is None and not home_done:
+            home_buf = next(home_iter, None)
+            home_done = home_buf is None
+        if away_buf is None and not away_done:
+            away_buf = next(away_iter, None)
+            away_done = away_buf is None
+        if home_buf is None and away_buf is None:
+            return
+
+        # Frames up to `bound` can no longer appear later in either file
+        if home_buf is not None and away_buf is not None:
+            bound = min(home_buf.frame_ids[-1], away_buf.frame_ids[-1])
+        else:
+            bound = (home_buf if home_buf is not None else away_buf).frame_ids[-1]
+
+        home_part = away_part = None
+        if home_buf is not None:
+            home_part, home_buf = _split_chunk(home_buf, int(np.searchsorted(home_buf.frame_ids, bound, side='right')))
+        if away_buf is not None:
+            away_part, away_buf = _split_chunk(away_buf, int(np.searchsorted(away_buf.frame_ids, bound, side='right')))
+
+        yield _merge_on_frame(home_part, away_part, home_reader.player_ids, away_reader.player_ids)
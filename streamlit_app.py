@@ -1,11 +1,8 @@
 import streamlit as st
-import duckdb
-from cryptography.fernet import Fernet
-import os
-import tempfile
 import pandas as pd
 import plotly.express as px
 from config.settings import get_settings
+from src.tools.secure_db import read_table, read_tracking
 
 settings = get_settings()
 
@@ -14,36 +11,18 @@ st.set_page_config(page_title="Football Gravity", page_icon="\u26bd", layout="wi
 st.title("\u26bd Football Gravity - Zero Trust xG Analytics")
 st.markdown("This dashboard decrypts the securely stored Parquet analytics **in-memory**.")
 
-@st.cache_data
-def load_encrypted_data(parquet_enc_path: str):
-    """Zero-trust secure decryption of at-rest parquet files into a memory Dataframe."""
-    if not os.path.exists(parquet_enc_path):
-        return None
-        
-    fernet = Fernet(settings.get_fernet_bytes())
-    with open(parquet_enc_path, 'rb') as f:
-        encrypted_data = f.read()
-        
-    decrypted_data = fernet.decrypt(encrypted_data)
-    
-    # Write cleanly to a pure tempfile that DuckDB can ingest
-    with tempfile.NamedTemporaryFile(suffix='.parquet', delete=False) as tmp:
-        tmp.write(decrypted_data)
-        tmp_path = tmp.name
-        
-    try:
-        conn = duckdb.connect(':memory:')
-        df = conn.execute(f"SELECT * FROM '{tmp_path}'").df()
-    finally:
-        os.remove(tmp_path) # Clean up decrypted footprint immediately
-        
-    return df
+# Decrypted segments are cached by the shared reader, keyed on each file's mtime and size, so
+# reruns are fast and pick up new pipeline output without a Streamlit-level cache.
+def load_encrypted_data(table: str):
+    """Zero-trust secure decryption of the at-rest parquet segments of a table into a memory Dataframe."""
+    return read_table(table)
 
-events_path = settings.duckdb_path.replace('.duckdb', '_events.enc')
-matches_path = settings.duckdb_path.replace('.duckdb', '_matches.enc')
+def load_tracking(match_id: int):
+    """Projected read of the per-frame pitch control series for one match."""
+    return read_tracking(columns=['frame_id', 'home_control'], match_id=match_id)
 
-df_events = load_encrypted_data(events_path)
-df_matches = load_encrypted_data(matches_path)
+df_events = load_encrypted_data('events')
+df_matches = load_encrypted_data('matches')
 
 if df_events is None or df_matches is None:
     st.warning("No encrypted data found. Please run the LangGraph pipeline via `python main.py --date today` first.")
@@ -90,26 +69,19 @@ with tab3:
     st.header("\ud83c\udfa5 Simulated Optical Tracking (Metrica Open Data)")
     st.markdown("Visualizing 30fps player coordinate bounds and **Spatial Pitch Control** probabilities.")
     
-    # Check if tracking data was persisted from the array
-    if 'tracking_frames' in df_matches.columns:
-        try:
-            import json
-            # DuckDB struct arrays parse as lists of dicts
-            tracking_list = df_matches.iloc[0]['tracking_frames']
-            if tracking_list and len(tracking_list) > 0:
-                # Extract PPDA spatial dominance metric 
-                # Our schema mapped 'home_ppda' to spatial control Home probability
-                metrics = [{"frame": f['frame_id'], "Home Control %": f.get('home_ppda', 0.5)} for f in tracking_list]
-                df_metrics = pd.DataFrame(metrics)
-                
-                fig = px.line(df_metrics, x="frame", y="Home Control %", title="Spatial Pitch Dominance (Possession Window)")
-                fig.update_layout(template="plotly_dark")
-                st.plotly_chart(fig, use_container_width=True)
-                
-                st.info("Tracking sample successfully decrypted and parsed from pure JSON.")
-            else:
-                st.warning("No tracking frames recorded for this match run.")
-        except Exception as e:
-            st.error(f"Failed to parse tracking JSON visually: {str(e)}")
-    else:
-         st.warning("Tracking Frame structs not found in database schema. Re-run pipeline.")
+    # Only the columns plotted are read from the tracking Parquet, filtered to the first tracked match
+    tracked = df_matches[df_matches['tracking_fps'].notna()] if 'tracking_fps' in df_matches.columns else df_matches.iloc[:0]
+    try:
+        df_tracking = load_tracking(int(tracked.iloc[0]['match_id'])) if not tracked.empty else None
+        if df_tracking is not None and not df_tracking.empty:
+            df_metrics = df_tracking.rename(columns={"frame_id": "frame", "home_control": "Home Control %"})
+            
+            fig = px.line(df_metrics, x="frame", y="Home Control %", title="Spatial Pitch Dominance (Possession Window)")
+            fig.update_layout(template="plotly_dark")
+            st.plotly_chart(fig, use_container_width=True)
+            
+            st.info("Tracking sample successfully decrypted from the columnar tracking table.")
+        else:
+            st.warning("No tracking frames recorded for this match run.")
+    except Exception as e:
+        st.error(f"Failed to read tracking table: {str(e)}")
@@ -0,0 +1,401 @@
+import json
+import httpx
+import pytest
+from src.tools.jsonstream import JSONArrayStream, iter_json_array
+from src.tools.fetch import SecureFetcher
+
+def test_json_array_stream_handles_any_chunking():
+    """
+    Elements split across chunks, including multi-byte UTF-8 and bare numbers, parse identically to json.loads.
+    """
+    doc = [{'id': 'a', 'player': {'name': 'Müller ⚽'}, 'note': 'has ] and , inside'}, [1, 2], 12345, -0.5, True, None, "x"]
+    body = json.dumps(doc, ensure_ascii=False, indent=1).encode('utf-8')
+
+    for size in (1, 2, 3, 7, len(body)):
+        chunks = [body[i:i + size] for i in range(0, len(body), size)]
+        assert list(iter_json_array(chunks)) == doc
+
+    assert list(iter_json_array([b' [ ', b'] '])) == []
+
+@pytest.mark.parametrize("body", [b'{"a": 1}', b'[1, 2', b'[1,]', b'[1 2]', b'[1] 2'])
+def test_json_array_stream_rejects_malformed(body):
+    """
+    Truncated or malformed feeds must fail loudly instead of yielding a partial match.
+    """
+    with pytest.raises(ValueError):
+        parser = JSONArrayStream()
+        parser.feed(body)
+        parser.close()
+
+@pytest.mark.asyncio
+async def test_stream_statsbomb_events_batches(monkeypatch):
+    """
+    The streaming fetch yields fixed-size batches covering every event in feed order.
+    """
+    monkeypatch.setenv("STATSBOMB_GITHUB_URL", "https://feeds.test/data")
+    events = [{'id': f'ev-{i}', 'index': i} for i in range(1, 1235)]
+    body = json.dumps(events).encode()
+
+    class ChunkedBody(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for i in range(0, len(body), 1000):
+                yield body[i:i + 1000]
+
+    def handler(request):
+        assert request.url.path == "/data/events/7.json"
+        return httpx.Response(200, stream=ChunkedBody())
+
+    from config.settings import get_settings
+    get_settings.cache_clear()
+    fetcher = SecureFetcher()
+    fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        batches = [batch async for batch in fetcher.stream_statsbomb_events(7, batch_size=500)]
+    finally:
+        await fetcher.close()
+        get_settings.cache_clear()
+
+    assert [len(b) for b in batches] == [500, 500, 234]
+    assert [e for b in batches for e in b] == events
+
+@pytest.mark.asyncio
+async def test_shared_fetcher_is_reused_and_left_open(monkeypatch):
+    """
+    Nodes given the run's pooled fetcher use it for every request and never close it themselves.
+    """
+    from src.agents.nodes import fetcher_node
+    from config.settings import get_settings
+
+    monkeypatch.setenv("STATSBOMB_GITHUB_URL", "https://feeds.test/data")
+    monkeypatch.setenv("METRICA_BASE_URL", "https://tracking.test/data")
+    get_settings.cache_clear()
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.host)
+        if request.url.host == "tracking.test":
+            return httpx.Response(200, text="csv")
+        return httpx.Response(200, json=[{'id': 'ev-1', 'index': 1}])
+
+    fetcher = SecureFetcher()
+    fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        for match_id in (1, 2):
+            state = await fetcher_node({"matches_to_process": [match_id], "errors": [], "raw_tracking_home": None}, fetcher=fetcher)
+            assert state["pipeline_status"] == "enriching"
+            if "event_batches" in state["raw_event_data"]:
+                assert [b async for b in state["raw_event_data"]["event_batches"]] == [[{'id': 'ev-1', 'index': 1}]]
+            assert not fetcher.client.is_closed
+        assert requested == ["feeds.test", "tracking.test", "tracking.test", "feeds.test", "tracking.test", "tracking.test"]
+    finally:
+        await fetcher.close()
+        get_settings.cache_clear()
+
+@pytest.mark.asyncio
+async def test_scheduler_prefetches_queued_matches_concurrently(monkeypatch):
+    """
+    Events for queued matches download in parallel up to the concurrency limit, ahead of being asked for.
+    """
+    import asyncio
+    from src.tools.scheduler import FetchScheduler
+    from config.settings import get_settings
+
+    monkeypatch.setenv("STATSBOMB_GITHUB_URL", "https://feeds.test/data")
+    get_settings.cache_clear()
+    in_flight, peak, requested = 0, 0, []
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        requested.append(request.url.path.rsplit('/', 1)[-1])
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200, json=[{'id': request.url.path}])
+
+    fetcher = SecureFetcher()
+    fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    scheduler = FetchScheduler(fetcher, concurrency=2, prefetch=3)
+    try:
+        queue = [1, 2, 3, 4, 5, 6]
+        first = await scheduler.events(queue.pop(0), queue)
+        assert first == [{'id': '/data/events/1.json'}]
+        await asyncio.sleep(0.12) # Prefetched matches keep downloading in the background
+        assert sorted(requested) == ['1.json', '2.json', '3.json', '4.json'] and peak == 2
+        assert await scheduler.events(queue.pop(0), queue) == [{'id': '/data/events/2.json'}]
+    finally:
+        await scheduler.close()
+        await fetcher.close()
+        get_settings.cache_clear()
+
+@pytest.mark.asyncio
+async def test_scheduler_opens_queued_streams_ahead(monkeypatch):
+    """
+    While streaming, the next queued feeds are opened and primed in the background, and close()
+    releases any the run never consumed.
+    """
+    import asyncio
+    from src.tools.scheduler import FetchScheduler
+    from config.settings import get_settings
+
+    monkeypatch.setenv("STATSBOMB_GITHUB_URL", "https://feeds.test/data")
+    get_settings.cache_clear()
+    requested = []
+
+    def handler(request):
+        match = request.url.path.rsplit('/', 1)[-1]
+        requested.append(match)
+        return httpx.Response(200, json=[{'id': f'{match}-{i}'} for i in range(5)])
+
+    fetcher = SecureFetcher()
+    fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    scheduler = FetchScheduler(fetcher, concurrency=2, prefetch=2)
+    try:
+        queue = [1, 2, 3, 4]
+        first, batches = await scheduler.stream(queue.pop(0), queue, batch_size=2)
+        rest = [e for b in [b async for b in batches] for e in b]
+        assert [e['id'] for e in first + rest] == [f'1.json-{i}' for i in range(5)]
+        await asyncio.sleep(0.05)
+        assert sorted(requested) == ['1.json', '2.json', '3.json']
+        assert set(scheduler._streams) == {2, 3}
+    finally:
+        await scheduler.close()
+        await fetcher.close()
+        get_settings.cache_clear()
+    assert scheduler._streams == {}
+
+@pytest.mark.asyncio
+async def test_token_bucket_backs_off_on_throttling():
+    """
+    429/5xx halves the request rate and honours Retry-After; successes recover it gradually.
+    """
+    from src.tools.scheduler import TokenBucket
+
+    now = [100.0]
+    bucket = TokenBucket(rate=8.0, burst=2, clock=lambda: now[0])
+    await bucket.acquire()
+    await bucket.acquire() # Burst spent without waiting
+
+    bucket.observe(429, "3")
+    assert bucket.rate == 4.0 and bucket.blocked_until == 103.0
+    bucket.observe(503)
+    assert bucket.rate == 2.0
+    bucket.observe(404) # Client errors say nothing about load
+    assert bucket.rate == 2.0
+    bucket.observe(200)
+    assert bucket.rate == pytest.approx(2.8)
+    for _ in range(20):
+        bucket.observe(200)
+    assert bucket.rate == 8.0
+
+def _cached_fetcher(tmp_path, handler, key: bytes, offline=False):
+    from src.tools.cipher import StreamCipher
+    from src.tools.http_cache import HTTPCache
+
+    fetcher = SecureFetcher(cache=HTTPCache(str(tmp_path / "http"), StreamCipher(key), 1 << 20, offline))
+    fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return fetcher
+
+@pytest.mark.asyncio
+async def test_http_cache_revalidates_and_serves_offline(tmp_path, monkeypatch):
+    """
+    Feeds are cached encrypted; reruns revalidate with If-None-Match and a 304 costs no body, offline mode never hits the network.
+    """
+    from cryptography.fernet import Fernet
+    from config.settings import get_settings
+    from src.tools.http_cache import CacheMissError
+
+    monkeypatch.setenv("STATSBOMB_GITHUB_URL", "https://feeds.test/data")
+    get_settings.cache_clear()
+    events = [{'id': f'ev-{i}', 'index': i, 'note': 'secret tactics'} for i in range(1, 300)]
+    seen, key = [], Fernet.generate_key()
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=events, headers={"ETag": '"v1"'})
+
+    fetcher = _cached_fetcher(tmp_path, handler, key)
+    try:
+        assert await fetcher.fetch_statsbomb_events(7) == events
+        assert await fetcher.fetch_statsbomb_events(7) == events
+        assert [e for b in [b async for b in fetcher.stream_statsbomb_events(7, batch_size=100)] for e in b] == events
+        assert seen == [None, '"v1"', '"v1"']
+    finally:
+        await fetcher.close()
+
+    blobs = list((tmp_path / "http" / "blobs").iterdir())
+    assert len(blobs) == 1 and b'secret tactics' not in blobs[0].read_bytes()
+
+    offline = _cached_fetcher(tmp_path, handler, key, offline=True)
+    try:
+        assert [e for b in [b async for b in offline.stream_statsbomb_events(7, batch_size=100)] for e in b] == events
+        with pytest.raises(CacheMissError):
+            await offline.fetch_statsbomb_events(8)
+        assert len(seen) == 3
+    finally:
+        await offline.close()
+        get_settings.cache_clear()
+
+def test_http_cache_evicts_least_recently_used(tmp_path):
+    """
+    The stored size stays under the cap by dropping least-recently-used URLs; identical bodies share one blob.
+    """
+    import os
+    from cryptography.fernet import Fernet
+    from src.tools.cipher import StreamCipher
+    from src.tools.http_cache import HTTPCache
+
+    cache = HTTPCache(str(tmp_path), StreamCipher(Fernet.generate_key()), max_bytes=2_500)
+    bodies = {url: os.urandom(1_000) for url in ('a', 'b', 'c')}
+    cache.store('a', bodies['a'], {})
+    cache.store('a-mirror', bodies['a'], {})
+    cache.store('b', bodies['b'], {})
+    assert len(os.listdir(tmp_path / "blobs")) == 2
+
+    cache.read('a') # Most recently used now
+    cache.store('c', bodies['c'], {})
+    assert cache.lookup('b') is None and cache.read('a') == bodies['a'] and cache.read('c') == bodies['c']
+    assert sum(e['stored_bytes'] for e in {e['sha256']: e for e in cache.index.values()}.values()) <= 2_500
+
+def test_http_cache_skips_bodies_larger_than_the_cap(tmp_path):
+    """
+    A body that alone exceeds the cap is not cached, whole or streamed: nothing else is evicted
+    for it, no temp blob is left behind and a previously cached version of the URL is dropped.
+    """
+    import os
+    from cryptography.fernet import Fernet
+    from src.tools.cipher import StreamCipher
+    from src.tools.http_cache import HTTPCache
+
+    cache = HTTPCache(str(tmp_path), StreamCipher(Fernet.generate_key()), max_bytes=2_500)
+    small = os.urandom(1_000)
+    cache.store('small', small, {})
+    cache.store('big', os.urandom(500), {"ETag": '"v1"'})
+
+    assert cache.store('big', os.urandom(3_000), {"ETag": '"v2"'}) is None
+    writer = cache.writer('big', {"ETag": '"v3"'})
+    for _ in range(8):
+        writer.write(os.urandom(1_000))
+    assert writer.commit() is None
+
+    assert cache.lookup('big') is None and cache.read('small') == small
+    assert len(os.listdir(tmp_path / "blobs")) == 1
+
+@pytest.mark.asyncio
+async def test_http_cache_drops_corrupt_blob_and_downloads_again(tmp_path, monkeypatch):
+    """
+    A cached body that fails decryption after a 304 is dropped and fetched again in full, both
+    buffered and streamed; offline it is a miss. Reads alone leave the index file untouched.
+    """
+    from cryptography.fernet import Fernet
+    from config.settings import get_settings
+    from src.tools.http_cache import CacheMissError
+
+    monkeypatch.setenv("STATSBOMB_GITHUB_URL", "https://feeds.test/data")
+    get_settings.cache_clear()
+    events = [{'id': f'ev-{i}', 'index': i} for i in range(1, 50)]
+    seen, key = [], Fernet.generate_key()
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=events, headers={"ETag": '"v1"'})
+
+    def corrupt():
+        blob = next((tmp_path / "http" / "blobs").iterdir())
+        sealed = bytearray(blob.read_bytes())
+        sealed[-1] ^= 0xFF
+        blob.write_bytes(bytes(sealed))
+
+    fetcher = _cached_fetcher(tmp_path, handler, key)
+    index = tmp_path / "http" / "index.enc"
+    try:
+        assert await fetcher.fetch_statsbomb_events(7) == events
+        written = index.stat().st_mtime_ns
+        assert await fetcher.fetch_statsbomb_events(7) == events
+        assert index.stat().st_mtime_ns == written
+
+        corrupt()
+        assert await fetcher.fetch_statsbomb_events(7) == events
+        corrupt()
+        assert [e for b in [b async for b in fetcher.stream_statsbomb_events(7, batch_size=20)] for e in b] == events
+        assert seen == [None, '"v1"', '"v1"', None, '"v1"', None]
+    finally:
+        await fetcher.close()
+
+    corrupt()
+    offline = _cached_fetcher(tmp_path, handler, key, offline=True)
+    try:
+        with pytest.raises(CacheMissError):
+            await offline.fetch_statsbomb_events(7)
+        assert offline.cache.lookup("https://feeds.test/data/events/7.json") is None
+    finally:
+        await offline.close()
+        get_settings.cache_clear()
+
+@pytest.mark.asyncio
+async def test_record_then_replay_without_network(tmp_path, monkeypatch):
+    """
+    A record-mode run captures every feed; replay serves the same bytes with the server gone and
+    refuses unrecorded requests, and the feed server can serve the cassette to other hosts.
+    """
+    from config.settings import get_settings
+    from benchmarks.feed_server import FeedServer
+    from src.tools.replay import ReplayMissError
+
+    cassette = str(tmp_path / "cassette")
+    monkeypatch.setenv("HTTP_CASSETTE_DIR", cassette)
+
+    async def fetch_all(fetcher):
+        matches = await fetcher.fetch_statsbomb_matches(43, 106)
+        streamed = [e for b in [b async for b in fetcher.stream_statsbomb_events(matches[0]['match_id'], batch_size=40)] for e in b]
+        return matches, streamed, await fetcher.fetch_metrica_tracking("Home")
+
+    with FeedServer(matches=1, events_per_match=100, tracking_frames=20) as server:
+        monkeypatch.setenv("STATSBOMB_GITHUB_URL", server.statsbomb_url)
+        monkeypatch.setenv("METRICA_BASE_URL", server.metrica_url)
+        monkeypatch.setenv("HTTP_MODE", "record")
+        get_settings.cache_clear()
+        async with SecureFetcher() as fetcher:
+            recorded = await fetch_all(fetcher)
+    assert len(recorded[1]) == 100 and recorded[2].startswith(",,,Home")
+
+    monkeypatch.setenv("HTTP_MODE", "replay")
+    get_settings.cache_clear()
+    try:
+        async with SecureFetcher() as fetcher:
+            assert await fetch_all(fetcher) == recorded
+            with pytest.raises(ReplayMissError):
+                await fetcher.fetch_statsbomb_events(1)
+    finally:
+        get_settings.cache_clear()
+
+    with FeedServer(cassette_dir=cassette) as mirror:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{mirror.statsbomb_url}/events/{recorded[0][0]['match_id']}.json")
+        assert response.json() == recorded[1]
+
+@pytest.mark.asyncio
+async def test_feed_server_throttling_is_retried_and_slows_the_limiter(monkeypatch):
+    """
+    An injected 429 is retried by the fetcher and halves the shared limiter's rate.
+    """
+    from config.settings import get_settings
+    from benchmarks.feed_server import FeedServer
+    from src.tools.scheduler import TokenBucket
+
+    with FeedServer(matches=1, events_per_match=20, throttle_every=2, retry_after=0) as server:
+        monkeypatch.setenv("STATSBOMB_GITHUB_URL", server.statsbomb_url)
+        get_settings.cache_clear()
+        limiter = TokenBucket(rate=50.0, burst=4)
+        try:
+            async with SecureFetcher(rate_limiter=limiter) as fetcher:
+                matches = await fetcher.fetch_statsbomb_matches(43, 106)
+                assert len(await fetcher.fetch_statsbomb_events(matches[0]['match_id'])) == 20
+        finally:
+            get_settings.cache_clear()
+        assert server.statuses == {200: 2, 429: 1}
+        assert limiter.rate == pytest.approx(25.0 + 5.0), "Halved by the 429, then one success recovers a tenth"
@@ -36,3 +36,103 @@ def test_score_bounds():
             home_team=home, away_team=away,
             home_score=-1, away_score=0, status='finished'
         )
+
+def test_tracking_block_vectorized_bounds():
+    """
+    Columnar tracking blocks keep the zero-trust guarantees: coordinates outside the pitch
+    run-off, misaligned vectors and undocumented fields are rejected at construction.
+    """
+    import numpy as np
+    from src.models.domain import TrackingBlock
+
+    n = 4
+    home = np.full((n, 11, 2), 50.0)
+    home[:, 10] = np.nan # Off-pitch substitutes are allowed
+    block = TrackingBlock(
+        frame_id=np.arange(n), period=[1, 1, 2, 2], timestamp_ms=np.arange(n) * 40,
+        ball=np.full((n, 2), 60.0), home=home, away=np.full((n, 11, 2), 70.0),
+        home_control=[0.5] * n, away_control=[0.5] * n,
+    )
+    assert len(block) == n and block.home.dtype == np.float32 and block.home.flags['C_CONTIGUOUS']
+    assert len(block.to_frames()[0].home_players) == 10
+
+    bad_home = home.copy()
+    bad_home[2, 3] = [500.0, 40.0]
+    with pytest.raises(ValidationError):
+        TrackingBlock(frame_id=np.arange(n), period=[1] * n, timestamp_ms=np.arange(n),
+                      ball=np.full((n, 2), 60.0), home=bad_home, away=np.empty((n, 0, 2)))
+
+    with pytest.raises(ValidationError):
+        TrackingBlock(frame_id=np.arange(n), period=[1] * n, timestamp_ms=np.arange(n - 1),
+                      ball=np.full((n, 2), 60.0), home=home, away=np.empty((n, 0, 2)))
+
+    with pytest.raises(ValidationError):
+        TrackingBlock(frame_id=np.arange(n), period=[1] * n, timestamp_ms=np.arange(n),
+                      ball=np.full((n, 2), 60.0), home=home, away=np.empty((n, 0, 2)),
+                      injected_malicious_script="<script>alert(1)</script>")
+
+def test_pitch_control_summary_holds_aligned_arrays():
+    """
+    Per-frame surface areas are kept as NumPy vectors, not Python lists, and must stay aligned.
+    """
+    import numpy as np
+    from src.models.domain import PitchControlSummary
+
+    summary = PitchControlSummary(grid_shape=[50, 32], cell_area=6.0, frame_ids=range(3),
+                                  home_area=np.full(3, 4800.0, dtype=np.float32), away_area=[4800.0] * 3)
+    assert summary.frame_ids.dtype == np.int64 and summary.home_area.dtype == np.float64
+
+    with pytest.raises(ValidationError):
+        PitchControlSummary(grid_shape=[50, 32], cell_area=6.0, frame_ids=range(3), home_area=np.zeros(2), away_area=np.zeros(3))
+    with pytest.raises(ValidationError):
+        PitchControlSummary(grid_shape=[50, 32], cell_area=6.0, frame_ids=[1], home_area=[-1.0], away_area=[0.0])
+
+def test_event_batch_isolates_bad_rows():
+    """
+    Batch validation keeps good rows and reports each malformed or injected row individually.
+    """
+    from src.tools.events import map_raw_event, validate_event_batch
+
+    raw = [{'id': f'ev-{i}', 'index': i, 'period': 1, 'timestamp': '00:00:01.000', 'minute': 0, 'second': i,
+            'type': {'name': 'Pass'}, 'possession_team': {'id': 1, 'name': 'Home'}} for i in range(1, 7)]
+    raw[1]['second'] = 75
+    mapped = [map_raw_event(r, 1) for r in raw]
+    mapped[4]['injected_malicious_script'] = "<script>alert(1)</script>"
+
+    events, failures = validate_event_batch(mapped)
+
+    assert [e.event_id for e in events] == ['ev-1', 'ev-3', 'ev-4', 'ev-6']
+    assert [row for row, _ in failures] == [1, 4]
+    assert 'second' in failures[0][1]
+    assert 'injected_malicious_script' in failures[1][1]
+
+def test_columnar_event_block_matches_object_path():
+    """
+    Columnar normalization keeps and drops the same rows as the Pydantic path, with identical xG.
+    """
+    import numpy as np
+    from src.agents.enrich_load import _enrich_event_batch
+    from src.tools.enrich import XGModel
+    from src.tools.events import normalize_event_block
+
+    xg_model = XGModel()
+    raw = [{'id': f'ev-{i}', 'index': i, 'period': 1, 'timestamp': '00:00:01.000', 'minute': 0, 'second': i,
+            'type': {'name': 'Shot' if i % 3 == 0 else 'Pass'}, 'possession_team': {'id': 1, 'name': 'Home'},
+            'player': {'id': i, 'name': f'P{i}'}, 'location': [100.0 + i, 30.0 + i],
+            'shot': {'outcome': {'name': 'Goal'}, 'body_part': {'name': 'Head'}}} for i in range(1, 10)]
+    raw[1]['second'] = 75
+    raw[3]['period'] = 9
+    raw[4]['minute'] = "not a number"
+    raw[6]['location'] = ["x", 1.0]
+    raw[7]['possession_team']['name'] = 7
+
+    events, _ = _enrich_event_batch(raw, 1, xg_model)
+    block, drops = normalize_event_block(raw, 1, xg_model)
+
+    assert list(block.event_id) == [e.event_id for e in events]
+    assert sorted(d[0] for d in drops) == ['ev-2', 'ev-4', 'ev-5', 'ev-7', 'ev-8']
+    assert np.allclose(block.xg[~np.isnan(block.xg)], [e.shot_context.xg for e in events if e.shot_context])
+    assert list(block.shot_outcome[~np.isnan(block.xg)]) == ['Goal'] * 3
+
+    with pytest.raises(ValidationError):
+        type(block)(**{**dict(block), 'period': np.full(len(block), 6)})
@@ -0,0 +1,377 @@
+import os
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet
+from config.settings import get_settings
+from src.tools.reader import get_table_cache
+
+@pytest.fixture
+def secure_env(tmp_path, monkeypatch):
+    """Points storage at a temporary directory with a freshly generated Fernet key."""
+    monkeypatch.setenv("FERNET_ENCRYPTION_KEY", Fernet.generate_key().decode())
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("DUCKDB_PATH", str(tmp_path / "db" / "test.duckdb"))
+    monkeypatch.chdir(tmp_path) # Keep any relative output paths inside the test directory
+    (tmp_path / "db").mkdir()
+    get_settings.cache_clear()
+    get_table_cache.cache_clear()
+    yield tmp_path
+    get_settings.cache_clear()
+    get_table_cache.cache_clear()
+
+def _match(match_id: int) -> dict:
+    return {'match_id': match_id, 'home_team': {'team_name': 'Home'}, 'away_team': {'team_name': 'Away'}, 'status': 'finished'}
+
+def test_event_block_loads_set_based(secure_env):
+    """
+    Columnar event blocks insert in one statement, with NaN shot metrics stored as NULL.
+    """
+    from src.tools.events import normalize_event_block
+    from src.tools.enrich import XGModel
+    from src.tools.secure_db import SecureDB
+
+    raw = [{'id': f'ev-{i}', 'index': i, 'period': 1, 'minute': 0, 'second': i, 'type': {'name': 'Shot' if i == 2 else 'Pass'},
+            'possession_team': {'id': 1, 'name': 'Home'}, 'location': [110.0, 40.0]} for i in range(1, 4)]
+    block, _ = normalize_event_block(raw, 5, XGModel())
+
+    db = SecureDB()
+    try:
+        db.upsert_match_data({'match': _match(5), 'events': [], 'event_blocks': [block.model_dump()], 'total_home_xg': 0.0, 'total_away_xg': 0.0})
+        rows = db.conn.execute("SELECT event_id, match_id, xg IS NULL, xa FROM events ORDER BY index").fetchall()
+    finally:
+        db.close()
+
+    assert [r[:3] for r in rows] == [('ev-1', 5, True), ('ev-2', 5, False), ('ev-3', 5, True)]
+    assert rows[1][3] is None # xA is credited to assisting passes, not shots
+
+def test_reloading_a_match_replaces_its_events(secure_env):
+    """
+    The set-based load deletes a match's previous events, keeps other matches and lets the last duplicate id win.
+    """
+    from src.tools.secure_db import SecureDB
+
+    def event(event_id, match_id, index, type_name='Pass'):
+        return {'event_id': event_id, 'match_id': match_id, 'index': index, 'period': 1, 'minute': 0, 'second': 1,
+                'type_name': type_name, 'player': None, 'shot_context': None, 'pass_context': None}
+
+    db = SecureDB()
+    try:
+        db.upsert_match_data({'match': _match(1), 'events': [event('a', 1, 1), event('stale', 1, 2)], 'total_home_xg': 0.0, 'total_away_xg': 0.0})
+        db.upsert_match_data({'match': _match(2), 'events': [event('b', 2, 1)], 'total_home_xg': 0.0, 'total_away_xg': 0.0})
+        db.upsert_match_data({'match': _match(1), 'events': [event('a', 1, 1), event('c', 1, 2), event('c', 1, 3, 'Shot')],
+                              'total_home_xg': 0.0, 'total_away_xg': 0.0})
+        rows = db.conn.execute("SELECT event_id, match_id, type_name FROM events ORDER BY event_id").fetchall()
+    finally:
+        db.close()
+
+    assert rows == [('a', 1, 'Pass'), ('b', 2, 'Pass'), ('c', 1, 'Shot')]
+
+def test_tracking_table_roundtrip_with_projection_and_filters(secure_env):
+    """
+    Tracking blocks land in typed per-frame and long per-player tables, read back projected and filtered.
+    """
+    from src.models.domain import TrackingBlock
+    from src.tools.secure_db import SecureDB, read_tracking
+
+    n = 6
+    home = np.full((n, 2, 2), np.nan, dtype=np.float32)
+    home[:, 0] = (10.0, 20.0)
+    away = np.full((n, 1, 2), 30.0, dtype=np.float32)
+    ball = np.full((n, 2), 50.0, dtype=np.float32)
+    ball[2] = np.nan # Ball out of play
+    block = TrackingBlock(frame_id=np.arange(1, n + 1), period=[1, 1, 1, 2, 2, 2], timestamp_ms=np.arange(n) * 40,
+                          ball=ball, home=home, away=away, home_player_ids=['H1', 'H2'], away_player_ids=['A1'],
+                          home_control=np.linspace(0, 1, n), away_control=1 - np.linspace(0, 1, n), fps=25.0)
+
+    db = SecureDB()
+    try:
+        db.upsert_match_data({'match': _match(3), 'events': [], 'tracking_blocks': [block.model_dump()], 'tracking_fps': 25.0,
+                              'total_home_xg': 0.0, 'total_away_xg': 0.0})
+        db.flush_to_encrypted_disk()
+    finally:
+        db.close()
+
+    frames = read_tracking(columns=['frame_id', 'ball_x', 'home_control'], match_id=3, period=1, frame_range=(2, 10))
+    assert list(frames.columns) == ['frame_id', 'ball_x', 'home_control']
+    assert list(frames['frame_id']) == [2, 3]
+    assert np.isnan(frames['ball_x'][1]) # Stored as NULL
+    assert frames['home_control'][0] == pytest.approx(0.2)
+
+    players = read_tracking(players=True, match_id=3, frame_range=(4, 4))
+    assert sorted(zip(players['team'], players['player_id'])) == [('away', 'A1'), ('home', 'H1')] # H2 never on the pitch
+    assert read_tracking(match_id=99).empty
+
+    with pytest.raises(ValueError):
+        read_tracking(columns=['frame_id; DROP TABLE tracking'])
+
+def test_segments_append_and_supersede_reloaded_matches(secure_env):
+    """
+    Each flush appends one segment; readers see the union, with a reloaded match taken from its newest segment.
+    """
+    from src.tools.secure_db import SecureDB, open_segment_store, read_table
+
+    def load(match_id, event_ids, home_xg=0.0):
+        events = [{'event_id': e, 'match_id': match_id, 'index': i + 1, 'period': 1, 'minute': 0, 'second': 1,
+                   'type_name': 'Pass', 'player': None, 'shot_context': None, 'pass_context': None} for i, e in enumerate(event_ids)]
+        db = SecureDB()
+        try:
+            db.upsert_match_data({'match': _match(match_id), 'events': events, 'total_home_xg': home_xg, 'total_away_xg': 0.0})
+            return db.flush_to_encrypted_disk()
+        finally:
+            db.close()
+
+    first = load(1, ['a', 'b'])
+    load(2, ['c'])
+    store = open_segment_store()
+    first_events = secure_env / "db" / "test_segments" / first["tables"]["events"]
+    assert first_events.exists()
+
+    load(1, ['a2'], home_xg=1.5) # Reload supersedes the whole first segment
+
+    matches = read_table('matches').sort_values('match_id')
+    assert list(matches['match_id']) == [1, 2]
+    assert list(matches['total_home_xg']) == [1.5, 0.0]
+    assert sorted(read_table('events', ['event_id'])['event_id']) == ['a2', 'c']
+
+    assert [s['match_ids'] for s in store.load_manifest()['segments']] == [[2], [1]]
+    assert not first_events.exists()
+    assert b'match_ids' not in (secure_env / "db" / "test_segments" / "manifest.enc").read_bytes()
+
+def test_concurrent_appends_keep_every_segment(tmp_path, monkeypatch):
+    """
+    Appends racing on one store serialize their manifest update, so no writer drops another's segment.
+    """
+    import time
+    import pyarrow as pa
+    from concurrent.futures import ThreadPoolExecutor
+    from src.tools.cipher import StreamCipher
+    from src.tools.segments import SegmentStore
+
+    save = SegmentStore._save_manifest
+    def slow_save(self, manifest):
+        time.sleep(0.02) # Widen the read-modify-write window
+        save(self, manifest)
+    monkeypatch.setattr(SegmentStore, "_save_manifest", slow_save)
+
+    key = Fernet.generate_key()
+    def append(match_id):
+        store = SegmentStore(str(tmp_path / "segments"), StreamCipher(key))
+        return store.append({'matches': pa.table({'match_id': [match_id]}).to_reader()}, [match_id])
+
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(append, range(1, 7)))
+    segments = SegmentStore(str(tmp_path / "segments"), StreamCipher(key)).load_manifest()["segments"]
+    assert sorted(m for s in segments for m in s["match_ids"]) == [1, 2, 3, 4, 5, 6]
+
+def test_chunked_cipher_roundtrip_tamper_and_legacy_fernet():
+    """
+    Multi-chunk containers round-trip, any flipped or truncated chunk fails authentication, and legacy Fernet tokens still decrypt.
+    """
+    import io
+    from src.tools.cipher import StreamCipher, TAG_SIZE
+
+    key = Fernet.generate_key()
+    cipher = StreamCipher(key, chunk_size=64)
+    for size in (0, 1, 64, 128, 1000):
+        data = (bytes(range(256)) * 4)[:size]
+        sealed = cipher.encrypt(data)
+        assert cipher.decrypt(sealed) == data
+        assert StreamCipher(key, chunk_size=7).decrypt(sealed) == data # Chunk size comes from the header
+
+    sealed = cipher.encrypt(b'x' * 1000)
+    assert len(sealed) < 1000 + 20 * TAG_SIZE + 32
+    out = io.BytesIO()
+    cipher.decrypt_stream(io.BytesIO(sealed), out)
+    assert out.getvalue() == b'x' * 1000
+
+    tampered = bytearray(sealed)
+    tampered[100] ^= 1
+    dropped_last_chunk = sealed[:-(1000 % 64 + TAG_SIZE)]
+    for bad in (bytes(tampered), dropped_last_chunk, sealed[:-1]):
+        with pytest.raises(Exception):
+            cipher.decrypt(bad)
+    with pytest.raises(Exception):
+        StreamCipher(Fernet.generate_key()).decrypt(sealed)
+
+    assert cipher.decrypt(Fernet(key).encrypt(b'legacy parquet')) == b'legacy parquet'
+
+def test_flush_and_read_leave_no_plaintext_on_disk(secure_env):
+    """
+    Segments are encoded and decoded in memory; legacy whole-table Fernet files are still read alongside them.
+    """
+    import io
+    import pandas as pd
+    from src.tools.secure_db import SecureDB, read_table
+
+    legacy = io.BytesIO()
+    pd.DataFrame({'match_id': [9], 'home_team': ['Old'], 'away_team': ['Away']}).to_parquet(legacy)
+    key = get_settings().get_fernet_bytes()
+    (secure_env / "db" / "test_matches.enc").write_bytes(Fernet(key).encrypt(legacy.getvalue()))
+
+    db = SecureDB()
+    try:
+        db.upsert_match_data({'match': _match(1), 'events': [], 'total_home_xg': 0.0, 'total_away_xg': 0.0})
+        db.flush_to_encrypted_disk()
+    finally:
+        db.close()
+    matches = read_table('matches').sort_values('match_id')
+
+    assert list(matches['home_team']) == ['Home', 'Old']
+    files = [p for p in secure_env.rglob('*') if p.is_file()]
+    assert not [p for p in files if p.suffix in ('.parquet', '.tmp')]
+    assert not [p for p in files if b'PAR1' in p.read_bytes()]
+
+def test_manifest_statistics_prune_segment_decryption(secure_env, monkeypatch):
+    """
+    Reads filtered by match, competition, season or date only decrypt segments whose manifest statistics can match.
+    """
+    from datetime import datetime, timezone
+    from src.tools.cipher import StreamCipher
+    from src.tools.secure_db import SecureDB, open_segment_store, read_table
+
+    fixtures = [(1, 43, 106, '2022-11-20'), (2, 43, 106, '2022-12-18'), (3, 11, 90, '2020-07-19')]
+    for match_id, competition_id, season_id, day in fixtures:
+        match = {**_match(match_id), 'competition_id': competition_id, 'season_id': season_id,
+                 'match_date': datetime.fromisoformat(day).replace(hour=15, tzinfo=timezone.utc)}
+        events = [{'event_id': f'{match_id}-{i}', 'match_id': match_id, 'index': i, 'period': 1, 'minute': 0, 'second': i,
+                   'type_name': 'Pass', 'player': None, 'shot_context': None, 'pass_context': None} for i in range(1, 4)]
+        db = SecureDB()
+        try:
+            db.upsert_match_data({'match': match, 'events': events, 'total_home_xg': 0.0, 'total_away_xg': 0.0})
+            db.flush_to_encrypted_disk()
+        finally:
+            db.close()
+
+    stats = open_segment_store().load_manifest()['segments'][0]['stats']
+    assert stats['events']['rows'] == 3 and stats['events']['ranges']['match_id'] == [1, 1]
+    assert stats['matches']['values'] == {'competition_id': [43], 'season_id': [106]}
+    assert stats['matches']['ranges']['match_date'] == ['2022-11-20', '2022-11-20']
+
+    monkeypatch.setenv("READER_CACHE_BYTES", "0") # Count every decryption
+    get_settings.cache_clear()
+    get_table_cache.cache_clear()
+    decrypted = []
+    original = StreamCipher.open_reader
+    def counting(self, path):
+        decrypted.append(os.path.basename(os.path.dirname(path)))
+        return original(self, path)
+    monkeypatch.setattr(StreamCipher, 'open_reader', counting)
+
+    events = read_table('events', ['event_id'], competition_id=11)
+    assert sorted(events['event_id']) == ['3-1', '3-2', '3-3']
+    assert decrypted == ['matches', 'events'] # One matches segment to resolve ids, one events segment
+
+    decrypted.clear()
+    matches = read_table('matches', ['match_id'], competition_id=43, match_dates=('2022-12-01', None))
+    assert list(matches['match_id']) == [2] and decrypted == ['matches']
+
+    decrypted.clear()
+    assert len(read_table('events', match_ids=[1, 3])) == 6 and len(decrypted) == 2
+
+    decrypted.clear()
+    assert read_table('events', ['event_id'], season_id=1).empty and decrypted == []
+
+@pytest.mark.asyncio
+async def test_storage_session_flush_cadence_and_failure(secure_env):
+    """
+    A run-scoped session flushes every N matches or M seconds, and whatever is pending when the run fails.
+    """
+    from datetime import datetime, timezone
+    from src.agents.enrich_load import loader_node
+    from src.models.domain import Match, MatchEnrichedPayload, Team
+    from src.tools.secure_db import StorageSession, open_segment_store, read_table
+
+    def payload(match_id):
+        match = Match(match_id=match_id, match_date=datetime(2022, 12, 18, tzinfo=timezone.utc), competition_id=43, season_id=106,
+                      home_team=Team(team_id=1, team_name='Home'), away_team=Team(team_id=2, team_name='Away'), home_score=0, away_score=0)
+        return MatchEnrichedPayload(match=match, events=[])
+
+    now = [0.0]
+    session = StorageSession(flush_every_matches=2, flush_every_seconds=60.0, clock=lambda: now[0])
+    for match_id in (1, 2, 3):
+        state = await loader_node({"enriched_payload": payload(match_id), "errors": []}, storage_session=session)
+        assert state["pipeline_status"] == "validating"
+    assert session.pending == [3] and len(session.segments) == 1
+
+    now[0] = 61.0
+    await loader_node({"enriched_payload": payload(4), "errors": []}, storage_session=session) # Interval elapsed
+    assert session.pending == []
+
+    with pytest.raises(RuntimeError):
+        with session:
+            session.load(payload(5).model_dump())
+            raise RuntimeError("run failed")
+
+    assert [s['match_ids'] for s in open_segment_store().load_manifest()['segments']] == [[1, 2], [3, 4], [5]]
+    assert sorted(read_table('matches')['match_id']) == [1, 2, 3, 4, 5]
+
+    # A failed reload of a pending match drops it entirely, and the session still closes cleanly
+    session = StorageSession(flush_every_matches=10)
+    session.load(payload(6).model_dump())
+    broken = payload(6).model_dump()
+    broken['events'] = None
+    with pytest.raises(Exception):
+        session.load(broken)
+    assert session.pending == []
+    session.close()
+    assert len(open_segment_store().load_manifest()['segments']) == 3
+
+def test_reader_cache_is_byte_bounded_and_keyed_on_file_version(secure_env):
+    """
+    Decoded tables are reused until their file changes, evicted least-recently-used past the byte budget, and decrypted in parallel on misses.
+    """
+    import pyarrow as pa
+    from src.tools.cipher import StreamCipher
+    from src.tools.reader import DecryptedTableCache, read_tables
+    from src.tools.segments import _write_parquet
+
+    cipher = StreamCipher(get_settings().get_fernet_bytes())
+    def write(name, values):
+        batch = pa.record_batch({'match_id': pa.array(values, pa.int64())})
+        path = secure_env / f"{name}.enc"
+        with open(path, 'wb') as f, cipher.writer(f) as sink:
+            _write_parquet(pa.RecordBatchReader.from_batches(batch.schema, [batch]), sink, {})
+        return str(path)
+
+    paths = [write(f"seg{i}", [i] * 1000) for i in range(3)] # 8,000 bytes each
+    cache = DecryptedTableCache(max_bytes=20_000)
+    tables = read_tables(paths, cipher, cache, workers=3)
+    assert [t['match_id'][0].as_py() for t in tables] == [0, 1, 2]
+    assert len(cache) == 2 and cache.nbytes <= 20_000 # seg0 evicted
+
+    assert read_tables(paths[1:], cipher, cache)[0] is tables[1]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+    write("seg1", [7] * 1000)
+    os.utime(paths[1], ns=(1, 1)) # Same size, so only the mtime tells the rewrite apart
+    assert read_tables([paths[1]], cipher, cache)[0]['match_id'][0].as_py() == 7
+
+def test_projected_filtered_reads_decrypt_only_needed_chunks(secure_env, monkeypatch):
+    """
+    Projection and filters are pushed into the Parquet scan, so pruned row groups and unread columns are never decrypted.
+    """
+    import pyarrow as pa
+    from src.tools.cipher import DecryptingReader, StreamCipher
+    from src.tools.reader import decrypt_table
+    from src.tools.segments import _write_parquet
+
+    cipher = StreamCipher(get_settings().get_fernet_bytes(), chunk_size=4096)
+    batches = [pa.record_batch({'match_id': pa.array([m] * 5000, pa.int64()), 'frame_id': pa.array(range(5000), pa.int64()),
+                                'x': pa.array(np.random.default_rng(m).random(5000))}) for m in range(1, 9)]
+    path = secure_env / "tracking.enc"
+    with open(path, 'wb') as f, cipher.writer(f) as sink:
+        _write_parquet(pa.RecordBatchReader.from_batches(batches[0].schema, batches), sink, {})
+
+    chunks = set()
+    original = DecryptingReader._chunk
+    def counting(self, index):
+        chunks.add(index)
+        return original(self, index)
+    monkeypatch.setattr(DecryptingReader, '_chunk', counting)
+
+    table = decrypt_table(str(path), cipher, ['frame_id'], [('match_id', '=', 5), ('frame_id', '<', 10)])
+    assert table.column_names == ['frame_id'] and table['frame_id'].to_pylist() == list(range(10))
+    total = -(-(path.stat().st_size - 17) // (4096 + 16))
+    assert len(chunks) < total / 4, f"decrypted {len(chunks)} of {total} chunks"
+
+    assert decrypt_table(str(path), cipher, ['frame_id'], [('period', '=', 1)]).num_rows == 0 # Column absent from this file
@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+from src.tools.tracking import MetricaTrackingReader, iter_metrica_chunks, read_metrica_tracking
+
+METRICA_CSV = """,,,Away,,Away,,Away,,,
+,,,25,,15,,16,,,
+Period,Frame,Time [s],Player25,,Player15,,Player16,,Ball,
+1,1,0.04,0.5,0.25,NaN,NaN,0.1,0.9,0.45,0.39
+1,2,0.08,0.5,0.26,NaN,NaN,0.1,0.9,0.46,0.39
+1,3,0.12,0.51,0.27,0.2,0.3,0.1,0.9,NaN,NaN
+2,4,0.16,0.52,0.28,0.2,0.3,0.1,0.9,0.5,0.5
+2,5,0.20,0.53,0.29,0.2,0.3,0.1,0.9,0.5,0.5
+"""
+
+def test_metrica_header_maps_every_player_pair():
+    """
+    The team/jersey header rows are read once and every Player column pair becomes a slot.
+    """
+    reader = MetricaTrackingReader(METRICA_CSV, chunk_size=2)
+    assert reader.team == "Away"
+    assert reader.player_ids == ["Away_25", "Away_15", "Away_16"]
+
+    chunks = list(reader)
+    assert [len(c) for c in chunks] == [2, 2, 1], "Chunks must be bounded by chunk_size"
+
+    first = chunks[0]
+    assert first.positions.shape == (2, 3, 2) and first.positions.dtype == np.float32
+    assert np.allclose(first.positions[0, 0], [60.0, 20.0]), "Coordinates are scaled to the 120x80 pitch"
+    assert np.isnan(first.positions[0, 1]).all(), "Players off the pitch stay NaN"
+    assert first.timestamps_ms.tolist() == [40, 80]
+    assert np.isnan(chunks[1].ball[0]).all()
+    assert chunks[1].periods.tolist() == [1, 2]
+
+def test_metrica_named_columns_and_full_read():
+    """
+    Pre-flattened Home_N_x/Home_N_y exports parse the same way, and a full read stitches all chunks.
+    """
+    csv = "a\nb\nPeriod,Frame,Time [s],Home_1_x,Home_1_y,Home_7_x,Home_7_y,Ball_x,Ball_y\n"
+    csv += "".join(f"1,{f},{f * 0.04:.2f},0.5,0.5,0.25,0.75,0.5,0.5\n" for f in range(1, 11))
+
+    tracking = read_metrica_tracking(csv, chunk_size=3)
+    assert tracking.player_ids == ["Home_1", "Home_7"]
+    assert tracking.frame_ids.tolist() == list(range(1, 11))
+    assert np.allclose(tracking.positions[:, 1], [30.0, 60.0])
+    assert np.allclose(tracking.ball, [60.0, 40.0])
+
+    with pytest.raises(ValueError):
+        list(iter_metrica_chunks("no,header\n1,2\n"))
+
+def test_metrica_source_dispatches_on_type(tmp_path):
+    """
+    Paths must be os.PathLike; a str is always CSV text, even a single line that looks like a path.
+    """
+    path = tmp_path / "home.csv"
+    path.write_text(METRICA_CSV)
+    assert MetricaTrackingReader(path).player_ids == MetricaTrackingReader(METRICA_CSV).player_ids
+
+    with pytest.raises(ValueError, match="no column header"):
+        list(iter_metrica_chunks(str(path)))
+    with pytest.raises(TypeError):
+        MetricaTrackingReader(METRICA_CSV.encode())
+
+def _block(n, start=1, period_split=None):
+    from src.models.domain import TrackingBlock
+
+    rng = np.random.default_rng(start)
+    periods = np.ones(n) if period_split is None else np.where(np.arange(n) < period_split, 1, 2)
+    home = rng.uniform(0.0, 80.0, size=(n, 3, 2))
+    home[::7, 2] = np.nan
+    return TrackingBlock(
+        frame_id=np.arange(start, start + n), period=periods, timestamp_ms=np.arange(start, start + n) * 40,
+        ball=rng.uniform(0.0, 80.0, size=(n, 2)), home=home, away=np.empty((n, 0, 2)),
+        home_control=rng.uniform(0.0, 1.0, n), away_control=rng.uniform(0.0, 1.0, n),
+    )
+
+@pytest.mark.parametrize("mode", ["stride", "mean"])
+def test_decimation_is_chunk_invariant(mode):
+    """
+    Decimating a stream chunk by chunk must match decimating the whole match at once,
+    and window means must never mix two periods.
+    """
+    from src.models.domain import TrackingBlock
+    from src.tools.tracking import TrackingDecimator, decimate_blocks, infer_fps
+
+    whole = _block(103, period_split=52)
+    assert infer_fps(whole.timestamp_ms) == 25.0
+
+    expected = decimate_blocks([whole], target_fps=5.0, mode=mode)
+    chunks = [whole.take(slice(lo, lo + 16)) for lo in range(0, len(whole), 16)]
+    streamed = decimate_blocks(chunks, target_fps=5.0, mode=mode)
+
+    expected, streamed = TrackingBlock.concat(expected), TrackingBlock.concat(streamed)
+    assert streamed.fps == expected.fps == 5.0
+    assert np.array_equal(streamed.frame_id, expected.frame_id)
+    assert np.allclose(streamed.home, expected.home, equal_nan=True)
+    assert np.allclose(streamed.home_control, expected.home_control)
+
+    if mode == "mean":
+        # 52 frames of period 1 -> 11 windows, 51 of period 2 -> 11 windows
+        assert len(expected) == 22 and expected.frame_id[11] == 53
+        assert np.isclose(expected.home_control[0], whole.home_control[:5].mean())
+    else:
+        assert expected.frame_id.tolist() == list(range(1, 104, 5))
+
+    with pytest.raises(ValueError):
+        TrackingDecimator(5, mode="median")
+
+def test_source_rate_is_inferred_across_chunks_and_checked_later():
+    """
+    A short first chunk with dropped frames does not fix the source rate: it is inferred over
+    enough frames across chunk borders, later chunks off that rate are counted, and blocks are
+    stamped on copies rather than mutated.
+    """
+    from src.tools.tracking import SourceRateStamper, infer_fps
+
+    whole = _block(60)
+    timestamps = np.arange(60) * 40
+    timestamps[:3] = [0, 80, 160] # Dropped frames at the start
+    timestamps[3:] += 120
+    timestamps[48:] = timestamps[47] + np.arange(1, 13) * 100 # Last chunk sampled at 10fps
+    whole = whole.model_copy(update={'timestamp_ms': timestamps})
+    chunks = [whole.take(slice(lo, lo + 3)) for lo in range(0, 60, 3)]
+    assert infer_fps(chunks[0].timestamp_ms) == 12.5
+
+    stamper = SourceRateStamper(min_frames=20)
+    released = [stamper.push(c) for c in chunks]
+    released.append(stamper.flush())
+    assert [len(r) for r in released[:7]] == [0] * 6 + [7]
+    assert stamper.fps == 25.0 and all(b.fps == 25.0 for r in released for b in r)
+    assert sum(len(b) for r in released for b in r) == 60 and chunks[0].fps is None
+    assert stamper.mismatched_blocks == 4
+
+def test_home_away_alignment_outer_joins_on_frame():
+    """
+    Home and Away files are merged on Frame across chunk borders; frames in only one file
+    keep the other squad as NaN and the duplicated ball columns collapse into one.
+    """
+    from src.models.domain import TrackingBlock
+    from src.tools.tracking import iter_aligned_tracking
+
+    header = ",,,{t},,{t},,,\n,,,{a},,{b},,,\nPeriod,Frame,Time [s],Player{a},,Player{b},,Ball,\n"
+    home = header.format(t="Home", a=1, b=2) + "".join(
+        f"1,{f},{f * 0.04:.2f},0.1,0.1,0.2,0.2,{'NaN,NaN' if f == 4 else '0.5,0.5'}\n" for f in range(1, 8))
+    away = header.format(t="Away", a=25, b=26) + "".join(
+        f"1,{f},{f * 0.04:.2f},0.9,0.9,0.8,0.8,0.6,0.6\n" for f in range(3, 11))
+
+    blocks = list(iter_aligned_tracking(home, away, chunk_size=3))
+    merged = TrackingBlock.concat(blocks)
+
+    assert merged.frame_id.tolist() == list(range(1, 11))
+    assert merged.home_player_ids == ["Home_1", "Home_2"] and merged.away_player_ids == ["Away_25", "Away_26"]
+    assert np.isnan(merged.away[:2]).all() and np.isnan(merged.home[7:]).all()
+    assert np.allclose(merged.home[2:7, 0], [12.0, 8.0]) and np.allclose(merged.away[2:, 1], [96.0, 64.0])
+    assert np.allclose(merged.ball[0], [60.0, 40.0]), "Home ball is preferred where both files have it"
+    assert np.allclose(merged.ball[3], [72.0, 48.0]), "Away ball fills a frame where home has none"
+    assert merged.timestamp_ms.tolist() == [f * 40 for f in range(1, 11)]
@@ -17,6 +17,35 @@ def test_xg_model_bounds():
     assert 0.0 <= long_shot <= 1.0, f"Expected 0<=xg<=1, got {long_shot}"
     assert tap_in > long_shot, "A tap in should strictly have a higher xG than a half-way line shot."
 
+def test_xg_model_path_resolves_from_root_and_getter_never_persists(tmp_path, monkeypatch):
+    """
+    A relative XG_MODEL_PATH resolves against the project root, not the working directory;
+    the getter only fits in memory when coefficients are missing, and fit_xg_model persists them.
+    """
+    import os
+    from cryptography.fernet import Fernet
+    from config.settings import PROJECT_ROOT, get_settings
+    from src.tools import enrich
+
+    monkeypatch.setenv("FERNET_ENCRYPTION_KEY", Fernet.generate_key().decode())
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.chdir(tmp_path)
+    get_settings.cache_clear()
+    assert get_settings().get_xg_model_path() == os.path.join(PROJECT_ROOT, "config", "xg_model.json")
+
+    path = tmp_path / "models" / "xg.json"
+    monkeypatch.setenv("XG_MODEL_PATH", str(path))
+    get_settings.cache_clear()
+    monkeypatch.setattr(enrich, "_xg_model_instance", None)
+    try:
+        unpersisted = enrich.get_xg_model()
+        assert not path.exists()
+        fitted = enrich.fit_xg_model()
+        assert path.exists() and enrich.get_xg_model() is fitted
+        assert XGModel.load(str(path)).coefficients_hash() == unpersisted.coefficients_hash()
+    finally:
+        get_settings.cache_clear()
+
 def test_xg_angle_math():
     model = XGModel()
     # Dead center
@@ -27,3 +56,174 @@ def test_xg_angle_math():
     # Far corner flag (angle to goal should be extremely acute)
     dist2, corner_angle = model._calculate_distance_and_angle(120.0, 0.0)
     assert corner_angle < angle, "Corner flag should have tighter angle than central box."
+
+def test_xg_batch_matches_scalar():
+    """
+    The vectorized batch scorer must agree with the per-shot path for xG, distance and angle.
+    """
+    model = XGModel()
+    xs = [118.0, 60.0, 110.0, 120.0, 102.5, 120.0]
+    ys = [40.0, 40.0, 40.0, 0.0, 22.0, 36.0]
+
+    xg, distance, angle = model.predict_xg_batch(xs, ys)
+    assert xg.shape == distance.shape == angle.shape == (len(xs),)
+
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        dist, ang = model._calculate_distance_and_angle(x, y)
+        assert abs(distance[i] - dist) < 1e-9
+        assert abs(angle[i] - ang) < 1e-9
+        assert abs(xg[i] - model.predict_xg(x, y)) < 1e-9
+
+    empty_xg, _, _ = model.predict_xg_batch([], [])
+    assert empty_xg.size == 0
+
+def test_xg_grid_interpolation_error(tmp_path):
+    """
+    Grid-backed xG must stay within a bounded error of the exact logistic model,
+    including shots near the posts and off the pitch, and must be cached by coefficient hash.
+    """
+    import numpy as np
+
+    exact = XGModel()
+    gridded = XGModel()
+    grid = gridded.enable_grid(cache_dir=str(tmp_path), resolution=0.25)
+
+    cached = list(tmp_path.glob("xg_grid_*.npy"))
+    assert len(cached) == 1 and gridded.coefficients_hash(0.25) in cached[0].name
+
+    rng = np.random.default_rng(7)
+    xs = np.concatenate([rng.uniform(0.0, 120.0, 50_000), [120.0, 119.9, 119.8, 125.0]])
+    ys = np.concatenate([rng.uniform(0.0, 80.0, 50_000), [36.0, 43.9, 40.0, 40.0]])
+
+    truth, _, _ = exact.predict_xg_batch(xs, ys)
+    approx, _, _ = gridded.predict_xg_batch(xs, ys)
+    assert np.max(np.abs(truth - approx)) <= 2e-3
+
+    # A second model with identical coefficients reuses the cached lattice
+    reloaded = XGModel().enable_grid(cache_dir=str(tmp_path), resolution=0.25)
+    assert np.array_equal(reloaded.values, grid.values)
+
+def test_xg_persisted_coefficients_roundtrip(tmp_path):
+    """
+    A model restored from persisted coefficients must score identically without refitting.
+    """
+    fitted = XGModel()
+    path = tmp_path / "xg_model.json"
+    fitted.save(str(path))
+
+    restored = XGModel.load(str(path))
+    assert restored.model is None, "Loading coefficients must not fit a scikit-learn estimator"
+    assert restored.coefficients_hash() == fitted.coefficients_hash()
+    assert restored.predict_xg(105.0, 30.0) == fitted.predict_xg(105.0, 30.0)
+
+def test_pitch_control_batch_matches_frame_path():
+    """
+    Vectorized pitch control must agree with the per-frame model and ignore off-pitch (NaN) players.
+    """
+    import numpy as np
+    from src.models.domain import TrackingFrame, Location
+
+    model = XGModel()
+    rng = np.random.default_rng(3)
+    home = rng.uniform(0.0, 80.0, size=(50, 11, 2))
+    away = rng.uniform(0.0, 80.0, size=(50, 11, 2))
+    ball = rng.uniform(0.0, 80.0, size=(50, 2))
+    home[:, 10, :] = np.nan # Substitute not yet on the pitch
+    away[5, :, :] = np.nan  # Whole away squad missing for one frame
+    ball[7, :] = np.nan     # Ball out of play
+
+    home_ctrl, away_ctrl = model.calculate_pitch_control_batch(home, away, ball)
+    assert home_ctrl.shape == away_ctrl.shape == (50,)
+
+    for f in (0, 17, 49):
+        frame = TrackingFrame(
+            frame_id=f, period=1, timestamp_ms=f * 40,
+            ball_location=Location(x=float(ball[f, 0]), y=float(ball[f, 1])),
+            home_players=[Location(x=float(x), y=float(y)) for x, y in home[f, :10]],
+            away_players=[Location(x=float(x), y=float(y)) for x, y in away[f]],
+        )
+        expected = model.calculate_pitch_control(frame, True)
+        assert abs(home_ctrl[f] - expected['home']) < 1e-9
+        assert abs(away_ctrl[f] - expected['away']) < 1e-9
+
+    assert (home_ctrl[5], away_ctrl[5]) == (1.0, 0.0)
+    assert (home_ctrl[7], away_ctrl[7]) == (0.5, 0.5)
+
+    # An absent squad may be passed as an empty list
+    solo_home, solo_away = model.calculate_pitch_control_batch(home, [], ball)
+    assert solo_home[0] == 1.0 and solo_away[0] == 0.0
+
+def test_pitch_control_surface_engine_process_pool():
+    """
+    The surface engine must give identical results in-process and across the shared-memory
+    process pool, conserve total pitch area, and favour the squad closest to a cell.
+    """
+    import numpy as np
+    from src.tools.enrich import PitchControlSurfaceEngine
+
+    rng = np.random.default_rng(11)
+    home = rng.uniform(0.0, 80.0, size=(300, 14, 2)).astype(np.float32)
+    away = rng.uniform(0.0, 80.0, size=(300, 14, 2)).astype(np.float32)
+    home[:, 11:] = np.nan # Unused substitutes
+    away[:, 11:] = np.nan
+
+    serial = PitchControlSurfaceEngine(grid_shape=(24, 16), workers=1).compute(home, away, keep_surfaces=True)
+    pooled = PitchControlSurfaceEngine(grid_shape=(24, 16), workers=2, frames_per_task=64).compute(home, away, keep_surfaces=True)
+
+    assert serial.surfaces.shape == (300, 16, 24)
+    assert np.allclose(serial.home_area, pooled.home_area)
+    assert np.allclose(serial.surfaces, pooled.surfaces)
+    assert np.allclose(serial.home_area + serial.away_area, 120.0 * 80.0)
+
+    # A lone home player in the left half and a lone away player in the right half split the pitch
+    lone_home = np.array([[[20.0, 40.0]]], dtype=np.float32)
+    lone_away = np.array([[[100.0, 40.0]]], dtype=np.float32)
+    split = PitchControlSurfaceEngine(grid_shape=(24, 16), workers=1).compute(lone_home, lone_away, keep_surfaces=True)
+    assert split.surfaces[0, 8, 2] > 0.99 and split.surfaces[0, 8, 21] < 0.01
+    assert abs(split.home_area[0] - split.away_area[0]) < 1e-3
+
+def test_expected_assists_link_across_batches():
+    """
+    A key pass is credited with its shot's xG even when the two arrive in different batches,
+    identically for the object and columnar paths; PassContext geometry is filled vectorized.
+    """
+    from src.agents.enrich_load import _enrich_event_batch
+    import numpy as np
+    from src.tools.events import assign_event_xa, assign_block_xa, normalize_event_block
+
+    def event(i, kind, location, **extra):
+        return {'id': f'ev-{i}', 'index': i, 'period': 1, 'minute': 0, 'second': i, 'type': {'name': kind},
+                'possession_team': {'id': 1, 'name': 'Home'}, 'player': {'id': i, 'name': f'P{i}'}, 'location': location, **extra}
+
+    raw = [
+        event(1, 'Pass', [60.0, 40.0], **{'pass': {'end_location': [100.0, 40.0], 'assisted_shot_id': 'ev-3', 'recipient': {'id': 9, 'name': 'R'}}}),
+        event(2, 'Pass', [60.0, 40.0], **{'pass': {'end_location': [50.0, 40.0]}}),
+        event(3, 'Shot', [100.0, 40.0], shot={'key_pass_id': 'ev-1'}),
+        event(4, 'Pass', [80.0, 10.0], **{'pass': {'end_location': [110.0, 30.0]}}),
+        event(5, 'Shot', [110.0, 30.0], shot={}), # Linked only from the pass side below
+    ]
+    raw[3]['pass']['assisted_shot_id'] = 'ev-5'
+    xg_model = XGModel()
+
+    events = [e for batch in (raw[:2], raw[2:]) for e in _enrich_event_batch(batch, 1, xg_model)[0]]
+    assign_event_xa(events)
+    blocks = [normalize_event_block(batch, 1, xg_model)[0] for batch in (raw[:2], raw[2:])]
+    linked = assign_block_xa(blocks)
+    assert blocks[0].xa[0] == 0.0 # New blocks are returned; the inputs keep their unlinked column
+    with pytest.raises(ValueError):
+        blocks[0].with_xa(np.full(len(blocks[0]), 2.0))
+    blocks = linked
+    xa = np.concatenate([b.xa for b in blocks])
+
+    shot_xg = {e.event_id: e.shot_context.xg for e in events if e.shot_context}
+    passes = {e.event_id: e.pass_context for e in events if e.pass_context}
+    assert passes['ev-1'].xa == pytest.approx(shot_xg['ev-3'])
+    assert passes['ev-2'].xa == 0.0
+    assert passes['ev-4'].xa == pytest.approx(shot_xg['ev-5'])
+    assert np.allclose(xa[[0, 1, 3]], [passes[k].xa for k in ('ev-1', 'ev-2', 'ev-4')])
+    assert np.isnan(xa[[2, 4]]).all()
+
+    assert passes['ev-1'].length == pytest.approx(40.0) and passes['ev-1'].is_progressive
+    assert not passes['ev-2'].is_progressive and passes['ev-2'].angle == pytest.approx(np.pi)
+    assert passes['ev-1'].recipient.player_id == 9
+    assert np.allclose(blocks[0].pass_length, [40.0, 10.0])